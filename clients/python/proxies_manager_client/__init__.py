@@ -0,0 +1,26 @@
+"""Client of proxies manager API."""
+
+from __future__ import annotations
+
+from .failures import FailureTracker
+from .models import Proxy
+from .pool import AsyncProxyPool, NoProxyAvailableError, ProxyPool
+from .strategies import DefaultFirst, RandomChoice, RotationStrategy, RoundRobin, Sticky
+from .transports import AsyncRotatingProxyTransport, RotatingProxyTransport, async_mounts, mounts
+
+__all__ = (
+    "AsyncProxyPool",
+    "AsyncRotatingProxyTransport",
+    "DefaultFirst",
+    "FailureTracker",
+    "NoProxyAvailableError",
+    "Proxy",
+    "ProxyPool",
+    "RandomChoice",
+    "RotatingProxyTransport",
+    "RotationStrategy",
+    "RoundRobin",
+    "Sticky",
+    "async_mounts",
+    "mounts",
+)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+from proxies_manager_client.models import Proxy
+
+
+class FailureTracker:
+    """
+    Failures of proxies seen by this process.
+
+    Failed proxy is skipped for `cooldown` seconds, doubled with every further failure in row up to `max_cooldown`,
+    first success forgets its failures. Safe to use from threads and coroutines, the lock is never held over I/O.
+    """
+
+    def __init__(
+        self, cooldown: float = 30.0, max_cooldown: float = 600.0, clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize."""
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        # proxy id -> (failures in row, skipped until)
+        self._failures: dict[str, tuple[int, float]] = {}
+
+    def record_failure(self, proxy: Proxy) -> int:
+        """Record failure of proxy, return number of its failures in row."""
+        with self._lock:
+            count = self._failures.get(proxy.id, (0, 0.0))[0] + 1
+            # exponent is capped so long failure streaks don't overflow float
+            delay = min(self.cooldown * 2 ** min(count - 1, 64), self.max_cooldown)
+            self._failures[proxy.id] = (count, self.clock() + delay)
+            return count
+
+    def record_success(self, proxy: Proxy) -> None:
+        """Forget failures of proxy."""
+        if proxy.id in self._failures:
+            with self._lock:
+                self._failures.pop(proxy.id, None)
+
+    def is_available(self, proxy: Proxy) -> bool:
+        """Return if proxy isn't in cooldown."""
+        with self._lock:
+            failure = self._failures.get(proxy.id)
+        return failure is None or failure[1] <= self.clock()
+
+    def filter(self, proxies: Iterable[Proxy]) -> list[Proxy]:
+        """Return proxies not in cooldown."""
+        now = self.clock()
+        with self._lock:
+            return [proxy for proxy in proxies if self._failures.get(proxy.id, (0, now))[1] <= now]
+
+    def prune(self, proxies: Iterable[Proxy]) -> None:
+        """Forget failures of proxies which left the pool."""
+        ids = {proxy.id for proxy in proxies}
+        with self._lock:
+            for proxy_id in self._failures.keys() - ids:
+                del self._failures[proxy_id]
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from urllib.parse import quote
+
+
+@dataclass(frozen=True, slots=True)
+class Proxy:
+    """Proxy of client's pool as listed by the manager."""
+
+    id: str
+    name: str
+    ipaddress: str
+    provider: str = ""
+    region: str = ""
+    server_id: int | None = None
+    client_default: bool = False
+
+    @classmethod
+    def from_row(cls, row: dict) -> Proxy:
+        """Create proxy from row of the listing, unknown fields are ignored."""
+        return cls(
+            id=row["id"],
+            name=row["name"],
+            ipaddress=row["ipaddress"],
+            provider=row.get("provider") or "",
+            region=row.get("region") or "",
+            server_id=row.get("server_id"),
+            client_default=bool(row.get("client_default")),
+        )
+
+    def get_url(self, login: str, password: str, port: int) -> str:
+        """Return URL of the proxy with credentials."""
+        return f"http://{quote(login, safe='')}:{quote(password, safe='')}@{self.ipaddress}:{port}"
@@ -0,0 +1,271 @@
+"""
+Client's proxy pool cached in memory and refreshed in background.
+
+Pool is kept as immutable tuple replaced on refresh, so readers never lock and never see half updated pool. Refresh
+sends `If-None-Match` with `ETag` of the last listing and the manager answers `304 Not Modified` without body while
+the pool doesn't change.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import httpx
+
+from proxies_manager_client.failures import FailureTracker
+from proxies_manager_client.models import Proxy
+from proxies_manager_client.strategies import RotationStrategy, RoundRobin
+
+logger = logging.getLogger(__name__)
+
+
+class NoProxyAvailableError(Exception):
+    """Pool has no proxy which can be used."""
+
+
+class BaseProxyPool(ABC):
+    """Cache of client's pool shared by sync and async pools."""
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        client: str,
+        *,
+        login: str,
+        password: str,
+        port: int = 3128,
+        refresh_interval: float = 30.0,
+        strategy: RotationStrategy | None = None,
+        failures: FailureTracker | None = None,
+        report_failures: bool = False,
+        timeout: float = 10.0,
+    ):
+        """
+        Initialize.
+
+        :param base_url: URL of the manager, e.g. `https://proxies.example.com`
+        :param token: API token of the manager
+        :param client: name of the client, its blacklist and default proxy apply
+        :param login: proxy login
+        :param password: proxy password
+        :param port: proxy port
+        :param refresh_interval: seconds between refreshes of the pool
+        :param strategy: rotation strategy, round robin by default
+        :param failures: tracker of failed proxies, failed proxy is skipped for 30 s (doubled on next failures)
+        :param report_failures: report failed proxies to the manager so they can be quarantined for all clients
+        :param timeout: seconds, timeout of requests to the manager
+        """
+        base_url = base_url.rstrip("/")
+        self.url = f"{base_url}/api/proxies/client/{quote(client, safe='')}/"
+        self.report_url = f"{self.url}report/"
+        self.headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+        self.login = login
+        self.password = password
+        self.port = port
+        self.refresh_interval = refresh_interval
+        self.strategy = strategy or RoundRobin()
+        self.failures = failures or FailureTracker()
+        self.report_failures = report_failures
+        self.timeout = timeout
+        self.etag: str | None = None
+        self.refreshed_at: float | None = None
+        self._proxies: tuple[Proxy, ...] = ()
+
+    @property
+    def proxies(self) -> tuple[Proxy, ...]:
+        """Return all proxies of the pool, including failed ones."""
+        return self._proxies
+
+    def get(self, key: str | None = None, exclude: Iterable[str] = ()) -> Proxy:
+        """Return proxy chosen by strategy from proxies not failed recently, `exclude` are ids of proxies to skip."""
+        exclude = set(exclude)
+        candidates = [proxy for proxy in self.failures.filter(self._proxies) if proxy.id not in exclude]
+        if not candidates:
+            raise NoProxyAvailableError("No proxy is available.")
+        return self.strategy.select(candidates, key)
+
+    def get_url(self, proxy: Proxy | None = None, key: str | None = None) -> str:
+        """Return URL of proxy (chosen by strategy when not given) with credentials."""
+        proxy = proxy or self.get(key)
+        return proxy.get_url(self.login, self.password, self.port)
+
+    def mark_ok(self, proxy: Proxy) -> None:
+        """Record successful request through proxy."""
+        self.failures.record_success(proxy)
+
+    def mark_failed(self, proxy: Proxy) -> None:
+        """Record failed request through proxy, it's skipped until its cooldown passes."""
+        if self.failures.record_failure(proxy) == 1 and self.report_failures:
+            self.report(proxy)
+
+    @abstractmethod
+    def report(self, proxy: Proxy) -> None:
+        """Report failed proxy to the manager."""
+        ...
+
+    def get_conditional_headers(self) -> dict[str, str]:
+        """Return headers of refresh request."""
+        if self.etag is None:
+            return self.headers
+        return {**self.headers, "If-None-Match": self.etag}
+
+    def apply(self, response: httpx.Response) -> bool:
+        """Update pool from listing response, return if it changed."""
+        self.refreshed_at = time.monotonic()
+        if response.status_code == httpx.codes.NOT_MODIFIED:
+            return False
+        response.raise_for_status()
+        proxies = tuple(Proxy.from_row(row) for row in response.json() if row.get("ipaddress"))
+        self.etag = response.headers.get("ETag")
+        self._proxies = proxies
+        self.failures.prune(proxies)
+        return True
+
+
+class ProxyPool(BaseProxyPool):
+    """
+    Pool for threaded code, refreshed by background thread.
+
+    Use it as context manager or call `start()` and `stop()`. When refresh fails the last pool is used.
+    """
+
+    def __init__(self, *args, http: httpx.Client | None = None, **kwargs):
+        """Initialize, `http` is client used for requests to the manager."""
+        super().__init__(*args, **kwargs)
+        self.http = http or httpx.Client(timeout=self.timeout)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._reporter: ThreadPoolExecutor | None = None
+
+    def refresh(self) -> bool:
+        """Refresh pool now, return if it changed."""
+        return self.apply(self.http.get(self.url, headers=self.get_conditional_headers()))
+
+    def start(self) -> ProxyPool:
+        """Load pool and start refreshing it in background."""
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="proxy-pool-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop refreshing."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._reporter is not None:
+            self._reporter.shutdown(wait=True)
+            self._reporter = None
+
+    def run(self) -> None:
+        """Refresh pool every `refresh_interval` until stopped."""
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Can't refresh proxy pool, using the last one.")
+
+    def report(self, proxy: Proxy) -> None:
+        """Report failed proxy to the manager in background."""
+        if self._reporter is None:
+            self._reporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="proxy-pool-report")
+        self._reporter.submit(self.send_report, proxy)
+
+    def send_report(self, proxy: Proxy) -> None:
+        """Send failure report of proxy."""
+        try:
+            self.http.post(self.report_url, json={"proxy_id": proxy.id}, headers=self.headers)
+        except httpx.HTTPError:
+            logger.exception("Can't report failure of proxy %s.", proxy.name)
+
+    def __enter__(self) -> ProxyPool:
+        """Start pool."""
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        """Stop pool."""
+        self.stop()
+
+
+class AsyncProxyPool(BaseProxyPool):
+    """
+    Pool for asyncio code, refreshed by background task.
+
+    Use it as async context manager or call `start()` and `stop()`. When refresh fails the last pool is used.
+    """
+
+    def __init__(self, *args, http: httpx.AsyncClient | None = None, **kwargs):
+        """Initialize, `http` is client used for requests to the manager."""
+        super().__init__(*args, **kwargs)
+        self.http = http or httpx.AsyncClient(timeout=self.timeout)
+        self._task: asyncio.Task | None = None
+        self._refresh_lock = asyncio.Lock()
+        self._reports: set[asyncio.Task] = set()
+
+    async def refresh(self) -> bool:
+        """Refresh pool now, return if it changed, concurrent calls share one request."""
+        refreshed_at = self.refreshed_at
+        async with self._refresh_lock:
+            if self.refreshed_at != refreshed_at:
+                # refreshed by another coroutine meanwhile
+                return False
+            return self.apply(await self.http.get(self.url, headers=self.get_conditional_headers()))
+
+    async def start(self) -> AsyncProxyPool:
+        """Load pool and start refreshing it in background."""
+        await self.refresh()
+        self._task = asyncio.create_task(self.run())
+        return self
+
+    async def stop(self) -> None:
+        """Stop refreshing."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._reports:
+            await asyncio.gather(*self._reports, return_exceptions=True)
+
+    async def run(self) -> None:
+        """Refresh pool every `refresh_interval` until stopped."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Can't refresh proxy pool, using the last one.")
+
+    def report(self, proxy: Proxy) -> None:
+        """Report failed proxy to the manager in background task."""
+        task = asyncio.get_running_loop().create_task(self.send_report(proxy))
+        # keep reference so task isn't garbage collected before it finishes
+        self._reports.add(task)
+        task.add_done_callback(self._reports.discard)
+
+    async def send_report(self, proxy: Proxy) -> None:
+        """Send failure report of proxy."""
+        try:
+            await self.http.post(self.report_url, json={"proxy_id": proxy.id}, headers=self.headers)
+        except httpx.HTTPError:
+            logger.exception("Can't report failure of proxy %s.", proxy.name)
+
+    async def __aenter__(self) -> AsyncProxyPool:
+        """Start pool."""
+        return await self.start()
+
+    async def __aexit__(self, *args) -> None:
+        """Stop pool."""
+        await self.stop()
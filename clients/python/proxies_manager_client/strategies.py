@@ -0,0 +1,82 @@
+"""Rotation strategies choosing proxy for request from available proxies of the pool."""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import random
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+
+from proxies_manager_client.models import Proxy
+
+
+class RotationStrategy(ABC):
+    """Choose proxy for request, `key` identifies session of requests which should use the same proxy."""
+
+    @abstractmethod
+    def select(self, proxies: Sequence[Proxy], key: str | None = None) -> Proxy:
+        """Return one of proxies, the sequence is never empty."""
+        ...
+
+
+class RoundRobin(RotationStrategy):
+    """Use proxies in turn."""
+
+    def __init__(self):
+        """Initialize."""
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def select(self, proxies: Sequence[Proxy], key: str | None = None) -> Proxy:
+        """Return next proxy."""
+        with self._lock:
+            index = next(self._counter)
+        return proxies[index % len(proxies)]
+
+
+class RandomChoice(RotationStrategy):
+    """Use random proxy."""
+
+    def select(self, proxies: Sequence[Proxy], key: str | None = None) -> Proxy:
+        """Return random proxy."""
+        return random.choice(proxies)  # noqa: S311
+
+
+class Sticky(RotationStrategy):
+    """
+    Use the same proxy for the same key (rendezvous hashing).
+
+    When proxy leaves the pool or fails only its keys move to other proxies. Requests without key use `fallback`.
+    """
+
+    def __init__(self, fallback: RotationStrategy | None = None):
+        """Initialize."""
+        self.fallback = fallback or RandomChoice()
+
+    def select(self, proxies: Sequence[Proxy], key: str | None = None) -> Proxy:
+        """Return proxy with the highest hash of key and proxy id."""
+        if key is None:
+            return self.fallback.select(proxies)
+        return max(proxies, key=lambda proxy: self.get_weight(key, proxy))
+
+    @staticmethod
+    def get_weight(key: str, proxy: Proxy) -> int:
+        """Return stable weight of proxy for key."""
+        return int.from_bytes(hashlib.blake2b(f"{key}:{proxy.id}".encode(), digest_size=8).digest(), "big")
+
+
+class DefaultFirst(RotationStrategy):
+    """Use client's default proxy while it's available, `fallback` otherwise."""
+
+    def __init__(self, fallback: RotationStrategy | None = None):
+        """Initialize."""
+        self.fallback = fallback or RoundRobin()
+
+    def select(self, proxies: Sequence[Proxy], key: str | None = None) -> Proxy:
+        """Return default proxy or proxy chosen by fallback."""
+        for proxy in proxies:
+            if proxy.client_default:
+                return proxy
+        return self.fallback.select(proxies, key)
@@ -0,0 +1,160 @@
+"""
+`httpx` transports sending requests through proxies of the pool.
+
+Proxy is chosen for every request, when it can't be connected (or rejects credentials) it's marked failed and the
+request is retried through another proxy. Requests with `proxy_session` extension use it as key of sticky strategy:
+
+    with ProxyPool(...) as pool, httpx.Client(mounts=mounts(pool)) as client:
+        client.get("https://example.com", extensions={"proxy_session": "user-1"})
+"""
+
+from __future__ import annotations
+
+import threading
+
+import httpx
+
+from proxies_manager_client.models import Proxy
+from proxies_manager_client.pool import AsyncProxyPool, BaseProxyPool, ProxyPool
+
+# errors meaning the proxy itself is broken, not the target
+PROXY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ProxyError)
+
+
+class BaseRotatingTransport:
+    """Proxy selection and failure handling shared by sync and async transports."""
+
+    def __init__(self, pool: BaseProxyPool, retries: int = 2, **transport_kwargs):
+        """
+        Initialize.
+
+        :param pool: pool of proxies
+        :param retries: number of other proxies tried when proxy fails
+        :param transport_kwargs: arguments of per proxy `httpx` transports, e.g. `verify` or `http2`
+        """
+        self.pool = pool
+        self.retries = retries
+        self.transport_kwargs = transport_kwargs
+        self._transports: dict[Proxy, httpx.BaseTransport | httpx.AsyncBaseTransport] = {}
+        self._lock = threading.Lock()
+
+    def select(self, request: httpx.Request, tried: set[str]) -> Proxy:
+        """Return proxy for request not tried yet."""
+        return self.pool.get(key=request.extensions.get("proxy_session"), exclude=tried)
+
+    def can_retry(self, tried: set[str]) -> bool:
+        """Return if request can be retried through another proxy, error of the last one is raised otherwise."""
+        return len(tried) <= self.retries and bool(self.pool.failures.filter(self.pool.proxies))
+
+    def is_proxy_failure(self, response: httpx.Response) -> bool:
+        """Return if response means proxy rejected the request."""
+        return response.status_code == httpx.codes.PROXY_AUTHENTICATION_REQUIRED
+
+    def pop_stale(self) -> list[httpx.BaseTransport | httpx.AsyncBaseTransport]:
+        """Remove transports of proxies which left the pool and return them to be closed."""
+        proxies = set(self.pool.proxies)
+        with self._lock:
+            return [self._transports.pop(proxy) for proxy in self._transports.keys() - proxies]
+
+
+class RotatingProxyTransport(BaseRotatingTransport, httpx.BaseTransport):
+    """Transport of `httpx.Client` rotating proxies of `ProxyPool`."""
+
+    def get_transport(self, proxy: Proxy) -> httpx.BaseTransport:
+        """Return transport of proxy, transports are kept so connections to the proxy are reused."""
+        if (transport := self._transports.get(proxy)) is None:
+            for stale in self.pop_stale():
+                stale.close()
+            with self._lock:
+                if (transport := self._transports.get(proxy)) is None:
+                    url = self.pool.get_url(proxy)
+                    transport = self._transports[proxy] = httpx.HTTPTransport(proxy=url, **self.transport_kwargs)
+        return transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Send request through proxy, retry through another proxy when it fails."""
+        if self.retries:
+            # body is sent again on retry
+            request.read()
+        tried: set[str] = set()
+        while True:
+            proxy = self.select(request, tried)
+            tried.add(proxy.id)
+            try:
+                response = self.get_transport(proxy).handle_request(request)
+            except PROXY_ERRORS:
+                self.pool.mark_failed(proxy)
+                if not self.can_retry(tried):
+                    raise
+                continue
+            if self.is_proxy_failure(response):
+                self.pool.mark_failed(proxy)
+                if not self.can_retry(tried):
+                    return response
+                response.close()
+                continue
+            self.pool.mark_ok(proxy)
+            return response
+
+    def close(self) -> None:
+        """Close transports of all proxies."""
+        with self._lock:
+            transports, self._transports = list(self._transports.values()), {}
+        for transport in transports:
+            transport.close()
+
+
+class AsyncRotatingProxyTransport(BaseRotatingTransport, httpx.AsyncBaseTransport):
+    """Transport of `httpx.AsyncClient` rotating proxies of `AsyncProxyPool`."""
+
+    async def get_transport(self, proxy: Proxy) -> httpx.AsyncBaseTransport:
+        """Return transport of proxy, transports are kept so connections to the proxy are reused."""
+        if (transport := self._transports.get(proxy)) is None:
+            for stale in self.pop_stale():
+                await stale.aclose()
+            url = self.pool.get_url(proxy)
+            transport = self._transports[proxy] = httpx.AsyncHTTPTransport(proxy=url, **self.transport_kwargs)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send request through proxy, retry through another proxy when it fails."""
+        if self.retries:
+            # body is sent again on retry
+            await request.aread()
+        tried: set[str] = set()
+        while True:
+            proxy = self.select(request, tried)
+            tried.add(proxy.id)
+            try:
+                response = await (await self.get_transport(proxy)).handle_async_request(request)
+            except PROXY_ERRORS:
+                self.pool.mark_failed(proxy)
+                if not self.can_retry(tried):
+                    raise
+                continue
+            if self.is_proxy_failure(response):
+                self.pool.mark_failed(proxy)
+                if not self.can_retry(tried):
+                    return response
+                await response.aclose()
+                continue
+            self.pool.mark_ok(proxy)
+            return response
+
+    async def aclose(self) -> None:
+        """Close transports of all proxies."""
+        transports, self._transports = list(self._transports.values()), {}
+        for transport in transports:
+            await transport.aclose()
+
+
+def mounts(pool: ProxyPool, **kwargs) -> dict[str, httpx.BaseTransport]:
+    """Return `mounts` of `httpx.Client` sending all HTTP(S) requests through the pool."""
+    transport = RotatingProxyTransport(pool, **kwargs)
+    return {"http://": transport, "https://": transport}
+
+
+def async_mounts(pool: AsyncProxyPool, **kwargs) -> dict[str, httpx.AsyncBaseTransport]:
+    """Return `mounts` of `httpx.AsyncClient` sending all HTTP(S) requests through the pool."""
+    transport = AsyncRotatingProxyTransport(pool, **kwargs)
+    return {"http://": transport, "https://": transport}
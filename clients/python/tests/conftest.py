@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+from proxies_manager_client import FailureTracker, Proxy, ProxyPool
+
+ROWS = [
+    {"id": f"00000000-0000-0000-0000-00000000000{i}", "name": f"proxy{i}", "ipaddress": f"10.0.0.{i}"}
+    for i in range(1, 5)
+]
+# arguments of pool of fake manager
+POOL_ARGS = ("https://manager.test", "token", "client")
+CREDENTIALS = {"login": "login", "password": "secret"}
+
+
+class FakeClock:
+    """Clock of `FailureTracker` moved by tests."""
+
+    def __init__(self):
+        """Initialize."""
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Return current time."""
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        """Move time forward."""
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """Return fake clock."""
+    return FakeClock()
+
+
+@pytest.fixture
+def proxies() -> list[Proxy]:
+    """Return proxies of the listing."""
+    return [Proxy.from_row(row) for row in ROWS]
+
+
+@pytest.fixture
+def pool(clock) -> ProxyPool:
+    """Return pool loaded from fake manager, it isn't refreshed in background."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(200, json={})
+        return httpx.Response(200, json=ROWS, headers={"ETag": '"pool"'})
+
+    pool = ProxyPool(
+        *POOL_ARGS,
+        **CREDENTIALS,
+        failures=FailureTracker(clock=clock),
+        http=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    pool.refresh()
+    return pool
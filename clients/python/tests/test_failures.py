@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from proxies_manager_client import FailureTracker
+
+
+def test_failed_proxy_cools_down(clock, proxies):
+    """Failed proxy is skipped until its cooldown passes."""
+    tracker = FailureTracker(cooldown=30, clock=clock)
+    assert tracker.record_failure(proxies[0]) == 1
+    assert not tracker.is_available(proxies[0])
+    assert tracker.filter(proxies) == proxies[1:]
+
+    clock.advance(29)
+    assert not tracker.is_available(proxies[0])
+    clock.advance(1)
+    assert tracker.is_available(proxies[0])
+    assert tracker.filter(proxies) == proxies
+
+
+def test_cooldown_doubles_up_to_max(clock, proxies):
+    """Every further failure in row doubles cooldown up to its maximum."""
+    tracker = FailureTracker(cooldown=10, max_cooldown=35, clock=clock)
+    for count, cooldown in enumerate([10, 20, 35, 35], start=1):
+        assert tracker.record_failure(proxies[0]) == count
+        clock.advance(cooldown - 1)
+        assert not tracker.is_available(proxies[0])
+        clock.advance(1)
+        assert tracker.is_available(proxies[0])
+
+
+def test_success_forgets_failures(clock, proxies):
+    """Success resets failures in row so the next failure has the base cooldown."""
+    tracker = FailureTracker(cooldown=10, clock=clock)
+    tracker.record_failure(proxies[0])
+    tracker.record_failure(proxies[0])
+    tracker.record_success(proxies[0])
+    assert tracker.is_available(proxies[0])
+    assert tracker.record_failure(proxies[0]) == 1
+    clock.advance(10)
+    assert tracker.is_available(proxies[0])
+
+
+def test_prune_forgets_proxies_which_left_pool(clock, proxies):
+    """Failures of proxies no longer in pool are forgotten."""
+    tracker = FailureTracker(clock=clock)
+    tracker.record_failure(proxies[0])
+    tracker.record_failure(proxies[1])
+    tracker.prune(proxies[1:])
+    assert tracker.is_available(proxies[0])
+    assert not tracker.is_available(proxies[1])
+
+
+def test_long_failure_streak_keeps_max_cooldown(clock, proxies):
+    """Cooldown stays at its maximum however many failures in row there are."""
+    tracker = FailureTracker(cooldown=10, max_cooldown=60, clock=clock)
+    for _ in range(2000):
+        tracker.record_failure(proxies[0])
+    clock.advance(59)
+    assert not tracker.is_available(proxies[0])
+    clock.advance(1)
+    assert tracker.filter(proxies) == proxies
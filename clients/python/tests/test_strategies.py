@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+from proxies_manager_client import DefaultFirst, RandomChoice, RoundRobin, Sticky
+
+
+def test_round_robin_uses_proxies_in_turn(proxies):
+    """Round robin cycles through proxies."""
+    strategy = RoundRobin()
+    assert [strategy.select(proxies) for _ in range(6)] == [*proxies, *proxies[:2]]
+
+
+def test_random_choice_returns_proxy_of_pool(proxies):
+    """Random choice returns one of proxies."""
+    strategy = RandomChoice()
+    assert all(strategy.select(proxies) in proxies for _ in range(20))
+
+
+def test_sticky_keeps_proxy_of_key(proxies):
+    """The same key gets the same proxy, other proxies leaving the pool don't move it."""
+    strategy = Sticky()
+    chosen = {key: strategy.select(proxies, key) for key in map(str, range(50))}
+    assert all(strategy.select(proxies, key) == proxy for key, proxy in chosen.items())
+    # keys spread over proxies
+    assert len(set(chosen.values())) > 1
+
+    removed = proxies[0]
+    remaining = proxies[1:]
+    for key, proxy in chosen.items():
+        if proxy != removed:
+            assert strategy.select(remaining, key) == proxy
+
+
+def test_sticky_without_key_uses_fallback(proxies):
+    """Requests without key are chosen by fallback."""
+    strategy = Sticky(fallback=RoundRobin())
+    assert [strategy.select(proxies) for _ in range(4)] == proxies
+
+
+def test_default_first(proxies):
+    """Client's default proxy is used while available, fallback otherwise."""
+    default = replace(proxies[2], client_default=True)
+    strategy = DefaultFirst()
+    assert strategy.select([*proxies[:2], default]) == default
+    assert [strategy.select(proxies[:2]) for _ in range(3)] == [proxies[0], proxies[1], proxies[0]]
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+from proxies_manager_client import AsyncProxyPool, AsyncRotatingProxyTransport, NoProxyAvailableError, Proxy
+from proxies_manager_client.transports import RotatingProxyTransport
+
+from .conftest import CREDENTIALS, POOL_ARGS, ROWS
+
+
+def make_transport(pool, broken: set[str], retries: int = 2, status_code: int = 407) -> RotatingProxyTransport:
+    """Return transport whose per proxy transports fail for proxies in `broken` and record proxies used."""
+    transport = RotatingProxyTransport(pool, retries=retries)
+    transport.used = []
+
+    def get_transport(proxy: Proxy) -> httpx.BaseTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            transport.used.append(proxy.name)
+            if proxy.name not in broken:
+                return httpx.Response(200, text=proxy.name)
+            if status_code == 407:
+                return httpx.Response(407)
+            raise httpx.ConnectError("Connection refused", request=request)
+
+        return httpx.MockTransport(handler)
+
+    transport.get_transport = get_transport
+    return transport
+
+
+def test_request_goes_through_working_proxy(pool):
+    """Request is sent through proxy chosen by strategy and proxy is kept available."""
+    transport = make_transport(pool, broken=set())
+    with httpx.Client(transport=transport) as client:
+        assert client.get("https://example.com").text == "proxy1"
+    assert pool.failures.filter(pool.proxies) == list(pool.proxies)
+
+
+@pytest.mark.parametrize("status_code", [407, 0])
+def test_failed_proxy_is_retried_through_another(pool, status_code):
+    """Proxy which can't connect or rejects credentials is marked failed and another one is used."""
+    transport = make_transport(pool, broken={"proxy1"}, status_code=status_code)
+    with httpx.Client(transport=transport) as client:
+        response = client.get("https://example.com")
+    assert response.status_code == 200
+    assert transport.used[0] == "proxy1"
+    assert len(transport.used) == 2
+    assert response.text == transport.used[1]
+    assert [proxy.name for proxy in pool.failures.filter(pool.proxies)] == ["proxy2", "proxy3", "proxy4"]
+
+
+def test_retries_exhausted_raises_last_error(pool):
+    """After `retries` other proxies fail the error of the last one is raised."""
+    transport = make_transport(pool, broken={"proxy1", "proxy2", "proxy3", "proxy4"}, retries=2, status_code=0)
+    with httpx.Client(transport=transport) as client, pytest.raises(httpx.ConnectError):
+        client.get("https://example.com")
+    assert len(transport.used) == 3
+    assert len(set(transport.used)) == 3
+    assert [proxy.name for proxy in pool.failures.filter(pool.proxies)] == ["proxy4"]
+
+
+def test_retries_exhausted_returns_last_rejection(pool):
+    """When all tried proxies reject credentials the last response is returned."""
+    transport = make_transport(pool, broken={"proxy1", "proxy2", "proxy3", "proxy4"}, retries=1)
+    with httpx.Client(transport=transport) as client:
+        response = client.get("https://example.com")
+    assert response.status_code == 407
+    assert len(transport.used) == 2
+
+
+def test_no_proxy_available(pool):
+    """Request fails when all proxies are in cooldown."""
+    for proxy in pool.proxies:
+        pool.mark_failed(proxy)
+    with (
+        httpx.Client(transport=make_transport(pool, broken=set())) as client,
+        pytest.raises(NoProxyAvailableError),
+    ):
+        client.get("https://example.com")
+
+
+def test_failed_proxy_reported_once(pool):
+    """With `report_failures` the first failure in row is reported to the manager."""
+    reports = []
+    pool.report_failures = True
+    pool.report = reports.append
+    proxy = pool.proxies[0]
+    pool.mark_failed(proxy)
+    pool.mark_failed(proxy)
+    assert reports == [proxy]
+
+
+def test_async_retries_exhausted():
+    """Async transport retries through other proxies and raises error of the last one."""
+    used = []
+
+    def manager(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=ROWS)
+
+    async def main():
+        pool = AsyncProxyPool(
+            *POOL_ARGS,
+            **CREDENTIALS,
+            http=httpx.AsyncClient(transport=httpx.MockTransport(manager)),
+        )
+        await pool.refresh()
+        transport = AsyncRotatingProxyTransport(pool, retries=1)
+
+        async def get_transport(proxy: Proxy) -> httpx.AsyncBaseTransport:
+            def handler(request: httpx.Request) -> httpx.Response:
+                used.append(proxy.name)
+                raise httpx.ConnectError("Connection refused", request=request)
+
+            return httpx.MockTransport(handler)
+
+        transport.get_transport = get_transport
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://example.com")
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(main())
+    assert len(used) == 2
+    assert len(set(used)) == 2
+
+
+def test_transports_of_proxies_which_left_pool_are_closed(pool):
+    """Transports of proxies removed from pool are dropped when a new transport is created."""
+    transport = RotatingProxyTransport(pool)
+    first = transport.get_transport(pool.proxies[0])
+    assert transport.get_transport(pool.proxies[0]) is first
+    pool._proxies = pool.proxies[1:]
+    transport.get_transport(pool.proxies[0])
+    assert set(transport._transports) == {pool.proxies[0]}
+    transport.close()
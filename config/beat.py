@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import logging
+
+from django.conf import settings
+
+import redis
+from celery.beat import PersistentScheduler
+from redis.exceptions import LockError
+from redis.lock import Lock
+
+from config.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElectedScheduler(PersistentScheduler):
+    """
+    Beat scheduler firing tasks only on the node holding the leader lease.
+
+    Beat can run on every node, the others take over within `BEAT_LEADER_TTL` when the leader dies.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize."""
+        self.leader_lock = Lock(
+            get_redis(),
+            f"{settings.PROJECT_NAME}:lock:beat-leader",
+            timeout=settings.BEAT_LEADER_TTL,
+            thread_local=False,
+        )
+        self.is_leader = False
+        super().__init__(*args, **kwargs)
+
+    def tick(self, *args, **kwargs) -> float:
+        """Fire due tasks when leader, wake up in time to renew (or try to get) the lease."""
+        renew_interval = settings.BEAT_LEADER_TTL / 3
+        if not self.elect():
+            return renew_interval
+        return min(super().tick(*args, **kwargs), renew_interval)
+
+    def elect(self) -> bool:
+        """Renew leader lease or try to get it, return if this node is leader."""
+        try:
+            if self.is_leader:
+                self.leader_lock.reacquire()
+            elif self.leader_lock.acquire(blocking=False):
+                logger.info("Beat became leader.")
+                self.is_leader = True
+        except LockError:
+            logger.warning("Beat lost leadership.")
+            self.is_leader = False
+        except redis.RedisError:
+            # leadership can't be confirmed, stop firing so two nodes never fire at once
+            logger.exception("Can't renew beat leadership.")
+            self.is_leader = False
+        return self.is_leader
+
+    def close(self) -> None:
+        """Give up leadership so other node takes over immediately."""
+        if self.is_leader:
+            try:
+                self.leader_lock.release()
+            except (LockError, redis.RedisError):
+                logger.exception("Can't release beat leadership.")
+            self.is_leader = False
+        super().close()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import caches
+
+import redis
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+CACHE_REQUESTS = Counter(
+    "proxies_cache_requests_total",
+    "Two-tier cache lookups by tier (`local` or `redis`) and result (`hit` or `miss`).",
+    ["cache", "tier", "result"],
+)
+CACHE_EVICTIONS = Counter(
+    "proxies_cache_evictions_total",
+    "Entries evicted from in-process LRU because it was full.",
+    ["cache"],
+)
+
+_redis_clients: dict[int, redis.Redis] = {}
+
+
+def get_redis() -> redis.Redis:
+    """Return Redis client for application data (pub/sub, sets, locks), one per process."""
+    pid = os.getpid()
+    if pid not in _redis_clients:
+        _redis_clients.clear()
+        _redis_clients[pid] = redis.Redis.from_url(settings.REDIS_APP_URL)
+    return _redis_clients[pid]
+
+
+class LocalCache:
+    """Bounded thread safe in-process LRU cache with per entry TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        """Initialize."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return cached value or default when missing or expired."""
+        with self._lock:
+            try:
+                expires_at, value = self._data[key]
+            except KeyError:
+                return default
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> int:
+        """Store value, evict least recently used entries when full. Return number of evicted entries."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        evicted = 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def delete(self, key: str) -> None:
+        """Remove value."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all values."""
+        with self._lock:
+            self._data.clear()
+
+
+class InvalidationBroadcast:
+    """
+    Broadcast invalidations of two-tier caches to all processes over Redis pub/sub.
+
+    Every process runs one listener thread which removes invalidated keys from its local caches. The thread is
+    started lazily (and again after fork) so it works for gunicorn and Celery prefork workers.
+    """
+
+    def __init__(self):
+        """Initialize."""
+        self.caches: dict[str, TwoTierCache] = {}
+        self.sender_id = ""
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def register(self, cache: TwoTierCache) -> None:
+        """Register cache to receive invalidations."""
+        self.caches[cache.name] = cache
+
+    def ensure_listening(self) -> None:
+        """Start listener thread in current process."""
+        if not settings.CACHE_INVALIDATION_BROADCAST or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.sender_id = uuid.uuid4().hex
+            threading.Thread(target=self.listen, name="cache-invalidation", daemon=True).start()
+
+    def publish(self, cache_name: str, key: str) -> None:
+        """Tell other processes to drop the key from their local cache."""
+        if not settings.CACHE_INVALIDATION_BROADCAST:
+            return
+        self.ensure_listening()
+        try:
+            get_redis().publish(settings.CACHE_INVALIDATION_CHANNEL, f"{self.sender_id}|{cache_name}|{key}")
+        except redis.RedisError:
+            logger.exception("Can't publish invalidation of %s:%s.", cache_name, key)
+
+    def listen(self) -> None:
+        """Receive invalidations until process ends."""
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    sender_id, cache_name, key = message["data"].decode().split("|", 2)
+                    if sender_id != self.sender_id and (cache := self.caches.get(cache_name)):
+                        cache.local.delete(key)
+            except Exception:
+                logger.exception("Cache invalidation listener failed, reconnecting.")
+            if pubsub is not None:
+                # release connection of the failed subscription before opening a new one
+                try:
+                    pubsub.close()
+                except redis.RedisError:
+                    logger.exception("Can't close cache invalidation subscription.")
+            # invalidations could be missed while disconnected
+            for cache in self.caches.values():
+                cache.local.clear()
+            time.sleep(1)
+
+
+broadcast = InvalidationBroadcast()
+
+
+class TwoTierCache:
+    """
+    In-process LRU in front of Django cache (Redis in production).
+
+    Values are read from process memory when possible. Changes are written to both tiers and invalidations are
+    broadcast so other gunicorn/Celery processes drop their local copy. Local TTL limits staleness when broadcast is
+    disabled or a message is lost.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, local_ttl: float = 60, alias: str = "default"):
+        """Initialize."""
+        self.name = name
+        self.local = LocalCache(maxsize=maxsize, ttl=local_ttl)
+        self.alias = alias
+        broadcast.register(self)
+
+    def make_key(self, key: str) -> str:
+        """Return key used in shared cache."""
+        return f"{self.name}:{key}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return value from local or shared cache."""
+        broadcast.ensure_listening()
+        value = self.local.get(key, MISSING)
+        if value is not MISSING:
+            CACHE_REQUESTS.labels(cache=self.name, tier="local", result="hit").inc()
+            return value
+        CACHE_REQUESTS.labels(cache=self.name, tier="local", result="miss").inc()
+
+        value = caches[self.alias].get(self.make_key(key), MISSING)
+        if value is MISSING:
+            CACHE_REQUESTS.labels(cache=self.name, tier="redis", result="miss").inc()
+            return default
+        CACHE_REQUESTS.labels(cache=self.name, tier="redis", result="hit").inc()
+        self._set_local(key, value)
+        return value
+
+    def set(self, key: str, value: Any, timeout: float | None = None) -> None:
+        """Store value in both tiers."""
+        caches[self.alias].set(self.make_key(key), value, timeout)
+        broadcast.publish(self.name, key)
+        self._set_local(key, value)
+
+    def get_or_set(self, key: str, default: Callable[[], Any], timeout: float | None = None) -> Any:
+        """Return cached value, compute and store it on miss."""
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = default()
+            self.set(key, value, timeout)
+        return value
+
+    def delete(self, key: str) -> None:
+        """Remove value from both tiers and from local caches of other processes."""
+        self.local.delete(key)
+        caches[self.alias].delete(self.make_key(key))
+        broadcast.publish(self.name, key)
+
+    def _set_local(self, key: str, value: Any) -> None:
+        if evicted := self.local.set(key, value):
+            CACHE_EVICTIONS.labels(cache=self.name).inc(evicted)
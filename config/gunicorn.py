@@ -1,13 +1,26 @@
 from __future__ import annotations
 
 import multiprocessing
+import os
 
 module = "proxies"
 name = module
 bind = "0.0.0.0:8000"
 workers = multiprocessing.cpu_count() * 2 + 1
+# threaded workers, change feed requests hold a thread (not whole worker) for up to a minute and worker heartbeat runs
+# in main thread so they aren't killed by timeout, `CHANGE_FEED_MAX_CONNECTIONS` keeps threads free for the rest of API
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
 accesslog = "-"
 errorlog = "-"
 loglevel = "debug"
 worker_tmp_dir = "/dev/shm"  # noqa: S108
 timeout = 120
+
+
+def child_exit(server, worker):
+    """Remove metrics of dead worker when metrics are collected from multiple processes."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
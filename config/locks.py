@@ -0,0 +1,93 @@
+"""
+Distributed locks in Redis.
+
+Locks are leases with TTL so lock of crashed process expires, while held they are extended by heartbeat thread so long
+runs don't lose them.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from django.conf import settings
+
+from redis.exceptions import LockError
+from redis.lock import Lock
+
+from config.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatLock:
+    """Non-blocking Redis lock extended by heartbeat thread while held."""
+
+    def __init__(self, name: str, ttl: float | None = None):
+        """Initialize."""
+        self.name = name
+        self.ttl = ttl or settings.LOCK_TTL
+        self.lock = Lock(get_redis(), f"{settings.PROJECT_NAME}:lock:{name}", timeout=self.ttl, thread_local=False)
+        self._stop = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+
+    def acquire(self) -> bool:
+        """Return if lock was acquired, start heartbeat when it was."""
+        if not self.lock.acquire(blocking=False):
+            return False
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self.beat, name=f"lock-heartbeat-{self.name}", daemon=True)
+        self._heartbeat.start()
+        return True
+
+    def beat(self) -> None:
+        """Reset TTL of lock every third of it until released."""
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self.lock.reacquire()
+            except LockError:
+                logger.exception("Lock %s was lost.", self.name)
+                return
+            except Exception:
+                # Redis unavailable, try again on next beat before the lease expires
+                logger.exception("Can't extend lock %s.", self.name)
+
+    def release(self) -> None:
+        """Stop heartbeat and release lock."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        try:
+            self.lock.release()
+        except LockError:
+            logger.warning("Lock %s expired before release.", self.name)
+
+    def __enter__(self) -> bool:
+        """Return if lock was acquired."""
+        return self.acquire()
+
+    def __exit__(self, *args) -> None:
+        """Release lock if held."""
+        if self._heartbeat is not None:
+            self.release()
+
+
+def single_flight(name: str, ttl: float | None = None) -> Callable:
+    """Skip call of decorated function while another call (in any process) holds the lock."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            with HeartbeatLock(name, ttl) as acquired:
+                if not acquired:
+                    logger.info("%s is already running, skipping.", name)
+                    return None
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,40 +1,157 @@
 from __future__ import annotations
 
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import UTC, datetime
 
+import orjson
 from colorama import Fore, Style
 
+# attributes every `LogRecord` has, anything else was passed in `extra`
+RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
 
 class VivaceFormatter(logging.Formatter):
     """Custom log message formatter."""
 
     template = "[{levelname}][{asctime}][{name}][{module}][{lineno}][{process:d}][{thread:d}]|{message}"
 
+    def __init__(self, *args, **kwargs):
+        """Initialize."""
+        super().__init__(*args, **kwargs)
+        self._formatters: dict[str, logging.Formatter] = {}
+
     def get_template(self, record: logging.LogRecord) -> str:
         """Get log message template."""
         return self.template
 
     def format(self, record: logging.LogRecord) -> str:  # noqa: A003
-        """Format log message."""
+        """Format log message with formatter cached per template."""
         log_fmt = self.get_template(record)
-        formatter = logging.Formatter(log_fmt, style="{")
+        if (formatter := self._formatters.get(log_fmt)) is None:
+            formatter = self._formatters[log_fmt] = logging.Formatter(log_fmt, style="{")
         return formatter.format(record)
 
 
 class ColoramaFormatter(VivaceFormatter):
     """Add color to log messages based on log level."""
 
+    colors = {
+        logging.CRITICAL: Fore.RED,
+        logging.ERROR: Fore.MAGENTA,
+        logging.WARNING: Fore.YELLOW,
+        logging.INFO: Fore.GREEN,
+        logging.DEBUG: Fore.WHITE,
+    }
+
     def get_template(self, record: logging.LogRecord) -> str:
         """Add color to log messages based on log level."""
-        config = {
-            logging.CRITICAL: Fore.RED,
-            logging.ERROR: Fore.MAGENTA,
-            logging.WARNING: Fore.YELLOW,
-            logging.INFO: Fore.GREEN,
-            logging.DEBUG: Fore.WHITE,
-        }
-
-        if record.levelno in config:
+        if record.levelno in self.colors:
             # build template
-            return f"{config[record.levelno]}{self.template}{Style.RESET_ALL}"
+            return f"{self.colors[record.levelno]}{self.template}{Style.RESET_ALL}"
         return super().get_template(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as single line JSON objects for log collectors, `extra` fields are included."""
+
+    def format(self, record: logging.LogRecord) -> str:  # noqa: A003
+        """Format log message."""
+        data = {
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "lineno": record.lineno,
+            "process": record.process,
+            "thread": record.thread,
+            "message": record.getMessage(),
+        }
+        data.update((key, value) for key, value in record.__dict__.items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return orjson.dumps(data, default=str).decode()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler passing records to handlers of its listener in background thread.
+
+    Configure it with `handlers` in `LOGGING` (`dictConfig` creates the listener). The listener is started lazily in
+    every process so it works in forked gunicorn and Celery workers too.
+    """
+
+    def __init__(self, queue: queue.Queue):
+        """Initialize."""
+        super().__init__(queue)
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return record as is, it's handled in the same process so message is formatted in listener thread."""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put record to queue, start listener first if it's not running in this process."""
+        if self._pid != os.getpid():
+            self.start_listener()
+        super().enqueue(record)
+
+    def start_listener(self) -> None:
+        """Start listener thread in current process."""
+        with self._lock:
+            if self._pid == os.getpid() or self.listener is None:
+                return
+            if self._pid is not None:
+                # forked, listener thread didn't survive and could leave the queue locked
+                self.queue = self.listener.queue = queue.Queue()
+            self.listener.start()
+            self._pid = os.getpid()
+            # flush queued records on exit
+            atexit.register(self.listener.stop)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most `rate` records with the same message template per `period` seconds.
+
+    Only records of loggers starting with one of `names` (all by default) and below WARNING are limited. Number of
+    suppressed records is added to the first record let through in the next period.
+    """
+
+    def __init__(self, rate: int = 10, period: float = 60, names: list[str] | None = None):
+        """Initialize."""
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self.names = tuple(names or ())
+        # (logger, template) -> [period start, records let through, records suppressed]
+        self._periods: dict[tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:  # noqa: A003
+        """Return if record should be logged."""
+        if record.levelno >= logging.WARNING or (self.names and not record.name.startswith(self.names)):
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            period = self._periods.get(key)
+            if period is None or now - period[0] >= self.period:
+                self._periods[key] = [now, 1, 0]
+                if period and period[2]:
+                    record.msg = f"{record.msg} ({period[2]} similar messages suppressed)"
+                return True
+            if period[1] < self.rate:
+                period[1] += 1
+                return True
+            period[2] += 1
+            return False
@@ -3,8 +3,11 @@ from __future__ import annotations
 from email.utils import getaddresses
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 import environ
 from celery.schedules import crontab
+from kombu import Queue
 
 PROJECT_NAME = "vivace-proxies-manager"
 
@@ -47,6 +50,8 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # ------------------------------------------------------------------------------
 MIDDLEWARE = [
+    "proxies.proxies.middleware.MetricsMiddleware",
+    "proxies.proxies.querycount.QueryCountMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -123,6 +128,51 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.dummy.DummyCache",
     }
 }
+REDIS_URL = env("REDIS_URL", default="redis://localhost:6379")
+# application data kept in Redis (cache invalidations, ...)
+REDIS_APP_URL = f"{REDIS_URL}/2"
+# broadcast invalidations of in-process caches to all gunicorn/Celery processes over Redis pub/sub
+CACHE_INVALIDATION_BROADCAST = env.bool("CACHE_INVALIDATION_BROADCAST", default=False)
+CACHE_INVALIDATION_CHANNEL = f"{PROJECT_NAME}:cache-invalidation"
+POOL_CACHE_TTL = 300
+# keep client blacklists as Redis sets so listings exclude them in memory instead of DB anti-join
+BLACKLIST_STORE_ENABLED = env.bool("BLACKLIST_STORE_ENABLED", default=False)
+BLACKLIST_STORE_TTL = 3600
+POOL_LOCAL_CACHE_TTL = 30
+# points per proxy on sticky assignment hash ring, more gives more even share of sessions
+HASH_RING_REPLICAS = 100
+# publish pool changes to Redis stream served by client change feed endpoint
+CHANGE_FEED_ENABLED = env.bool("CHANGE_FEED_ENABLED", default=False)
+CHANGE_FEED_MAXLEN = 10000
+CHANGE_FEED_BATCH_SIZE = 500
+# seconds, long-poll wait and SSE connection duration (client reconnects with `Last-Event-ID`), kept well below
+# gunicorn `timeout`
+CHANGE_FEED_MAX_WAIT = 30
+CHANGE_FEED_STREAM_DURATION = 60
+# open long-polls and streams per gunicorn worker process, must be lower than gunicorn `threads` so other requests
+# are served while feeds are open
+CHANGE_FEED_MAX_CONNECTIONS = env.int("CHANGE_FEED_MAX_CONNECTIONS", default=4)
+CHANGE_FEED_KEEPALIVE = 15
+CHANGE_FEED_RETRY_MS = 3000
+# proxy is quarantined (excluded from listings until re-verified) when this many clients report it failing in window
+QUARANTINE_REPORT_CLIENTS = env.int("QUARANTINE_REPORT_CLIENTS", default=2)
+# seconds
+QUARANTINE_REPORT_WINDOW = env.int("QUARANTINE_REPORT_WINDOW", default=5 * 60)
+# seconds, quarantine expires when re-verification doesn't finish in time
+QUARANTINE_TTL = 30 * 60
+# samples accepted in one usage report
+USAGE_INGEST_MAX_SAMPLES = 5000
+# upper bound of every value of sample and of counters summed in one report, far below int64 so counters added up in
+# Redis and `ProxyUsage` don't overflow
+USAGE_MAX_VALUE = 2**48
+# flushing of usage failing this many times in row is moved aside (kept for `USAGE_FAILED_TTL` seconds) so it doesn't
+# block flushing of new reports
+USAGE_FLUSH_MAX_ATTEMPTS = 3
+USAGE_FAILED_TTL = 7 * 24 * 60 * 60
+# seconds, score of proxy is share of successful requests reported by clients in this window
+USAGE_SCORE_WINDOW = 24 * 60 * 60
+# seconds, how long is progress of bulk admin operations kept
+BULK_OPERATION_TTL = 24 * 60 * 60
 
 
 # URLS
@@ -136,6 +186,11 @@ WSGI_APPLICATION = "config.wsgi.application"
 AUTH_USER_MODEL = "users.User"
 
 
+# seconds token to user resolution is cached in Redis and in process memory
+AUTH_TOKEN_CACHE_TTL = env.int("AUTH_TOKEN_CACHE_TTL", default=300)
+AUTH_TOKEN_LOCAL_CACHE_TTL = env.int("AUTH_TOKEN_LOCAL_CACHE_TTL", default=10)
+
+
 # PASSWORDS
 # ------------------------------------------------------------------------------
 AUTH_PASSWORD_VALIDATORS = [
@@ -198,14 +253,49 @@ if USE_TZ:
     CELERY_TIMEZONE = TIME_ZONE
 CELERY_BROKER_URL = env("BROKER_URL", default="pyamqp://localhost")
 CELERY_TASK_DEFAULT_QUEUE = PROJECT_NAME
+# separate queues so provisioning is never stuck behind checks or bulk jobs, see README for worker topology
+CELERY_PROVISIONING_QUEUE = f"{PROJECT_NAME}.provisioning"
+CELERY_CHECKS_QUEUE = f"{PROJECT_NAME}.checks"
+CELERY_BULK_QUEUE = f"{PROJECT_NAME}.bulk"
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_QUEUES = [
+    Queue(CELERY_TASK_DEFAULT_QUEUE),
+    # priorities order creates before deletes and admin bulk actions after sync
+    Queue(CELERY_PROVISIONING_QUEUE, max_priority=10),
+    Queue(CELERY_CHECKS_QUEUE),
+    Queue(CELERY_BULK_QUEUE, max_priority=10),
+]
+CELERY_TASK_ROUTES = {
+    "proxies.proxies.tasks.create_server": {"queue": CELERY_PROVISIONING_QUEUE, "priority": 9},
+    "proxies.proxies.tasks.delete_server": {"queue": CELERY_PROVISIONING_QUEUE, "priority": 6},
+    "proxies.proxies.tasks.remediate_failing_proxies": {"queue": CELERY_PROVISIONING_QUEUE, "priority": 7},
+    "proxies.proxies.tasks.reverify_proxy": {"queue": CELERY_PROVISIONING_QUEUE, "priority": 8},
+    "proxies.proxies.tasks.check_all_proxies": {"queue": CELERY_CHECKS_QUEUE},
+    "proxies.proxies.tasks.update_proxies_from_services": {"queue": CELERY_BULK_QUEUE},
+    "proxies.proxies.tasks.run_bulk_action": {"queue": CELERY_BULK_QUEUE, "priority": 3},
+    "proxies.proxies.tasks.flush_usage": {"queue": CELERY_CHECKS_QUEUE},
+}
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
-CELERY_TASK_IGNORE_RESULT = False
+# no task result is read, tasks which need it set `ignore_result=False`, failures are stored anyway
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_STORE_ERRORS_EVEN_IF_IGNORED = True
+# long tasks shouldn't sit in prefetch buffer of busy worker process
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 CELERY_CACHE_BACKEND = "default"
+# workers log through `LOGGING` (queue handler, formatters) instead of Celery handlers
+CELERY_WORKER_HIJACK_ROOT_LOGGER = False
 CELERY_TASK_ALWAYS_EAGER = env.bool("CELERY_TASK_ALWAYS_EAGER", default=False)
-CELERY_RESULT_BACKEND = f"{env('REDIS_URL', default='redis://localhost:6379')}/0"
+CELERY_RESULT_BACKEND = f"{REDIS_URL}/0"
+
+# beat can run on multiple nodes, only the one holding leader lease fires tasks
+CELERY_BEAT_SCHEDULER = "config.beat.LeaderElectedScheduler"
+# seconds, lost leader is replaced within this time
+BEAT_LEADER_TTL = 30
+# seconds, lease of task locks (`config.locks`), extended by heartbeat while task runs
+LOCK_TTL = 60
 
 # Disable beat by default. Test if everything works first then enable it.
 if env.bool("CELERY_BEAT_ENABLED", default=True):
@@ -218,22 +308,71 @@ if env.bool("CELERY_BEAT_ENABLED", default=True):
             "task": "proxies.proxies.tasks.update_proxies_from_services",
             "schedule": crontab(minute="5", hour="4"),
         },
+        "flush_usage": {
+            "task": "proxies.proxies.tasks.flush_usage",
+            "schedule": crontab(minute="*"),
+        },
     }
 
 
+# METRICS
+# ------------------------------------------------------------------------------
+# set `PROMETHEUS_MULTIPROC_DIR` env variable to shared directory to aggregate metrics from all processes
+# Bearer token of `/metrics`, required in production, without it metrics are served only with DEBUG
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+# return number of SQL queries and time spent in DB in response headers
+QUERY_COUNT_HEADERS = False
+# raise error instead of logging warning when view exceeds its `query_budget`
+QUERY_BUDGET_STRICT = False
+# warn when the same query is executed this many times in one request/task
+QUERY_COUNT_DUPLICATE_WARNING = 10
+
+
 # PROJECT SPECIFIC
 # ------------------------------------------------------------------------------
 PROXY_LOGIN = env("PROXY_LOGIN")
 PROXY_PASSWORD = env("PROXY_PASSWORD")
 PROXY_PORT = 3128
+# rows fetched from DB at once when streaming proxy list (`?stream=1`)
+PROXY_LIST_STREAM_CHUNK_SIZE = 2000
+# URL used to verify proxy works, must return JSON with `origin` key, e.g. `/echo` endpoint of the manager itself
+PROXY_CHECK_URL = env("PROXY_CHECK_URL", default="https://httpbin.org/post")
+# several echo URLs can be set, proxy works when at least `PROXY_CHECK_QUORUM` (majority by default) of them see it
+PROXY_CHECK_URLS = [url for url in env.list("PROXY_CHECK_URLS", default=[PROXY_CHECK_URL]) if url]
+PROXY_CHECK_QUORUM = env.int("PROXY_CHECK_QUORUM", default=len(PROXY_CHECK_URLS) // 2 + 1)
+# without URLs or with zero quorum every proxy would pass the check
+if not PROXY_CHECK_URLS:
+    raise ImproperlyConfigured("PROXY_CHECK_URLS must contain at least one URL.")
+if PROXY_CHECK_QUORUM < 1:
+    raise ImproperlyConfigured("PROXY_CHECK_QUORUM must be at least 1.")
+# seconds, timeout of one verification request
+PROXY_CHECK_TIMEOUT = 5
+# number of reverse proxies (load balancer, nginx) in front of the manager, `/echo` trusts their `X-Forwarded-For`
+ECHO_TRUSTED_PROXY_COUNT = env.int("ECHO_TRUSTED_PROXY_COUNT", default=0)
+# seconds, `manage.py build_proxy_image` gives up waiting for builder server or snapshot after timeout
+IMAGE_BUILD_TIMEOUT = 30 * 60
+IMAGE_BUILD_POLL_INTERVAL = 15
+# replace proxy failing this many checks in row, `0` disables automatic replacement
+PROXY_REMEDIATION_THRESHOLD = env.int("PROXY_REMEDIATION_THRESHOLD", default=3)
+# seconds, failed checks of new proxy which isn't ready yet don't count until it had this long to boot
+PROXY_REMEDIATION_GRACE = 10 * 60
+# replacements in progress (replacement not active yet) at most
+PROXY_REMEDIATION_CONCURRENCY = env.int("PROXY_REMEDIATION_CONCURRENCY", default=3)
+# replacements started per hour at most, so provider outage or broken check doesn't recreate the whole pool
+PROXY_REMEDIATION_RATE = env.int("PROXY_REMEDIATION_RATE", default=10)
 
 
 # DO PROXY DROPLETS
 # ------------------------------------------------------------------------------
 DO_LIMIT = 30
+# can be pointed to local emulator, see `manage.py cloud_emulator`
+DO_API_URL = env("DO_API_URL", default="https://api.digitalocean.com/v2")
 DO_TOKEN = env("DO_TOKEN")
 DO_PROJECT_ID = env("DO_PROJECT_ID")
+# region of image builder droplet, snapshots are transferred to all regions below
 DO_PROXY_DROPLET_REGION = "fra1"
+# weights new droplets are spread across regions by, e.g. `DO_PROXY_DROPLET_REGIONS="fra1=2;nyc3=1;sgp1=1"`
+DO_PROXY_DROPLET_REGIONS = env.dict("DO_PROXY_DROPLET_REGIONS", cast={"value": int}, default={"fra1": 1})
 DO_PROXY_DROPLET_SIZE = "s-1vcpu-512mb-10gb"
 DO_PROXY_DROPLET_IMAGE = "centos-stream-9-x64"
 
@@ -241,7 +380,11 @@ DO_PROXY_DROPLET_IMAGE = "centos-stream-9-x64"
 # HETZNER CONFIG
 # ------------------------------------------------------------------------------
 HETZNER_LIMIT = 5
+HETZNER_API_URL = env("HETZNER_API_URL", default="https://api.hetzner.cloud/v1")
 HETZNER_TOKEN = env("HETZNER_TOKEN")
 HETZNER_PROXY_SERVER_IMAGE = "centos-stream-9"
 HETZNER_PROXY_SERVER_TYPE = "cx22"
+# location of image builder server, snapshots can be used in every location
 HETZNER_PROXY_SERVER_LOCATION = "nbg1"
+# weights new servers are spread across locations by, e.g. `HETZNER_PROXY_SERVER_LOCATIONS="nbg1=1;ash=1"`
+HETZNER_PROXY_SERVER_LOCATIONS = env.dict("HETZNER_PROXY_SERVER_LOCATIONS", cast={"value": int}, default={"nbg1": 1})
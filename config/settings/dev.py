@@ -9,6 +9,11 @@ SECRET_KEY = "django-insecure-jafr+3z+xs!x4v3-b-y_vi4-&59_f%fbqme=)g4z06(py79h#y
 ALLOWED_HOSTS = ["*"]
 
 
+# METRICS
+# ------------------------------------------------------------------------------
+QUERY_COUNT_HEADERS = True
+
+
 # EMAILS
 # ------------------------------------------------------------------------------
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -42,6 +42,9 @@ CACHES = {
         "LOCATION": f"{env('REDIS_URL')}/1",
     },
 }
+CACHE_INVALIDATION_BROADCAST = env.bool("CACHE_INVALIDATION_BROADCAST", default=True)
+BLACKLIST_STORE_ENABLED = env.bool("BLACKLIST_STORE_ENABLED", default=True)
+CHANGE_FEED_ENABLED = env.bool("CHANGE_FEED_ENABLED", default=True)
 
 
 # SECURITY
@@ -54,6 +57,8 @@ SECURE_HSTS_SECONDS = 17280000
 SECURE_HSTS_INCLUDE_SUBDOMAINS = env.bool("DJANGO_SECURE_HSTS_INCLUDE_SUBDOMAINS", default=True)
 SECURE_HSTS_PRELOAD = env.bool("DJANGO_SECURE_HSTS_PRELOAD", default=True)
 SECURE_CONTENT_TYPE_NOSNIFF = env.bool("DJANGO_SECURE_CONTENT_TYPE_NOSNIFF", default=True)
+# `/metrics` isn't served without token outside DEBUG
+METRICS_TOKEN = env("METRICS_TOKEN")
 
 
 # LOGGING
@@ -64,26 +69,43 @@ LOGGING = {
     "formatters": {
         "verbose": {"format": "%(levelname)s %(asctime)s %(module)s " "%(process)d %(thread)d %(message)s"},
         "vivace": {"()": "config.logging.VivaceFormatter"},
+        "json": {"()": "config.logging.JsonFormatter"},
+    },
+    "filters": {
+        # per proxy messages of services and checks
+        "rate_limit": {
+            "()": "config.logging.RateLimitFilter",
+            "rate": env.int("LOG_RATE_LIMIT", default=20),
+            "period": 60,
+            "names": ["proxies"],
+        },
     },
     "handlers": {
         "console": {
             "level": "DEBUG",
             "class": "logging.StreamHandler",
-            "formatter": "vivace",
-        }
+            "formatter": env("LOG_FORMAT", default="vivace"),
+        },
+        # writes to console in background thread so logging doesn't block requests and tasks
+        "queue": {
+            "class": "config.logging.QueueHandler",
+            "handlers": ["console"],
+            "respect_handler_level": True,
+            "filters": ["rate_limit"],
+        },
     },
-    "root": {"level": "INFO", "handlers": ["console"]},
+    "root": {"level": "INFO", "handlers": ["queue"]},
     "loggers": {
         "django.db.backends": {
             "level": "ERROR",
-            "handlers": ["console"],
+            "handlers": ["queue"],
             "propagate": False,
         },
         # Errors logged by the SDK itself
-        "sentry_sdk": {"level": "ERROR", "handlers": ["console"], "propagate": False},
+        "sentry_sdk": {"level": "ERROR", "handlers": ["queue"], "propagate": False},
         "django.security.DisallowedHost": {
             "level": "ERROR",
-            "handlers": ["console"],
+            "handlers": ["queue"],
             "propagate": False,
         },
     },
@@ -10,6 +10,7 @@ SECRET_KEY = "django-insecure-jafr+3z+xs!x4v3-b-y_vi4-&59_f%fbqme=)g4z06(py79h#y
 # TESTS
 # ------------------------------------------------------------------------------
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
+QUERY_BUDGET_STRICT = True
 
 
 # EMAIL
@@ -5,6 +5,9 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from proxies.proxies.echo import echo_view
+from proxies.proxies.metrics import metrics_view
+
 
 def trigger_error(request):
     """For testing Sentry."""
@@ -13,6 +16,8 @@ def trigger_error(request):
 
 urlpatterns = [
     path("sentry-debug/", trigger_error),
+    path("metrics", metrics_view, name="metrics"),
+    path("echo", echo_view, name="echo"),
     path("api/proxies/", include("proxies.proxies.urls")),
     path(settings.DJANGO_ADMIN_URL, admin.site.urls),
 ]
@@ -1,21 +1,75 @@
 from __future__ import annotations
 
-from django.conf import settings
 from django.contrib import admin
 from django.db import transaction
-from django.db.models import QuerySet
-from django.http import HttpRequest
+from django.db.models import Count, IntegerField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpRequest, JsonResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
 
-from proxies.proxies.models import Client, Proxy
-from proxies.proxies.tasks import create_server, delete_server
+from celery import group
+
+from proxies.proxies.bulk import get_progress, start_operation
+from proxies.proxies.health import LATENCY_BUCKETS, READY_BUCKETS, estimate_quantile, get_health_report
+from proxies.proxies.models import Client, PoolHealthRollup, Proxy, ProxyImage, ProxyUsage
+from proxies.proxies.pool import get_provider_limit_error
+from proxies.proxies.tasks import create_server, run_bulk_action
+
+
+def count_subquery(queryset: QuerySet, field: str) -> Coalesce:
+    """Return subquery counting rows of queryset related to proxy by field, evaluated only for displayed rows."""
+    counts = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(count=Count("*"))
+    return Coalesce(Subquery(counts.values("count"), output_field=IntegerField()), 0)
 
 
 @admin.register(Proxy)
 class ProxyAdmin(admin.ModelAdmin):
     """Admin for Proxy."""
 
-    list_display = ["name", "active", "server_id", "provider", "ipaddress", "reported"]
-    list_filter = ["active", "provider", "reported"]
+    list_display = [
+        "name",
+        "active",
+        "server_id",
+        "provider",
+        "region",
+        "ipaddress",
+        "reported",
+        "blacklisted_count",
+        "default_count",
+        "uptime",
+        "consecutive_failures",
+        "score",
+    ]
+    list_filter = ["active", "provider", "region", "reported"]
+    actions = ["recheck_proxies", "replace_proxies"]
+    # counting all proxies on every changelist page is not worth it with large pools
+    show_full_result_count = False
+
+    def get_queryset(self, request: HttpRequest) -> QuerySet[Proxy]:
+        """Return queryset, for changelist without JSON responses and with counts of related clients."""
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name == "proxies_proxy_changelist":
+            queryset = queryset.defer("create_response", "last_check_response").annotate(
+                blacklisted_count=count_subquery(Client.blacklisted_proxies.through.objects.all(), "proxy"),
+                default_count=count_subquery(Client.objects.all(), "default_proxy"),
+            )
+        return queryset
+
+    @admin.display(description="blacklisted by", ordering="blacklisted_count")
+    def blacklisted_count(self, obj: Proxy) -> int:
+        """Return number of clients blacklisting proxy."""
+        return obj.blacklisted_count
+
+    @admin.display(description="default for", ordering="default_count")
+    def default_count(self, obj: Proxy) -> int:
+        """Return number of clients using proxy as default."""
+        return obj.default_count
+
+    @admin.display(description="uptime")
+    def uptime(self, obj: Proxy) -> str:
+        """Return share of successful checks."""
+        return "-" if obj.uptime is None else f"{obj.uptime:.1%}"
 
     def get_readonly_fields(self, request: HttpRequest, obj: Proxy | None = None) -> list[str]:
         """Return readonly fields."""
@@ -32,28 +86,27 @@ class ProxyAdmin(admin.ModelAdmin):
             readonly_fields.insert(0, "name")
         return readonly_fields
 
+    def get_urls(self) -> list:
+        """Add URL with progress of bulk operations."""
+        urls = [
+            path(
+                "bulk/<str:operation_id>/",
+                self.admin_site.admin_view(self.bulk_progress_view),
+                name="proxies_proxy_bulk_progress",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def bulk_progress_view(self, request: HttpRequest, operation_id: str) -> JsonResponse:
+        """Return progress of bulk operation as JSON."""
+        if not self.has_view_permission(request) or (progress := get_progress(operation_id)) is None:
+            raise Http404
+        return JsonResponse(progress)
+
     def save_model(self, request, obj, form, change):
         """Save model."""
-        if (
-            obj.provider == Proxy.ProviderChoices.DIGITALOCEAN
-            and Proxy.objects.filter(provider=obj.provider).count() >= settings.DO_LIMIT
-        ):
-            self.message_user(
-                request,
-                f"You can't create more then {settings.DO_LIMIT} proxies for Digitalocean provider.",
-                level="ERROR",
-            )
-            return
-
-        if (
-            obj.provider == Proxy.ProviderChoices.HETZNER
-            and Proxy.objects.filter(provider=obj.provider).count() >= settings.HETZNER_LIMIT
-        ):
-            self.message_user(
-                request,
-                f"You can't create more then {settings.HETZNER_LIMIT} proxies for Hetzner provider.",
-                level="ERROR",
-            )
+        if not change and (error := get_provider_limit_error(obj.provider)):
+            self.message_user(request, error, level="ERROR")
             return
 
         super().save_model(request, obj, form, change)
@@ -62,19 +115,128 @@ class ProxyAdmin(admin.ModelAdmin):
 
     def delete_model(self, request, obj: Proxy):
         """Delete model."""
-        self.message_user(request, f"Proxy {obj.name} scheduled for delete.", level="INFO")
-        if obj.server_id and not obj.is_removed:
-            delete_server.delay(obj.id)
+        self.delete_queryset(request, Proxy.objects.filter(pk=obj.pk))
 
     def delete_queryset(self, request, queryset: QuerySet[Proxy]):
-        """Delete queryset."""
-        for obj in queryset:
-            self.delete_model(request, obj)
+        """Delete servers of proxies in background, proxies are deleted once their servers are."""
+        self.run_bulk_action(request, "delete", queryset.filter(server_id__isnull=False, is_removed=False))
+
+    @admin.action(description="Recheck selected proxies now", permissions=["change"])
+    def recheck_proxies(self, request: HttpRequest, queryset: QuerySet[Proxy]) -> None:
+        """Check selected proxies in background."""
+        self.run_bulk_action(request, "recheck", queryset.filter(server_id__isnull=False))
+
+    @admin.action(description="Replace selected proxies", permissions=["change"])
+    def replace_proxies(self, request: HttpRequest, queryset: QuerySet[Proxy]) -> None:
+        """Create replacements of selected proxies in background, proxies are deleted once replacements are active."""
+        self.run_bulk_action(request, "replace", queryset.filter(replaced_by__isnull=True))
+
+    def run_bulk_action(self, request: HttpRequest, action: str, queryset: QuerySet[Proxy]) -> None:
+        """Dispatch action for every proxy as separate task so they run concurrently on workers."""
+        ids = list(queryset.values_list("pk", flat=True))
+        if not ids:
+            self.message_user(request, f"No proxy to {action}.", level="WARNING")
+            return
+
+        operation_id = start_operation(action, len(ids))
+        tasks = group(run_bulk_action.s(operation_id, action, pk) for pk in ids)
+        transaction.on_commit(tasks.apply_async)
+        url = reverse("admin:proxies_proxy_bulk_progress", args=[operation_id])
+        self.message_user(
+            request,
+            format_html(
+                '{} of {} proxies scheduled, see <a href="{}">progress</a>.', action.capitalize(), len(ids), url
+            ),
+            level="INFO",
+        )
 
 
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
     """Admin for Client."""
 
-    list_display = ["name"]
+    list_display = ["name", "preferred_regions"]
     search_fields = ["name"]
+
+
+@admin.register(ProxyImage)
+class ProxyImageAdmin(admin.ModelAdmin):
+    """Admin for ProxyImage."""
+
+    list_display = ["name", "provider", "image_id", "active", "build_duration", "created_at"]
+    list_filter = ["provider", "active"]
+    readonly_fields = ["provider", "image_id", "name", "build_duration", "created_at"]
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """Images are built by `manage.py build_proxy_image` only."""
+        return False
+
+
+@admin.register(PoolHealthRollup)
+class PoolHealthRollupAdmin(admin.ModelAdmin):
+    """Admin for PoolHealthRollup, read only dashboard of pool health."""
+
+    list_display = [
+        "hour",
+        "provider",
+        "active_count",
+        "inactive_count",
+        "reported_count",
+        "checks",
+        "failures",
+        "median_latency",
+        "ready_count",
+        "median_time_to_ready",
+    ]
+    list_filter = ["provider"]
+    date_hierarchy = "hour"
+    show_full_result_count = False
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """Rollups are maintained by check runs only."""
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj: PoolHealthRollup | None = None) -> bool:
+        """Rollups are maintained by check runs only."""
+        return False
+
+    @admin.display(description="median latency (s)")
+    def median_latency(self, obj: PoolHealthRollup) -> str:
+        """Return estimated median latency of checks."""
+        median = estimate_quantile(obj.latency_buckets, LATENCY_BUCKETS, 0.5)
+        return "-" if median is None else f"{median:.2f}"
+
+    @admin.display(description="median time to ready (s)")
+    def median_time_to_ready(self, obj: PoolHealthRollup) -> str:
+        """Return estimated median time to ready of new proxies."""
+        median = estimate_quantile(obj.ready_buckets, READY_BUCKETS, 0.5)
+        return "-" if median is None else f"{median:.0f}"
+
+    def changelist_view(self, request: HttpRequest, extra_context: dict | None = None):
+        """Show summary of last 7 days above rollups."""
+        extra_context = {**(extra_context or {}), "health_report": get_health_report()}
+        return super().changelist_view(request, extra_context)
+
+
+@admin.register(ProxyUsage)
+class ProxyUsageAdmin(admin.ModelAdmin):
+    """Admin for ProxyUsage, read only usage reported by clients."""
+
+    list_display = ["hour", "proxy", "client", "requests", "bytes", "errors", "latency_ms"]
+    list_filter = ["client"]
+    list_select_related = ["proxy", "client"]
+    date_hierarchy = "hour"
+    show_full_result_count = False
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """Usage is reported by clients only."""
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj: ProxyUsage | None = None) -> bool:
+        """Usage is reported by clients only."""
+        return False
+
+    @admin.display(description="latency (ms)")
+    def latency_ms(self, obj: ProxyUsage) -> str:
+        """Return mean of reported median latencies."""
+        return "-" if obj.latency_ms is None else f"{obj.latency_ms:.0f}"
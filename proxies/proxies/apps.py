@@ -8,3 +8,7 @@ class ProxiesConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "proxies.proxies"
+
+    def ready(self):
+        """Connect signal receivers."""
+        from proxies.proxies import querycount, signals  # noqa: F401
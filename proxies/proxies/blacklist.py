@@ -0,0 +1,93 @@
+"""
+Per-client blacklist kept as Redis set of proxy ids.
+
+The set mirrors `Client.blacklisted_proxies` (kept in sync by signals) so listing a client's proxies is a set
+difference against the cached active pool instead of an anti-join in the database.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from collections.abc import Iterable
+
+from django.conf import settings
+
+import redis
+
+from config.cache import get_redis
+from proxies.proxies.models import Client
+
+logger = logging.getLogger(__name__)
+
+# marks set loaded from DB, sets without it are (re)loaded on next use
+LOADED_MARKER = "-"
+
+
+def get_blacklist_key(client_id: uuid.UUID | str) -> str:
+    """Return Redis key of client's blacklist."""
+    return f"{settings.PROJECT_NAME}:blacklist:{client_id}"
+
+
+def get_blacklisted_ids(client: Client) -> set[uuid.UUID]:
+    """Return ids of proxies blacklisted by client, load them from DB into Redis on first use."""
+    if not settings.BLACKLIST_STORE_ENABLED:
+        return set(client.blacklisted_proxies.values_list("id", flat=True))
+
+    key = get_blacklist_key(client.pk)
+    try:
+        members = get_redis().smembers(key)
+        if LOADED_MARKER.encode() not in members:
+            ids = [str(pk) for pk in client.blacklisted_proxies.values_list("id", flat=True)]
+            # TTL heals changes missed while the set was being loaded
+            get_redis().pipeline().sadd(key, LOADED_MARKER, *ids).expire(key, settings.BLACKLIST_STORE_TTL).execute()
+            return {uuid.UUID(pk) for pk in ids}
+    except redis.RedisError:
+        logger.exception("Can't get blacklist of client %s from Redis.", client.name)
+        return set(client.blacklisted_proxies.values_list("id", flat=True))
+    return {uuid.UUID(member.decode()) for member in members if member != LOADED_MARKER.encode()}
+
+
+def add_to_blacklists(client_ids: Iterable[uuid.UUID | str], proxy_ids: Iterable[uuid.UUID | str]) -> None:
+    """Add proxies to already loaded blacklists of clients."""
+    _update_blacklists(client_ids, proxy_ids, add=True)
+
+
+def remove_from_blacklists(client_ids: Iterable[uuid.UUID | str], proxy_ids: Iterable[uuid.UUID | str]) -> None:
+    """Remove proxies from blacklists of clients."""
+    _update_blacklists(client_ids, proxy_ids, add=False)
+
+
+def drop_blacklists(client_ids: Iterable[uuid.UUID | str]) -> None:
+    """Drop blacklists of clients, they are loaded from DB again on next use."""
+    if not settings.BLACKLIST_STORE_ENABLED:
+        return
+    if keys := [get_blacklist_key(client_id) for client_id in client_ids]:
+        try:
+            get_redis().delete(*keys)
+        except redis.RedisError:
+            logger.exception("Can't drop blacklists in Redis.")
+
+
+def _update_blacklists(
+    client_ids: Iterable[uuid.UUID | str], proxy_ids: Iterable[uuid.UUID | str], *, add: bool
+) -> None:
+    if not settings.BLACKLIST_STORE_ENABLED:
+        return
+    client_ids = list(client_ids)
+    members = [str(pk) for pk in proxy_ids]
+    if not members:
+        return
+    try:
+        pipe = get_redis().pipeline()
+        for client_id in client_ids:
+            key = get_blacklist_key(client_id)
+            if add:
+                # sets without loaded marker are loaded from DB on next use anyway
+                pipe.sadd(key, *members)
+            else:
+                pipe.srem(key, *members)
+        pipe.execute()
+    except redis.RedisError:
+        logger.exception("Can't update blacklists in Redis, dropping them.")
+        drop_blacklists(client_ids)
@@ -0,0 +1,46 @@
+"""Progress of bulk admin operations run as background tasks, kept in Redis hash per operation."""
+
+from __future__ import annotations
+
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+from config.cache import get_redis
+
+
+def get_operation_key(operation_id: str) -> str:
+    """Return Redis key of bulk operation progress."""
+    return f"{settings.PROJECT_NAME}:bulk:{operation_id}"
+
+
+def start_operation(action: str, total: int) -> str:
+    """Record start of bulk operation and return its id."""
+    operation_id = uuid.uuid4().hex
+    key = get_operation_key(operation_id)
+    mapping = {"action": action, "total": total, "done": 0, "failed": 0, "started_at": timezone.now().isoformat()}
+    get_redis().pipeline().hset(key, mapping=mapping).expire(key, settings.BULK_OPERATION_TTL).execute()
+    return operation_id
+
+
+def record_result(operation_id: str, ok: bool) -> None:
+    """Count finished proxy of bulk operation."""
+    get_redis().hincrby(get_operation_key(operation_id), "done" if ok else "failed", 1)
+
+
+def get_progress(operation_id: str) -> dict | None:
+    """Return progress of bulk operation, `None` for unknown (or expired) operation."""
+    data = {key.decode(): value.decode() for key, value in get_redis().hgetall(get_operation_key(operation_id)).items()}
+    if not data:
+        return None
+    progress = {
+        "id": operation_id,
+        "action": data["action"],
+        "started_at": data["started_at"],
+        "total": int(data["total"]),
+        "done": int(data["done"]),
+        "failed": int(data["failed"]),
+    }
+    progress["finished"] = progress["done"] + progress["failed"] >= progress["total"]
+    return progress
@@ -0,0 +1,183 @@
+"""
+Change feed of the proxy pool kept in Redis stream.
+
+Every change (proxy added, removed, changed, blacklisted by client, ...) is appended to the stream and its entry id is
+the pool version, so clients can wait for changes newer than the version they already have instead of polling the
+whole listing.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from enum import StrEnum
+
+from django.conf import settings
+
+import orjson
+import redis
+
+from config.cache import get_redis
+from proxies.proxies.models import Client
+
+logger = logging.getLogger(__name__)
+
+INITIAL_VERSION = "0-0"
+
+
+class ChangeEvent(StrEnum):
+    """Types of change feed events."""
+
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"
+    BLACKLISTED = "blacklisted"
+    UNBLACKLISTED = "unblacklisted"
+    # client must reload listing, its changes can't be described or were trimmed from the feed
+    RESET = "reset"
+
+
+def get_feed_key() -> str:
+    """Return Redis key of change feed stream."""
+    return f"{settings.PROJECT_NAME}:pool-changes"
+
+
+def parse_version(version: str) -> tuple[int, int]:
+    """Return version (stream entry id) as tuple so versions can be compared."""
+    ms, _, seq = version.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def publish_change(event: ChangeEvent, proxy: dict | None = None, client_id: uuid.UUID | str | None = None) -> None:
+    """Append change to the feed, `client_id` limits it to one client's feed."""
+    publish_changes([(event, proxy, client_id)])
+
+
+def publish_changes(changes: list[tuple[ChangeEvent, dict | None, uuid.UUID | str | None]]) -> None:
+    """Append changes (event, proxy, client id) to the feed in one round trip."""
+    if not settings.CHANGE_FEED_ENABLED or not changes:
+        return
+    pipe = get_redis().pipeline(transaction=False)
+    for event, proxy, client_id in changes:
+        fields = {"event": str(event), "client": str(client_id) if client_id else "", "proxy": orjson.dumps(proxy)}
+        pipe.xadd(get_feed_key(), fields, maxlen=settings.CHANGE_FEED_MAXLEN, approximate=False)
+    try:
+        pipe.execute()
+    except redis.RedisError:
+        logger.exception("Can't publish %d changes to change feed.", len(changes))
+
+
+def get_pool_version() -> str:
+    """Return current pool version (id of the last feed entry)."""
+    entries = get_redis().xrevrange(get_feed_key(), count=1)
+    return entries[0][0].decode() if entries else INITIAL_VERSION
+
+
+def is_trimmed(version: str) -> bool:
+    """Return if changes after version were already trimmed from the feed."""
+    conn = get_redis()
+    key = get_feed_key()
+    if conn.xlen(key) < settings.CHANGE_FEED_MAXLEN:
+        return False
+    first = conn.xrange(key, count=1)
+    return bool(first) and parse_version(first[0][0].decode()) > parse_version(version)
+
+
+def read_changes(client: Client, version: str, timeout: float) -> tuple[str, list[dict]]:
+    """
+    Return new version and changes for client newer than version, wait up to timeout seconds for them.
+
+    Single `reset` change is returned when changes after version are no longer available.
+    """
+    if is_trimmed(version):
+        current = get_pool_version()
+        return current, [{"version": current, "event": ChangeEvent.RESET, "proxy": None}]
+
+    deadline = time.monotonic() + timeout
+    changes: list[dict] = []
+    while not changes:
+        block = int((deadline - time.monotonic()) * 1000)
+        if block <= 0:
+            break
+        response = get_redis().xread({get_feed_key(): version}, count=settings.CHANGE_FEED_BATCH_SIZE, block=block)
+        if not response:
+            break
+        for entry_id, fields in response[0][1]:
+            version = entry_id.decode()
+            if fields[b"client"] in (b"", str(client.pk).encode()):
+                changes.append(
+                    {"version": version, "event": fields[b"event"].decode(), "proxy": orjson.loads(fields[b"proxy"])}
+                )
+    return version, changes
+
+
+def stream_changes(client: Client, version: str) -> Iterator[bytes]:
+    """Yield changes as Server-Sent Events, comment is sent on idle so proxies in between don't close connection."""
+    yield f"retry: {settings.CHANGE_FEED_RETRY_MS}\n\n".encode()
+    deadline = time.monotonic() + settings.CHANGE_FEED_STREAM_DURATION
+    while (remaining := deadline - time.monotonic()) > 0:
+        try:
+            version, changes = read_changes(client, version, min(remaining, settings.CHANGE_FEED_KEEPALIVE))
+        except redis.RedisError:
+            logger.exception("Can't read change feed.")
+            return
+        if not changes:
+            yield b": keepalive\n\n"
+        for change in changes:
+            yield b"id: %s\nevent: %s\ndata: %s\n\n" % (
+                change["version"].encode(),
+                change["event"].encode(),
+                orjson.dumps(change["proxy"]),
+            )
+
+
+class ConnectionLimiter:
+    """Open feed connections (long-polls and streams) of this process limited to `CHANGE_FEED_MAX_CONNECTIONS`."""
+
+    def __init__(self):
+        """Initialize."""
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Take slot of connection, return `False` when all are taken."""
+        with self._lock:
+            if self.open >= settings.CHANGE_FEED_MAX_CONNECTIONS:
+                return False
+            self.open += 1
+            return True
+
+    def release(self) -> None:
+        """Free slot of connection."""
+        with self._lock:
+            self.open -= 1
+
+
+connections = ConnectionLimiter()
+
+
+class ConnectionStream:
+    """Iterator of SSE stream freeing its connection slot when response is closed, even if it was never iterated."""
+
+    def __init__(self, stream: Iterator[bytes]):
+        """Initialize."""
+        self.stream = stream
+        self.closed = False
+
+    def __iter__(self) -> ConnectionStream:
+        """Return self."""
+        return self
+
+    def __next__(self) -> bytes:
+        """Return next event."""
+        return next(self.stream)
+
+    def close(self) -> None:
+        """Close stream and free its slot."""
+        if not self.closed:
+            self.closed = True
+            self.stream.close()
+            connections.release()
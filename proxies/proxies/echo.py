@@ -0,0 +1,34 @@
+"""IP echo endpoint used to verify proxies instead of third-party service like httpbin."""
+
+from __future__ import annotations
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+import orjson
+
+
+def get_client_ip(request: HttpRequest) -> str:
+    """
+    Return address request came from.
+
+    Behind `ECHO_TRUSTED_PROXY_COUNT` reverse proxies the address appended to `X-Forwarded-For` by the outermost one is
+    used, entries before it are set by the client (squid adds address of its client) and can't be trusted.
+    """
+    if settings.ECHO_TRUSTED_PROXY_COUNT:
+        forwarded = [ip.strip() for ip in request.headers.get("X-Forwarded-For", "").split(",") if ip.strip()]
+        if len(forwarded) >= settings.ECHO_TRUSTED_PROXY_COUNT:
+            return forwarded[-settings.ECHO_TRUSTED_PROXY_COUNT]
+    return request.META["REMOTE_ADDR"]
+
+
+# probes are sent through proxies without session or token, POST is accepted to be compatible with httpbin's `/post`
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def echo_view(request: HttpRequest) -> HttpResponse:
+    """Return address of the caller as JSON `{"origin": "<ip>"}`."""
+    response = HttpResponse(orjson.dumps({"origin": get_client_ip(request)}), content_type="application/json")
+    response["Cache-Control"] = "no-store"
+    return response
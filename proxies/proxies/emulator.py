@@ -0,0 +1,579 @@
+"""
+Local stand-in for DigitalOcean and Hetzner APIs.
+
+Implements only the endpoints used by the services so provisioning and sync can be exercised offline and at scale.
+Point ``DO_API_URL`` to ``http://<host>:<port>/digitalocean/v2`` and ``HETZNER_API_URL`` to
+``http://<host>:<port>/hetzner/v1`` to use it.
+
+Servers created from emulated snapshots boot in ``image_boot_delay`` and servers whose user data asks cloud-init to
+power off (image builders) are reported as ``off`` once booted.
+
+Every server gets its own loopback address (``127.0.x.y``), or the emulator's own address when it also listens on the
+proxy port. Plain HTTP requests sent through such "proxy" are then answered with the address the connection came to,
+so the verification in `Proxy.check_proxy_works_correct` passes when ``PROXY_CHECK_URL`` uses plain HTTP.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DO_PREFIX = "/digitalocean/v2"
+HETZNER_PREFIX = "/hetzner/v1"
+
+
+@dataclass
+class EmulatorConfig:
+    """Emulator behaviour configuration."""
+
+    boot_delay: float = 30.0
+    latency: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    rate_limit: int = 5000
+    rate_limit_window: int = 3600
+    image_boot_delay: float = 5.0
+    action_delay: float = 2.0
+    # address of all servers (where emulated proxy listens), every server gets own loopback address when not set
+    server_address: str | None = None
+
+
+@dataclass
+class EmulatedServer:
+    """Server(droplet) kept in emulator memory."""
+
+    id: int
+    provider: str
+    name: str
+    ipaddress: str
+    created_at: datetime
+    boot_delay: float = 0.0
+    region: str = ""
+    size: str = ""
+    image: str = ""
+    tags: list[str] = field(default_factory=list)
+    labels: dict[str, str] = field(default_factory=dict)
+    user_data: str = ""
+
+    def is_booted(self) -> bool:
+        """Return if server finished booting."""
+        return (datetime.now(UTC) - self.created_at).total_seconds() >= self.boot_delay
+
+    def is_off(self) -> bool:
+        """Return if server powered itself off after provisioning (cloud-init `power_state`)."""
+        return "power_state:" in self.user_data and self.is_booted()
+
+    def as_droplet(self) -> dict[str, Any]:
+        """Return DigitalOcean representation."""
+        booted = self.is_booted()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": "off" if self.is_off() else "active" if booted else "new",
+            "created_at": self.created_at.isoformat(),
+            "region": {"slug": self.region},
+            "size_slug": self.size,
+            "image": {"slug": self.image},
+            "tags": self.tags,
+            "networks": {
+                "v4": [{"ip_address": self.ipaddress, "type": "public", "netmask": "255.255.240.0"}] if booted else [],
+                "v6": [],
+            },
+        }
+
+    def as_hetzner_server(self) -> dict[str, Any]:
+        """Return Hetzner representation."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": "off" if self.is_off() else "running" if self.is_booted() else "initializing",
+            "created": self.created_at.isoformat(),
+            "datacenter": {"location": {"name": self.region}},
+            "server_type": {"name": self.size},
+            "image": {"name": self.image},
+            "labels": self.labels,
+            "public_net": {"ipv4": {"ip": self.ipaddress}, "ipv6": None},
+        }
+
+
+class EmulatorState:
+    """Thread safe in-memory state shared by all requests."""
+
+    def __init__(self, config: EmulatorConfig):
+        """Initialize."""
+        self.config = config
+        self.lock = threading.Lock()
+        self.servers: dict[int, EmulatedServer] = {}
+        self.images: dict[int, dict[str, Any]] = {}
+        self.actions: dict[int, dict[str, Any]] = {}
+        self.next_id = 100_000
+        self.next_ip = 1
+        self.rate_limits: dict[str, tuple[float, int]] = {}
+
+    def create_server(self, provider: str, **kwargs) -> EmulatedServer:
+        """Create new server."""
+        with self.lock:
+            server_id = self.next_id
+            self.next_id += 1
+            # 127.0.0.0/8 routes to loopback so every server can have its own address
+            ipaddress = self.config.server_address or f"127.0.{self.next_ip // 254}.{self.next_ip % 254 + 1}"
+            self.next_ip += 1
+            from_snapshot = kwargs.get("image", "").isdigit() and int(kwargs["image"]) in self.images
+            server = EmulatedServer(
+                id=server_id,
+                provider=provider,
+                ipaddress=ipaddress,
+                created_at=datetime.now(UTC),
+                boot_delay=self.config.image_boot_delay if from_snapshot else self.config.boot_delay,
+                **kwargs,
+            )
+            self.servers[server_id] = server
+            return server
+
+    def get_server(self, provider: str, server_id: int) -> EmulatedServer | None:
+        """Return server or None."""
+        server = self.servers.get(server_id)
+        if server is None or server.provider != provider:
+            return None
+        return server
+
+    def delete_server(self, provider: str, server_id: int) -> bool:
+        """Delete server. Return False when server doesn't exist."""
+        with self.lock:
+            if self.get_server(provider, server_id) is None:
+                return False
+            del self.servers[server_id]
+            return True
+
+    def create_action(self, provider: str, command: str, resource_id: int) -> dict[str, Any]:
+        """Create action finishing after `action_delay`."""
+        with self.lock:
+            action_id = self.next_id
+            self.next_id += 1
+            self.actions[action_id] = {
+                "id": action_id,
+                "provider": provider,
+                "command": command,
+                "resource_id": resource_id,
+                "started_at": datetime.now(UTC),
+            }
+        return self.actions[action_id]
+
+    def is_action_done(self, action: dict[str, Any]) -> bool:
+        """Return if action finished."""
+        return (datetime.now(UTC) - action["started_at"]).total_seconds() >= self.config.action_delay
+
+    def create_snapshot(self, server: EmulatedServer, name: str) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Create snapshot of server, return image and action creating it."""
+        action = self.create_action(server.provider, "snapshot", server.id)
+        with self.lock:
+            image_id = self.next_id
+            self.next_id += 1
+            image = {
+                "id": image_id,
+                "provider": server.provider,
+                "name": name,
+                "server_id": server.id,
+                "regions": [server.region],
+                "created_at": datetime.now(UTC).isoformat(),
+            }
+            self.images[image_id] = image
+        return image, action
+
+    def list_servers(self, provider: str) -> list[EmulatedServer]:
+        """Return provider servers ordered by id."""
+        with self.lock:
+            return sorted((s for s in self.servers.values() if s.provider == provider), key=lambda s: s.id)
+
+    def hit_rate_limit(self, provider: str) -> tuple[int, int, bool]:
+        """Count request against provider rate limit. Return remaining, reset timestamp and if limit is exceeded."""
+        now = time.time()
+        with self.lock:
+            window_start, count = self.rate_limits.get(provider, (now, 0))
+            if now - window_start >= self.config.rate_limit_window:
+                window_start, count = now, 0
+            count += 1
+            self.rate_limits[provider] = (window_start, count)
+        reset = int(window_start + self.config.rate_limit_window)
+        return max(self.config.rate_limit - count, 0), reset, count > self.config.rate_limit
+
+
+class EmulatorRequestHandler(BaseHTTPRequestHandler):
+    """Route requests to DigitalOcean or Hetzner handlers."""
+
+    server: EmulatorHTTPServer
+    protocol_version = "HTTP/1.1"
+
+    routes = [
+        ("POST", re.compile(rf"^{DO_PREFIX}/droplets/?$"), "do_create_droplet"),
+        ("GET", re.compile(rf"^{DO_PREFIX}/droplets/?$"), "do_list_droplets"),
+        ("GET", re.compile(rf"^{DO_PREFIX}/droplets/(?P<server_id>\d+)/?$"), "do_get_droplet"),
+        ("DELETE", re.compile(rf"^{DO_PREFIX}/droplets/(?P<server_id>\d+)/?$"), "do_delete_droplet"),
+        ("POST", re.compile(rf"^{DO_PREFIX}/projects/(?P<project_id>[^/]+)/resources/?$"), "do_project_resources"),
+        ("POST", re.compile(rf"^{DO_PREFIX}/droplets/(?P<server_id>\d+)/actions/?$"), "do_droplet_action"),
+        ("GET", re.compile(rf"^{DO_PREFIX}/droplets/(?P<server_id>\d+)/snapshots/?$"), "do_droplet_snapshots"),
+        ("POST", re.compile(rf"^{DO_PREFIX}/images/(?P<image_id>\d+)/actions/?$"), "do_image_action"),
+        ("GET", re.compile(rf"^{DO_PREFIX}/actions/(?P<action_id>\d+)/?$"), "do_get_action"),
+        ("POST", re.compile(rf"^{HETZNER_PREFIX}/servers/?$"), "hetzner_create_server"),
+        ("GET", re.compile(rf"^{HETZNER_PREFIX}/servers/?$"), "hetzner_list_servers"),
+        ("GET", re.compile(rf"^{HETZNER_PREFIX}/servers/(?P<server_id>\d+)/?$"), "hetzner_get_server"),
+        ("DELETE", re.compile(rf"^{HETZNER_PREFIX}/servers/(?P<server_id>\d+)/?$"), "hetzner_delete_server"),
+        (
+            "POST",
+            re.compile(rf"^{HETZNER_PREFIX}/servers/(?P<server_id>\d+)/actions/create_image/?$"),
+            "hetzner_create_image",
+        ),
+        ("GET", re.compile(rf"^{HETZNER_PREFIX}/actions/(?P<action_id>\d+)/?$"), "hetzner_get_action"),
+    ]
+
+    @property
+    def state(self) -> EmulatorState:
+        """Return shared emulator state."""
+        return self.server.state
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        """Log using logging instead of stderr."""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Handle GET."""
+        self.dispatch("GET")
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Handle POST."""
+        self.dispatch("POST")
+
+    def do_DELETE(self) -> None:  # noqa: N802
+        """Handle DELETE."""
+        self.dispatch("DELETE")
+
+    def dispatch(self, method: str) -> None:
+        """Find handler for request and call it."""
+        if self.path.startswith("http://"):
+            # request sent to emulated proxy
+            self.echo_origin()
+            return
+
+        url = urlsplit(self.path)
+        self.query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.body = self.read_body()
+
+        for route_method, pattern, handler in self.routes:
+            if route_method == method and (match := pattern.match(url.path)):
+                provider = "digitalocean" if url.path.startswith(DO_PREFIX) else "hetzner"
+                self.simulate_network()
+                remaining, reset, exceeded = self.state.hit_rate_limit(provider)
+                self.rate_limit_headers = {
+                    "RateLimit-Limit": str(self.state.config.rate_limit),
+                    "RateLimit-Remaining": str(remaining),
+                    "RateLimit-Reset": str(reset),
+                }
+                if exceeded:
+                    self.send_error_json(provider, HTTPStatus.TOO_MANY_REQUESTS, "rate_limit_exceeded")
+                    return
+                if random.random() < self.state.config.failure_rate:  # noqa: S311
+                    self.send_error_json(provider, HTTPStatus.SERVICE_UNAVAILABLE, "service_unavailable")
+                    return
+                getattr(self, handler)(**match.groupdict())
+                return
+
+        self.rate_limit_headers = {}
+        self.send_json(HTTPStatus.NOT_FOUND, {"id": "not_found", "message": "The resource could not be found."})
+
+    def read_body(self) -> dict[str, Any]:
+        """Read JSON body."""
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def simulate_network(self) -> None:
+        """Sleep for configured latency."""
+        config = self.state.config
+        delay = config.latency + random.uniform(0, config.jitter)  # noqa: S311
+        if delay > 0:
+            time.sleep(delay)
+
+    def send_json(self, status: int, data: dict[str, Any] | None = None) -> None:
+        """Send JSON response."""
+        body = json.dumps(data).encode() if data is not None else b""
+        self.send_response(status)
+        for name, value in getattr(self, "rate_limit_headers", {}).items():
+            self.send_header(name, value)
+        if data is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, provider: str, status: int, code: str) -> None:
+        """Send error in provider's format."""
+        message = HTTPStatus(status).phrase
+        if provider == "digitalocean":
+            self.send_json(status, {"id": code, "message": message})
+        else:
+            self.send_json(status, {"error": {"code": code, "message": message}})
+
+    def get_pagination(self) -> tuple[int, int]:
+        """Return page and per page from query."""
+        try:
+            page = max(int(self.query.get("page", 1)), 1)
+            per_page = min(max(int(self.query.get("per_page", 25)), 1), 200)
+        except ValueError:
+            page, per_page = 1, 25
+        return page, per_page
+
+    def echo_origin(self) -> None:
+        """Answer request sent through emulated proxy with address of the proxy."""
+        # drain request body so keep-alive connection stays usable
+        self.read_body()
+        self.rate_limit_headers = {}
+        self.send_json(HTTPStatus.OK, {"origin": self.connection.getsockname()[0]})
+
+    # DigitalOcean
+    # --------------------------------------------------------------------------
+
+    def do_create_droplet(self) -> None:
+        """Create droplet."""
+        if not self.body.get("name"):
+            self.send_error_json("digitalocean", HTTPStatus.UNPROCESSABLE_ENTITY, "unprocessable_entity")
+            return
+        server = self.state.create_server(
+            "digitalocean",
+            name=self.body["name"],
+            region=self.body.get("region", ""),
+            size=self.body.get("size", ""),
+            image=str(self.body.get("image", "")),
+            tags=self.body.get("tags", []),
+            user_data=self.body.get("user_data", ""),
+        )
+        self.send_json(HTTPStatus.ACCEPTED, {"droplet": server.as_droplet()})
+
+    def do_list_droplets(self) -> None:
+        """List droplets with optional tag filter."""
+        servers = self.state.list_servers("digitalocean")
+        if tag_name := self.query.get("tag_name"):
+            servers = [s for s in servers if tag_name in s.tags]
+        page, per_page = self.get_pagination()
+        chunk = servers[(page - 1) * per_page : page * per_page]
+
+        pages = {}
+        if page * per_page < len(servers):
+            query = {**self.query, "page": page + 1, "per_page": per_page}
+            # own address, not `Host` header, so the link can't point clients elsewhere
+            pages["next"] = f"{self.server.base_url}{DO_PREFIX}/droplets?{urlencode(query)}"
+        self.send_json(
+            HTTPStatus.OK,
+            {
+                "droplets": [s.as_droplet() for s in chunk],
+                "links": {"pages": pages},
+                "meta": {"total": len(servers)},
+            },
+        )
+
+    def do_get_droplet(self, server_id: str) -> None:
+        """Get droplet."""
+        server = self.state.get_server("digitalocean", int(server_id))
+        if server is None:
+            self.send_error_json("digitalocean", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        self.send_json(HTTPStatus.OK, {"droplet": server.as_droplet()})
+
+    def do_delete_droplet(self, server_id: str) -> None:
+        """Delete droplet."""
+        if not self.state.delete_server("digitalocean", int(server_id)):
+            self.send_error_json("digitalocean", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        self.send_json(HTTPStatus.NO_CONTENT)
+
+    def do_project_resources(self, project_id: str) -> None:
+        """Assign resources to project."""
+        resources = [
+            {"urn": urn, "assigned_at": datetime.now(UTC).isoformat(), "status": "ok"}
+            for urn in self.body.get("resources", [])
+        ]
+        self.send_json(HTTPStatus.OK, {"resources": resources})
+
+    def do_droplet_action(self, server_id: str) -> None:
+        """Run droplet action, only `snapshot` is supported."""
+        server = self.state.get_server("digitalocean", int(server_id))
+        if server is None:
+            self.send_error_json("digitalocean", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        if self.body.get("type") != "snapshot":
+            self.send_error_json("digitalocean", HTTPStatus.UNPROCESSABLE_ENTITY, "unprocessable_entity")
+            return
+        _, action = self.state.create_snapshot(server, self.body.get("name") or server.name)
+        self.send_json(HTTPStatus.CREATED, {"action": self.do_action(action)})
+
+    def do_droplet_snapshots(self, server_id: str) -> None:
+        """List snapshots of droplet."""
+        snapshots = [
+            {"id": image["id"], "name": image["name"], "regions": image["regions"], "created_at": image["created_at"]}
+            for image in self.state.images.values()
+            if image["provider"] == "digitalocean" and image["server_id"] == int(server_id)
+        ]
+        self.send_json(HTTPStatus.OK, {"snapshots": snapshots, "links": {}, "meta": {"total": len(snapshots)}})
+
+    def do_image_action(self, image_id: str) -> None:
+        """Run image action, only `transfer` is supported."""
+        image = self.state.images.get(int(image_id))
+        if image is None or image["provider"] != "digitalocean":
+            self.send_error_json("digitalocean", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        if self.body.get("type") != "transfer" or not self.body.get("region"):
+            self.send_error_json("digitalocean", HTTPStatus.UNPROCESSABLE_ENTITY, "unprocessable_entity")
+            return
+        action = self.state.create_action("digitalocean", "transfer", image["id"])
+        with self.state.lock:
+            image["regions"].append(self.body["region"])
+        self.send_json(HTTPStatus.CREATED, {"action": self.do_action(action)})
+
+    def do_get_action(self, action_id: str) -> None:
+        """Get action."""
+        action = self.state.actions.get(int(action_id))
+        if action is None or action["provider"] != "digitalocean":
+            self.send_error_json("digitalocean", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        self.send_json(HTTPStatus.OK, {"action": self.do_action(action)})
+
+    def do_action(self, action: dict[str, Any]) -> dict[str, Any]:
+        """Return DigitalOcean representation of action."""
+        return {
+            "id": action["id"],
+            "type": action["command"],
+            "status": "completed" if self.state.is_action_done(action) else "in-progress",
+            "resource_id": action["resource_id"],
+            "resource_type": "image" if action["command"] == "transfer" else "droplet",
+            "started_at": action["started_at"].isoformat(),
+        }
+
+    # Hetzner
+    # --------------------------------------------------------------------------
+
+    def hetzner_create_server(self) -> None:
+        """Create server."""
+        if not self.body.get("name"):
+            self.send_error_json("hetzner", HTTPStatus.UNPROCESSABLE_ENTITY, "invalid_input")
+            return
+        server = self.state.create_server(
+            "hetzner",
+            name=self.body["name"],
+            region=self.body.get("location", ""),
+            size=self.body.get("server_type", ""),
+            image=str(self.body.get("image", "")),
+            labels=self.body.get("labels", {}),
+            user_data=self.body.get("user_data", ""),
+        )
+        self.send_json(
+            HTTPStatus.CREATED,
+            {
+                "server": server.as_hetzner_server(),
+                "action": {"id": server.id, "command": "create_server", "status": "running"},
+            },
+        )
+
+    def hetzner_list_servers(self) -> None:
+        """List servers with optional label filter."""
+        servers = self.state.list_servers("hetzner")
+        if label_selector := self.query.get("label_selector"):
+            servers = [s for s in servers if label_selector in s.labels]
+        page, per_page = self.get_pagination()
+        chunk = servers[(page - 1) * per_page : page * per_page]
+        last_page = max((len(servers) + per_page - 1) // per_page, 1)
+        self.send_json(
+            HTTPStatus.OK,
+            {
+                "servers": [s.as_hetzner_server() for s in chunk],
+                "meta": {
+                    "pagination": {
+                        "page": page,
+                        "per_page": per_page,
+                        "previous_page": page - 1 if page > 1 else None,
+                        "next_page": page + 1 if page < last_page else None,
+                        "last_page": last_page,
+                        "total_entries": len(servers),
+                    }
+                },
+            },
+        )
+
+    def hetzner_get_server(self, server_id: str) -> None:
+        """Get server."""
+        server = self.state.get_server("hetzner", int(server_id))
+        if server is None:
+            self.send_error_json("hetzner", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        self.send_json(HTTPStatus.OK, {"server": server.as_hetzner_server()})
+
+    def hetzner_delete_server(self, server_id: str) -> None:
+        """Delete server."""
+        if not self.state.delete_server("hetzner", int(server_id)):
+            self.send_error_json("hetzner", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        self.send_json(
+            HTTPStatus.OK, {"action": {"id": int(server_id), "command": "delete_server", "status": "running"}}
+        )
+
+    def hetzner_create_image(self, server_id: str) -> None:
+        """Create snapshot of server."""
+        server = self.state.get_server("hetzner", int(server_id))
+        if server is None:
+            self.send_error_json("hetzner", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        image, action = self.state.create_snapshot(server, self.body.get("description") or server.name)
+        self.send_json(
+            HTTPStatus.CREATED,
+            {
+                "image": {"id": image["id"], "type": "snapshot", "description": image["name"], "status": "creating"},
+                "action": self.hetzner_action(action),
+            },
+        )
+
+    def hetzner_get_action(self, action_id: str) -> None:
+        """Get action."""
+        action = self.state.actions.get(int(action_id))
+        if action is None or action["provider"] != "hetzner":
+            self.send_error_json("hetzner", HTTPStatus.NOT_FOUND, "not_found")
+            return
+        self.send_json(HTTPStatus.OK, {"action": self.hetzner_action(action)})
+
+    def hetzner_action(self, action: dict[str, Any]) -> dict[str, Any]:
+        """Return Hetzner representation of action."""
+        done = self.state.is_action_done(action)
+        return {
+            "id": action["id"],
+            "command": "create_image",
+            "status": "success" if done else "running",
+            "progress": 100 if done else 0,
+            "resources": [{"id": action["resource_id"], "type": "server"}],
+            "started": action["started_at"].isoformat(),
+        }
+
+
+class EmulatorHTTPServer(ThreadingHTTPServer):
+    """HTTP server holding emulator state."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], state: EmulatorState):
+        """Initialize."""
+        super().__init__(address, EmulatorRequestHandler)
+        self.state = state
+        host, port = self.server_address[:2]
+        self.base_url = f"http://{host}:{port}"
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import django_filters
+
+from proxies.proxies.models import Proxy
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    """Filter by comma separated values."""
+
+
+class ProxyFilter(django_filters.FilterSet):
+    """Filters for proxy listings, every filter is backed by an index."""
+
+    active = django_filters.BooleanFilter()
+    region = CharInFilter()
+    min_score = django_filters.NumberFilter(field_name="score", lookup_expr="gte")
+    updated_since = django_filters.IsoDateTimeFilter(field_name="updated_at", lookup_expr="gte")
+
+    class Meta:
+        model = Proxy
+        fields = ["provider", "active", "region", "min_score", "updated_since"]
@@ -0,0 +1,88 @@
+"""
+Consistent hash ring mapping client sessions to active proxies.
+
+Every proxy is placed on the ring at `HASH_RING_REPLICAS` points so when a proxy is added or removed only sessions
+from its arcs move to the neighbouring proxies, all other sessions keep their proxy.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import threading
+import uuid
+from collections.abc import Container
+
+from django.conf import settings
+
+from proxies.proxies.blacklist import get_blacklisted_ids
+from proxies.proxies.models import Client
+from proxies.proxies.pool import get_active_pool
+from proxies.proxies.quarantine import get_quarantined_ids
+
+
+def get_hash(value: str) -> int:
+    """Return stable 64 bit hash of value, same in all processes unlike built-in `hash`."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring over proxy rows with O(log n) lookups."""
+
+    def __init__(self, rows: list[dict], replicas: int):
+        """Place every proxy on the ring `replicas` times."""
+        self.rows = {row["id"]: row for row in rows}
+        points = sorted((get_hash(f"{row['id']}-{replica}"), row["id"]) for row in rows for replica in range(replicas))
+        self.hashes = [point[0] for point in points]
+        self.ids = [point[1] for point in points]
+
+    def __len__(self) -> int:
+        """Return number of proxies on the ring."""
+        return len(self.rows)
+
+    def get(self, key: str, exclude: Container[uuid.UUID] = ()) -> dict | None:
+        """Return row of the first proxy clockwise from key skipping excluded ones, `None` when none is left."""
+        if not self.ids:
+            return None
+        start = bisect.bisect(self.hashes, get_hash(key))
+        for offset in range(len(self.ids)):
+            pk = self.ids[(start + offset) % len(self.ids)]
+            if pk not in exclude:
+                return self.rows[pk]
+        return None
+
+
+_ring_lock = threading.Lock()
+# regions -> (active pool the ring was built from, ring)
+_rings: dict[frozenset[str], tuple[list[dict], HashRing]] = {}
+
+
+def get_active_ring(regions: frozenset[str] = frozenset()) -> HashRing:
+    """Return ring of active proxies (from regions when given), rebuilt only when cached active pool changes."""
+    pool = get_active_pool()
+    with _ring_lock:
+        cached = _rings.get(regions)
+        # locally cached pool is the same object until it expires or is invalidated
+        if cached is None or cached[0] is not pool:
+            rows = [row for row in pool if row["region"] in regions] if regions else pool
+            cached = _rings[regions] = (pool, HashRing(rows, settings.HASH_RING_REPLICAS))
+        return cached[1]
+
+
+def get_sticky_proxy(client: Client, session: str) -> dict | None:
+    """
+    Return proxy assigned to client's session, blacklisted and quarantined proxies are skipped.
+
+    Sessions of client with preferred regions are assigned on ring of proxies from those regions, the whole pool is
+    used only when none of them is available.
+    """
+    key = f"{client.name}:{session}"
+    excluded = get_blacklisted_ids(client) | get_quarantined_ids()
+    row = None
+    if client.preferred_regions:
+        row = get_active_ring(frozenset(client.preferred_regions)).get(key, exclude=excluded)
+    if row is None:
+        row = get_active_ring().get(key, exclude=excluded)
+    if row is None:
+        return None
+    return {**row, "client_default": row["id"] == client.default_proxy_id}
@@ -0,0 +1,185 @@
+"""
+Pool health rollups maintained incrementally from check runs.
+
+Every `check_all_proxies` run collects its results in `CheckRunStats` and adds them to the `PoolHealthRollup` row of
+each provider and current hour, so reports read few rollup rows instead of aggregating proxies and their history.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, PositiveIntegerField, Q, QuerySet, When
+from django.utils import timezone
+
+from proxies.proxies.models import PoolHealthRollup, Proxy
+
+# upper bounds of histogram buckets, last one catches everything above
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+READY_BUCKETS = (30, 60, 120, 180, 300, 450, 600, 900, 1200, 1800, 3600, float("inf"))
+
+
+def observe(counts: list[int], bounds: tuple[float, ...], value: float) -> None:
+    """Count value into histogram bucket."""
+    counts[bisect.bisect_left(bounds, value)] += 1
+
+
+def merge(counts: list[int], other: list[int]) -> list[int]:
+    """Return sum of two histograms, empty one (of new rollup) is treated as zeros."""
+    if not counts:
+        return list(other)
+    if not other:
+        return list(counts)
+    return [a + b for a, b in zip(counts, other, strict=True)]
+
+
+def estimate_quantile(counts: list[int], bounds: tuple[float, ...], q: float) -> float | None:
+    """Estimate quantile from histogram by linear interpolation inside the bucket it falls into."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            lower = bounds[index - 1] if index else 0
+            upper = bounds[index]
+            if upper == float("inf"):
+                return lower
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return bounds[-2]
+
+
+@dataclass
+class ProviderRunStats:
+    """Results of one check run for one provider."""
+
+    checks: int = 0
+    failures: int = 0
+    latency_buckets: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    ready_count: int = 0
+    ready_buckets: list[int] = field(default_factory=lambda: [0] * len(READY_BUCKETS))
+
+
+class CheckRunStats:
+    """Collect results of check run and add them to rollups and per proxy counters at its end."""
+
+    def __init__(self):
+        """Initialize."""
+        self.providers: dict[str, ProviderRunStats] = defaultdict(ProviderRunStats)
+        self.checked: list[uuid.UUID] = []
+        self.failed: list[uuid.UUID] = []
+        # checks can run in threads of `proxies_check` command
+        self._lock = threading.Lock()
+
+    def add_check(self, proxy: Proxy, ok: bool, was_ready: bool) -> None:
+        """Record check of proxy, `was_ready` tells if proxy was ready (had `ready_at`) before the check."""
+        with self._lock:
+            stats = self.providers[proxy.provider]
+            stats.checks += 1
+            self.checked.append(proxy.pk)
+            if not ok:
+                stats.failures += 1
+                self.failed.append(proxy.pk)
+            if proxy.probe_duration is not None:
+                observe(stats.latency_buckets, LATENCY_BUCKETS, proxy.probe_duration)
+            if not was_ready and proxy.ready_at and proxy.create_request_at:
+                stats.ready_count += 1
+                ready = (proxy.ready_at - proxy.create_request_at).total_seconds()
+                observe(stats.ready_buckets, READY_BUCKETS, ready)
+
+    @transaction.atomic
+    def save(self) -> None:
+        """Add collected results to rollups of current hour, proxy state counts are snapshot at the end of run."""
+        if passed := set(self.checked) - set(self.failed):
+            Proxy.objects.filter(pk__in=passed).update(check_count=F("check_count") + 1, consecutive_failures=0)
+        if self.failed:
+            # failures of proxy which isn't ready yet don't count towards remediation until its boot grace passes
+            booted = (
+                Q(ready_at__isnull=False)
+                | Q(create_request_at__isnull=True)
+                | Q(create_request_at__lt=timezone.now() - timedelta(seconds=settings.PROXY_REMEDIATION_GRACE))
+            )
+            Proxy.objects.filter(pk__in=self.failed).update(
+                check_count=F("check_count") + 1,
+                failed_check_count=F("failed_check_count") + 1,
+                consecutive_failures=Case(
+                    When(booted, then=F("consecutive_failures") + 1),
+                    default=F("consecutive_failures"),
+                    output_field=PositiveIntegerField(),
+                ),
+            )
+
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        states = {
+            row["provider"]: row
+            for row in Proxy.objects.order_by()
+            .values("provider")
+            .annotate(
+                active_count=Count("pk", filter=Q(active=True)),
+                inactive_count=Count("pk", filter=Q(active=False)),
+                reported_count=Count("pk", filter=Q(reported=True)),
+            )
+        }
+        for provider in states.keys() | self.providers.keys():
+            stats = self.providers.get(provider, ProviderRunStats())
+            state = states.get(provider, {})
+            rollup, _ = PoolHealthRollup.objects.select_for_update().get_or_create(provider=provider, hour=hour)
+            rollup.active_count = state.get("active_count", 0)
+            rollup.inactive_count = state.get("inactive_count", 0)
+            rollup.reported_count = state.get("reported_count", 0)
+            rollup.checks += stats.checks
+            rollup.failures += stats.failures
+            rollup.latency_buckets = merge(rollup.latency_buckets, stats.latency_buckets)
+            rollup.ready_count += stats.ready_count
+            rollup.ready_buckets = merge(rollup.ready_buckets, stats.ready_buckets)
+            rollup.save()
+
+
+def summarize(rollups: QuerySet[PoolHealthRollup] | list[PoolHealthRollup]) -> dict:
+    """Return health summary merged from rollups (of one provider)."""
+    checks = failures = ready_count = 0
+    latency_buckets: list[int] = []
+    ready_buckets: list[int] = []
+    for rollup in rollups:
+        checks += rollup.checks
+        failures += rollup.failures
+        ready_count += rollup.ready_count
+        latency_buckets = merge(latency_buckets, rollup.latency_buckets)
+        ready_buckets = merge(ready_buckets, rollup.ready_buckets)
+    return {
+        "checks": checks,
+        "failures": failures,
+        "success_rate": 1 - failures / checks if checks else None,
+        "median_latency": estimate_quantile(latency_buckets, LATENCY_BUCKETS, 0.5),
+        "ready_count": ready_count,
+        "median_time_to_ready": estimate_quantile(ready_buckets, READY_BUCKETS, 0.5),
+    }
+
+
+def get_health_report(since: datetime | None = None) -> dict:
+    """Return current state and summary since time (last 7 days by default) per provider."""
+    since = since or timezone.now() - timedelta(days=7)
+    rollups = defaultdict(list)
+    for rollup in PoolHealthRollup.objects.filter(hour__gte=since).order_by("hour"):
+        rollups[rollup.provider].append(rollup)
+
+    report = {}
+    for provider, provider_rollups in rollups.items():
+        last = provider_rollups[-1]
+        report[provider] = {
+            "hour": last.hour,
+            "active_count": last.active_count,
+            "inactive_count": last.inactive_count,
+            "reported_count": last.reported_count,
+            **summarize(provider_rollups),
+        }
+    return report
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterable, Iterator
+
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q, QuerySet, Value
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+import orjson
+
+from proxies.proxies.models import Client, Proxy
+
+# must match `ProxySerializer.Meta.fields`
+PROXY_LIST_FIELDS = ("id", "server_id", "name", "ipaddress", "provider", "region")
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def _prepare(queryset: QuerySet[Proxy], client: Client | None) -> tuple[QuerySet[Proxy], tuple[str, ...]]:
+    fields = PROXY_LIST_FIELDS
+    if client is not None:
+        if client.default_proxy_id is None:
+            client_default = Value(False)
+        else:
+            client_default = ExpressionWrapper(Q(pk=client.default_proxy_id), output_field=BooleanField())
+        queryset = queryset.annotate(client_default=client_default)
+        fields += ("client_default",)
+    return queryset, fields
+
+
+def get_proxy_rows(queryset: QuerySet[Proxy], client: Client | None = None) -> list[dict]:
+    """
+    Return proxies in the same shape as `ProxySerializer` without serializer overhead.
+
+    Only exposed columns are selected and `client_default` (present only for client) is computed in SQL.
+    """
+    queryset, fields = _prepare(queryset, client)
+    return [dict(zip(fields, row, strict=True)) for row in queryset.values_list(*fields)]
+
+
+def iter_proxy_rows(queryset: QuerySet[Proxy], client: Client | None = None) -> Iterator[dict]:
+    """Yield rows like `get_proxy_rows` but fetch them from DB in chunks."""
+    queryset, fields = _prepare(queryset, client)
+    for row in queryset.values_list(*fields).iterator(chunk_size=settings.PROXY_LIST_STREAM_CHUNK_SIZE):
+        yield dict(zip(fields, row, strict=True))
+
+
+def render_proxy_rows(request: Request, rows: list[dict] | dict) -> HttpResponse:
+    """
+    Encode rows with orjson for JSON requests, use DRF rendering for the browsable API.
+
+    JSON responses have `ETag` of their content, when client sends it back in `If-None-Match` and content didn't
+    change empty `304 Not Modified` response is returned.
+    """
+    if request.accepted_renderer.format == "json":
+        content = orjson.dumps(rows)
+        etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type="application/json")
+        response["ETag"] = etag
+        return response
+    return Response(rows)
+
+
+def wants_stream(request: Request) -> bool:
+    """Return if client asked for streamed JSON response (`?stream=1`)."""
+    return request.accepted_renderer.format == "json" and request.query_params.get("stream") in ("1", "true")
+
+
+def stream_proxy_rows(rows: Iterable[dict]) -> StreamingHttpResponse:
+    """Return JSON array encoded incrementally so memory stays flat and client can start parsing early."""
+
+    def generate() -> Iterator[bytes]:
+        buffer = bytearray(b"[")
+        separator = b""
+        for row in rows:
+            buffer += separator
+            buffer += orjson.dumps(row)
+            separator = b","
+            if len(buffer) >= STREAM_BUFFER_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b"]"
+        yield bytes(buffer)
+
+    return StreamingHttpResponse(generate(), content_type="application/json")
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.renderers import JSONRenderer
+
+import orjson
+
+from proxies.proxies.listing import get_proxy_rows
+from proxies.proxies.models import Client, Proxy
+from proxies.proxies.serializers import ProxySerializer
+
+
+class RollbackError(Exception):
+    """Raised to roll back benchmark data."""
+
+
+class Command(BaseCommand):
+    """Compare proxy list rendering through `ProxySerializer` and the fast path."""
+
+    help = "Benchmark proxy list rendering. Test data are created in transaction which is rolled back."
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument("--count", type=int, nargs="+", default=[1000, 10000], help="Numbers of proxies.")
+        parser.add_argument("--repeat", type=int, default=5, help="Best of N runs is reported.")
+
+    def handle(self, *args, **options):
+        """Run benchmark."""
+        for count in options["count"]:
+            try:
+                with transaction.atomic():
+                    self.benchmark(count, options["repeat"])
+                    raise RollbackError
+            except RollbackError:
+                pass
+
+    def benchmark(self, count: int, repeat: int) -> None:
+        """Create `count` proxies and time both rendering paths."""
+        Proxy.objects.bulk_create(
+            Proxy(name=f"benchmark{i:06d}", provider=Proxy.ProviderChoices.HETZNER, server_id=i, active=True)
+            for i in range(count)
+        )
+        default_proxy = Proxy.objects.filter(active=True).first()
+        client = Client.objects.create(name="benchmark-client", default_proxy=default_proxy)
+        queryset = Proxy.objects.filter(active=True)
+
+        def serializer() -> bytes:
+            data = ProxySerializer(queryset.all(), many=True, context={"client": client}).data
+            return JSONRenderer().render(data)
+
+        def fast() -> bytes:
+            return orjson.dumps(get_proxy_rows(queryset.all(), client))
+
+        if orjson.loads(serializer()) != orjson.loads(fast()):
+            raise CommandError("Fast path output differs from serializer output.")
+
+        serializer_time = self.best_of(serializer, repeat)
+        fast_time = self.best_of(fast, repeat)
+        self.stdout.write(
+            f"{count:>7} proxies: serializer {serializer_time * 1000:8.1f} ms, "
+            f"fast path {fast_time * 1000:8.1f} ms, speedup {serializer_time / fast_time:5.1f}x"
+        )
+
+    @staticmethod
+    def best_of(func: Callable[[], bytes], repeat: int) -> float:
+        """Return the best time of `repeat` runs."""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from proxies.proxies.models import Proxy, ProxyImage
+from proxies.proxies.services.digitalocean import DigitalOceanService
+from proxies.proxies.services.hetzner import HetznerService
+
+SERVICES = {
+    Proxy.ProviderChoices.DIGITALOCEAN: DigitalOceanService,
+    Proxy.ProviderChoices.HETZNER: HetznerService,
+}
+
+
+class Command(BaseCommand):
+    """Build provider snapshot with squid preinstalled."""
+
+    help = (
+        "Boot builder server installing squid, snapshot it and record the snapshot as image of new proxies. "
+        "New proxies then only get credentials on boot."
+    )
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument("--provider", choices=Proxy.ProviderChoices.values, required=True)
+        parser.add_argument("--name", help="Snapshot name, generated when not set.")
+        parser.add_argument(
+            "--no-activate", action="store_true", help="Only record the image, don't use it for new proxies."
+        )
+
+    def handle(self, *args, **options):
+        """Build image."""
+        provider = options["provider"]
+        name = options["name"] or f"proxy-{timezone.now():%Y%m%d%H%M%S}"
+
+        start = time.monotonic()
+        try:
+            image_id = SERVICES[provider].build_image(name)
+        except Exception as e:
+            raise CommandError(f"Building image {name} failed: {e}") from e
+        duration = time.monotonic() - start
+
+        with transaction.atomic():
+            if not options["no_activate"]:
+                ProxyImage.objects.filter(provider=provider, active=True).update(active=False)
+            ProxyImage.objects.create(
+                provider=provider,
+                image_id=image_id,
+                name=name,
+                active=not options["no_activate"],
+                build_duration=duration,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Image {name} ({image_id}) built in {duration:.0f} s."))
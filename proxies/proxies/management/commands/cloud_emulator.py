@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from proxies.proxies.emulator import DO_PREFIX, HETZNER_PREFIX, EmulatorConfig, EmulatorHTTPServer, EmulatorState
+
+
+class Command(BaseCommand):
+    """Run local DigitalOcean/Hetzner API emulator."""
+
+    help = "Run local DigitalOcean/Hetzner API emulator for offline testing."
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+        parser.add_argument("--port", type=int, default=8080, help="API port.")
+        parser.add_argument(
+            "--proxy-port",
+            type=int,
+            default=None,
+            help=(
+                f"Also answer as proxy on this port (usually {settings.PROXY_PORT}) of --host, all servers then get "
+                "--host address."
+            ),
+        )
+        parser.add_argument("--boot-delay", type=float, default=30.0, help="Seconds until new server is ready.")
+        parser.add_argument(
+            "--image-boot-delay", type=float, default=5.0, help="Seconds until server created from snapshot is ready."
+        )
+        parser.add_argument("--action-delay", type=float, default=2.0, help="Seconds until action (snapshot) is done.")
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every API response.")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency up to this many seconds.")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability (0-1) of 503 response.")
+        parser.add_argument("--rate-limit", type=int, default=5000, help="Requests per window per provider.")
+        parser.add_argument("--rate-limit-window", type=int, default=3600, help="Rate limit window in seconds.")
+
+    def handle(self, *args, **options):
+        """Run emulator until interrupted."""
+        state = EmulatorState(
+            EmulatorConfig(
+                boot_delay=options["boot_delay"],
+                image_boot_delay=options["image_boot_delay"],
+                action_delay=options["action_delay"],
+                latency=options["latency"],
+                jitter=options["jitter"],
+                failure_rate=options["failure_rate"],
+                rate_limit=options["rate_limit"],
+                rate_limit_window=options["rate_limit_window"],
+                server_address=options["host"] if options["proxy_port"] else None,
+            )
+        )
+
+        if options["proxy_port"]:
+            proxy_server = EmulatorHTTPServer((options["host"], options["proxy_port"]), state)
+            threading.Thread(target=proxy_server.serve_forever, daemon=True).start()
+
+        server = EmulatorHTTPServer((options["host"], options["port"]), state)
+        self.stdout.write(f"DO_API_URL={server.base_url}{DO_PREFIX}")
+        self.stdout.write(f"HETZNER_API_URL={server.base_url}{HETZNER_PREFIX}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config.locks import HeartbeatLock
+from proxies.proxies.health import CheckRunStats
+from proxies.proxies.models import Proxy
+from proxies.proxies.runner import ApiCalls, StepResult, format_table, run_steps, summarize_durations
+from proxies.proxies.tasks import (
+    check_proxy,
+    needs_check,
+    remediate_failing_proxies,
+    teardown_replaced_proxies,
+    update_reported,
+)
+
+
+class Command(BaseCommand):
+    """Run `check_all_proxies` in process with concurrent checks."""
+
+    help = (
+        "Check proxies like `check_all_proxies` task but concurrently and without Celery, "
+        "print summary of timings and provider API calls."
+    )
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument("--concurrency", type=int, default=20, help="Number of proxies checked at once.")
+        parser.add_argument(
+            "--provider", choices=Proxy.ProviderChoices.values, action="append", help="Check only proxies of provider."
+        )
+        parser.add_argument("--all", action="store_true", help="Check also active proxies checked in last hour.")
+        parser.add_argument("--dry-run", action="store_true", help="Only print which proxies would be checked.")
+        parser.add_argument(
+            "--remediate",
+            action="store_true",
+            help="After checks delete replaced proxies and replace failing ones in process, skipped by default.",
+        )
+
+    def handle(self, *args, **options):
+        """Check proxies."""
+        if options["concurrency"] < 1:
+            raise CommandError("Concurrency must be at least 1.")
+        self.verbosity = options["verbosity"]
+
+        proxies = Proxy.objects.filter(server_id__isnull=False).order_by("name")
+        if options["provider"]:
+            proxies = proxies.filter(provider__in=options["provider"])
+        to_check, skipped = [], []
+        for proxy in proxies:
+            (to_check if options["all"] or needs_check(proxy) else skipped).append(proxy)
+
+        if options["dry_run"]:
+            self.print_plan(to_check, skipped)
+            return
+
+        # the same lock as the task so they don't run at once
+        with HeartbeatLock("check_all_proxies") as acquired:
+            if not acquired:
+                raise CommandError("check_all_proxies is already running.")
+            self.check(to_check, skipped, options["concurrency"], options["remediate"])
+
+    def check(self, to_check: list[Proxy], skipped: list[Proxy], concurrency: int, remediate: bool) -> None:
+        """Check proxies concurrently and print summary."""
+        start = time.perf_counter()
+        api_calls = ApiCalls()
+        stats = CheckRunStats()
+
+        def make_step(proxy: Proxy):
+            def step() -> bool:
+                ok = check_proxy(proxy, stats)
+                update_reported(proxy)
+                return ok
+
+            return proxy.provider, step
+
+        results = asyncio.run(run_steps((make_step(proxy) for proxy in to_check), concurrency))
+        for proxy in skipped:
+            update_reported(proxy)
+        stats.save()
+        # unlike the task remediation isn't queued to Celery, it runs here only when asked
+        if remediate:
+            teardown_replaced_proxies(in_process=True)
+            if settings.PROXY_REMEDIATION_THRESHOLD:
+                remediate_failing_proxies()
+
+        for proxy, result in zip(to_check, results, strict=True):
+            if result.error:
+                self.stderr.write(f"{proxy.name}: {result.error}")
+        self.print_summary(results, api_calls.get(), time.perf_counter() - start, concurrency)
+
+    def print_plan(self, to_check: list[Proxy], skipped: list[Proxy]) -> None:
+        """Print proxies which would be checked."""
+        counts = defaultdict(lambda: [0, 0])
+        for proxy in to_check:
+            counts[proxy.provider][0] += 1
+            if self.verbosity > 1:
+                self.stdout.write(f"{proxy.provider:<14} {proxy.name}")
+        for proxy in skipped:
+            counts[proxy.provider][1] += 1
+        rows = [(provider, *counts[provider]) for provider in sorted(counts)]
+        for line in format_table(("provider", "to check", "skipped"), rows):
+            self.stdout.write(line)
+
+    def print_summary(
+        self, results: list[StepResult], api_calls: dict[str, tuple[int, int]], duration: float, concurrency: int
+    ) -> None:
+        """Print table of check results per provider."""
+        groups = defaultdict(list)
+        for result in results:
+            groups[result.group].append(result)
+        rows = []
+        for provider in sorted(groups.keys() | api_calls.keys()):
+            provider_results = groups.get(provider, [])
+            total, median, longest = summarize_durations([result.duration for result in provider_results])
+            rows.append(
+                (
+                    provider,
+                    len(provider_results),
+                    sum(result.ok for result in provider_results),
+                    sum(not result.ok for result in provider_results),
+                    sum(result.error is not None for result in provider_results),
+                    total,
+                    median,
+                    longest,
+                    *api_calls.get(provider, (0, 0)),
+                )
+            )
+        headers = (
+            "provider",
+            "checked",
+            "passed",
+            "failed",
+            "errors",
+            "total s",
+            "p50 s",
+            "max s",
+            "api calls",
+            "api errors",
+        )
+        for line in format_table(headers, rows):
+            self.stdout.write(line)
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {len(results)} proxies in {duration:.2f} s with concurrency {concurrency}.")
+        )
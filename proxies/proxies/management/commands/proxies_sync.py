@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config.locks import HeartbeatLock
+from proxies.proxies.models import Proxy
+from proxies.proxies.runner import ApiCalls, StepResult, format_table, run_steps, summarize_durations
+from proxies.proxies.services.base import BaseService, SyncPlan
+from proxies.proxies.services.digitalocean import DigitalOceanService
+from proxies.proxies.services.hetzner import HetznerService
+
+SERVICES: dict[str, type[BaseService]] = {
+    Proxy.ProviderChoices.DIGITALOCEAN: DigitalOceanService,
+    Proxy.ProviderChoices.HETZNER: HetznerService,
+}
+
+
+class Command(BaseCommand):
+    """Run `update_proxies_from_services` in process with concurrent provider listing and checks of new proxies."""
+
+    help = (
+        "Sync proxies with servers on providers like `update_proxies_from_services` task but concurrently and without "
+        "Celery, print summary of timings and provider API calls."
+    )
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument("--concurrency", type=int, default=20, help="Number of new proxies checked at once.")
+        parser.add_argument(
+            "--provider", choices=Proxy.ProviderChoices.values, action="append", help="Sync only proxies of provider."
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="List servers and print changes without making them."
+        )
+
+    def handle(self, *args, **options):
+        """Sync proxies."""
+        if options["concurrency"] < 1:
+            raise CommandError("Concurrency must be at least 1.")
+        self.verbosity = options["verbosity"]
+        providers = sorted(options["provider"] or SERVICES)
+
+        if options["dry_run"]:
+            self.sync(providers, options["concurrency"], dry_run=True)
+            return
+
+        # the same lock as the task so they don't run at once
+        with HeartbeatLock("update_proxies_from_services") as acquired:
+            if not acquired:
+                raise CommandError("update_proxies_from_services is already running.")
+            self.sync(providers, options["concurrency"], dry_run=False)
+
+    def sync(self, providers: list[str], concurrency: int, dry_run: bool) -> None:
+        """Sync providers and print summary."""
+        start = time.perf_counter()
+        api_calls = ApiCalls()
+        servers, fetches = self.fetch(providers, concurrency)
+        plans, checks = self.apply(servers, concurrency, dry_run)
+        if dry_run and self.verbosity > 1:
+            self.print_plans(plans)
+        self.print_summary(providers, servers, plans, fetches, checks, api_calls.get())
+
+        duration = time.perf_counter() - start
+        message = f"Synced {len(plans)} of {len(providers)} providers in {duration:.2f} s"
+        if dry_run:
+            message += ", dry run made no changes"
+        self.stdout.write(self.style.SUCCESS(f"{message}."))
+        if len(plans) < len(providers):
+            raise CommandError("Listing of some providers failed.")
+
+    def fetch(self, providers: list[str], concurrency: int) -> tuple[dict[str, list[dict]], list[StepResult]]:
+        """List servers of providers at once, providers whose listing failed are left out."""
+        servers: dict[str, list[dict]] = {}
+
+        def make_fetch(provider: str):
+            def fetch() -> bool:
+                servers[provider] = SERVICES[provider].fetch_servers()
+                return True
+
+            return provider, fetch
+
+        fetches = asyncio.run(run_steps((make_fetch(provider) for provider in providers), concurrency))
+        for result in fetches:
+            if result.error:
+                self.stderr.write(f"Can't list {result.group} servers: {result.error}")
+        return servers, fetches
+
+    def apply(
+        self, servers: dict[str, list[dict]], concurrency: int, dry_run: bool
+    ) -> tuple[dict[str, SyncPlan], list[StepResult]]:
+        """Plan changes of listed providers and unless dry run make them and check new proxies concurrently."""
+        plans: dict[str, SyncPlan] = {}
+        new_proxies: list[Proxy] = []
+        for provider in sorted(servers):
+            plans[provider] = SERVICES[provider].plan_sync(servers[provider])
+            if not dry_run:
+                new_proxies += SERVICES[provider].sync_servers(servers[provider])
+
+        def make_check(proxy: Proxy):
+            def check() -> bool:
+                BaseService.check_new_proxy(proxy)
+                return proxy.active
+
+            return proxy.provider, check
+
+        return plans, asyncio.run(run_steps((make_check(proxy) for proxy in new_proxies), concurrency))
+
+    def print_plans(self, plans: dict[str, SyncPlan]) -> None:
+        """Print changes sync would make."""
+        for provider, plan in plans.items():
+            for action, names in (("create", plan.created), ("update", plan.updated), ("remove", plan.removed)):
+                for name in names:
+                    self.stdout.write(f"{provider:<14} {action:<8} {name}")
+
+    def print_summary(
+        self,
+        providers: list[str],
+        servers: dict[str, list[dict]],
+        plans: dict[str, SyncPlan],
+        fetches: list[StepResult],
+        checks: list[StepResult],
+        api_calls: dict[str, tuple[int, int]],
+    ) -> None:
+        """Print table of sync results per provider."""
+        fetch_durations = {result.group: result.duration for result in fetches}
+        provider_checks = defaultdict(list)
+        for result in checks:
+            provider_checks[result.group].append(result)
+        rows = []
+        for provider in providers:
+            plan = plans.get(provider, SyncPlan())
+            _, _, longest = summarize_durations([result.duration for result in provider_checks[provider]])
+            rows.append(
+                (
+                    provider,
+                    len(servers[provider]) if provider in servers else "error",
+                    len(plan.created),
+                    len(plan.updated),
+                    len(plan.removed),
+                    fetch_durations.get(provider, 0.0),
+                    sum(result.ok for result in provider_checks[provider]),
+                    longest,
+                    *api_calls.get(provider, (0, 0)),
+                )
+            )
+        headers = (
+            "provider",
+            "servers",
+            "created",
+            "updated",
+            "removed",
+            "list s",
+            "new active",
+            "check max s",
+            "api calls",
+            "api errors",
+        )
+        for line in format_table(headers, rows):
+            self.stdout.write(line)
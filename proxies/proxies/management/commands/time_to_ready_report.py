@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import statistics
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+
+from proxies.proxies.models import Proxy
+
+
+class Command(BaseCommand):
+    """Report time from create request to ready of new proxies per provider and image."""
+
+    help = "Compare time to ready of proxies created from stock image and from prebaked images."
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument("--days", type=int, default=30, help="Include proxies created in last days.")
+
+    def handle(self, *args, **options):
+        """Print report."""
+        rows = (
+            Proxy.objects.filter(
+                ready_at__isnull=False,
+                create_request_at__gte=timezone.now() - timedelta(days=options["days"]),
+            )
+            .annotate(time_to_ready=F("ready_at") - F("create_request_at"))
+            .values_list("provider", "image__name", "time_to_ready")
+        )
+        durations = defaultdict(list)
+        for provider, image, time_to_ready in rows:
+            durations[provider, image or "stock"].append(time_to_ready.total_seconds())
+
+        if not durations:
+            self.stdout.write("No proxy got ready in selected period.")
+            return
+
+        self.stdout.write(f"{'provider':<14} {'image':<28} {'proxies':>8} {'median':>8} {'p90':>8} {'max':>8}")
+        for (provider, image), values in sorted(durations.items()):
+            p90 = statistics.quantiles(values, n=10)[-1] if len(values) > 1 else values[0]
+            self.stdout.write(
+                f"{provider:<14} {image:<28} {len(values):>8} {statistics.median(values):>8.0f} "
+                f"{p90:>8.0f} {max(values):>8.0f}"
+            )
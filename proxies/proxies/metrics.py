@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import os
+import re
+from collections.abc import Iterator
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+PROVIDER_API_DURATION = Histogram(
+    "proxies_provider_api_request_duration_seconds",
+    "Duration of requests to cloud provider APIs.",
+    ["provider", "method", "endpoint"],
+)
+PROVIDER_API_RESPONSES = Counter(
+    "proxies_provider_api_responses_total",
+    "Responses from cloud provider APIs by status code (`error` when request failed).",
+    ["provider", "method", "endpoint", "status"],
+)
+CHECK_RUN_DURATION = Histogram(
+    "proxies_check_all_proxies_duration_seconds",
+    "Duration of `check_all_proxies` task run.",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200, float("inf")),
+)
+PROXY_PROBE_DURATION = Histogram(
+    "proxies_proxy_probe_duration_seconds",
+    "Duration of request sent through proxy to verify it works.",
+    ["provider", "result"],
+)
+PROXY_TIME_TO_READY = Histogram(
+    "proxies_proxy_time_to_ready_seconds",
+    "Time from create request to first successful check of new proxy.",
+    ["provider"],
+    buckets=(30, 60, 120, 180, 300, 450, 600, 900, 1200, 1800, 3600, float("inf")),
+)
+PROXY_REMEDIATIONS = Counter(
+    "proxies_proxy_remediations_total",
+    "Failing proxies replaced automatically (`result` is `error` when replacement couldn't be created).",
+    ["provider", "result"],
+)
+PROXY_QUARANTINES = Counter(
+    "proxies_proxy_quarantines_total",
+    "Proxies quarantined on client reports and results of their re-verification (`restored`, `failed`).",
+    ["result"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "proxies_http_request_duration_seconds",
+    "Duration of requests served by the manager.",
+    ["method", "view", "status"],
+)
+DB_QUERIES = Histogram(
+    "proxies_db_queries",
+    "Number of SQL queries per request or Celery task.",
+    ["source"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250, float("inf")),
+)
+DB_DURATION = Histogram(
+    "proxies_db_duration_seconds",
+    "Total time spent in SQL queries per request or Celery task.",
+    ["source"],
+)
+DB_DUPLICATE_QUERIES = Counter(
+    "proxies_db_duplicate_queries_total",
+    "SQL queries repeated within one request or Celery task.",
+    ["source"],
+)
+
+
+def get_endpoint(url: str) -> str:
+    """Return URL path with ids replaced by placeholder so it can be used as label."""
+    return re.sub(r"/\d+", "/{id}", urlsplit(url).path)
+
+
+class PoolCollector(Collector):
+    """Collect proxy pool gauges from database on scrape so values are the same for all processes."""
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        """Collect gauges."""
+        from proxies.proxies.models import Proxy
+
+        gauges = {
+            state: GaugeMetricFamily(f"proxies_pool_{state}", f"Number of {state} proxies.", labels=["provider"])
+            for state in ["active", "inactive", "reported"]
+        }
+        rows = (
+            Proxy.objects.order_by()
+            .values("provider")
+            .annotate(
+                active_count=Count("pk", filter=Q(active=True)),
+                inactive_count=Count("pk", filter=Q(active=False)),
+                reported_count=Count("pk", filter=Q(reported=True)),
+            )
+        )
+        for row in rows:
+            for state, gauge in gauges.items():
+                gauge.add_metric([row["provider"]], row[f"{state}_count"])
+        yield from gauges.values()
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Expose metrics in Prometheus format.
+
+    With `PROMETHEUS_MULTIPROC_DIR` set metrics from all gunicorn and Celery processes sharing the directory are
+    aggregated. Without `METRICS_TOKEN` metrics are served only with DEBUG.
+    """
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"):
+        return HttpResponseForbidden()
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    output = generate_latest(registry)
+
+    pool_registry = CollectorRegistry()
+    pool_registry.register(PoolCollector())
+    output += generate_latest(pool_registry)
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+
+from django.http import HttpRequest, HttpResponse
+
+from proxies.proxies.metrics import HTTP_REQUEST_DURATION
+
+
+class MetricsMiddleware:
+    """Measure request duration per view."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        """Initialize."""
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Process request."""
+        start = time.perf_counter()
+        response = self.get_response(request)
+        # label by view name instead of path to keep cardinality low
+        match = request.resolver_match
+        view = match.view_name if match else "<unresolved>"
+        HTTP_REQUEST_DURATION.labels(method=request.method, view=view, status=response.status_code).observe(
+            time.perf_counter() - start
+        )
+        return response
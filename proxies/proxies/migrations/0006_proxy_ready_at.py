@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0005_alter_client_default_proxy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proxy',
+            name='ready_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
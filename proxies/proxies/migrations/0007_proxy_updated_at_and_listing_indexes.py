@@ -0,0 +1,36 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0006_proxy_ready_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proxy',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(fields=['name', 'id'], name='proxy_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(fields=['provider', 'name', 'id'], name='proxy_provider_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(fields=['active', 'name', 'id'], name='proxy_active_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(fields=['updated_at'], name='proxy_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0007_proxy_updated_at_and_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(condition=models.Q(('active', True)), fields=['name', 'id'], name='proxy_active_partial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(condition=models.Q(('server_id__isnull', False)), fields=['name'], name='proxy_server_id_notnull_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(fields=['provider', 'server_id'], name='proxy_provider_server_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(fields=['provider', 'is_removed'], name='proxy_provider_removed_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0008_proxy_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proxy',
+            name='replaced_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='replaces', to='proxies.proxy'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0009_proxy_replaced_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proxy',
+            name='check_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='proxy',
+            name='failed_check_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PoolHealthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('digitalocean', 'DigitalOcean'), ('hetzner', 'Hetzner')], max_length=32)),
+                ('hour', models.DateTimeField()),
+                ('active_count', models.PositiveIntegerField(default=0)),
+                ('inactive_count', models.PositiveIntegerField(default=0)),
+                ('reported_count', models.PositiveIntegerField(default=0)),
+                ('checks', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('latency_buckets', models.JSONField(default=list)),
+                ('ready_count', models.PositiveIntegerField(default=0)),
+                ('ready_buckets', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'pool health',
+                'verbose_name_plural': 'pool health',
+                'ordering': ['-hour', 'provider'],
+                'indexes': [models.Index(fields=['hour', 'provider'], name='pool_health_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'hour'), name='pool_health_provider_hour_unique')],
+            },
+        ),
+    ]
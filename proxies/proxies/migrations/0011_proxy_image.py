@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:14
+
+import django.db.models.deletion
+import model_utils.fields
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0010_pool_health_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProxyImage',
+            fields=[
+                ('id', model_utils.fields.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('provider', models.CharField(choices=[('digitalocean', 'DigitalOcean'), ('hetzner', 'Hetzner')], default='digitalocean', max_length=32)),
+                ('image_id', models.CharField(max_length=64)),
+                ('name', models.CharField(max_length=64)),
+                ('active', models.BooleanField(default=False)),
+                ('build_duration', models.FloatField(editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'proxy image',
+                'verbose_name_plural': 'proxy images',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'image_id'), name='proxy_image_provider_image_id_unique'), models.UniqueConstraint(condition=models.Q(('active', True)), fields=('provider',), name='proxy_image_one_active_per_provider')],
+            },
+        ),
+        migrations.AddField(
+            model_name='proxy',
+            name='image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='proxies', to='proxies.proxyimage'),
+        ),
+    ]
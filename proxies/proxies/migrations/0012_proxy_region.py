@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+def set_region(apps, schema_editor):
+    # until now all proxies were created in the single configured region
+    Proxy = apps.get_model("proxies", "Proxy")
+    Proxy.objects.filter(provider="digitalocean").update(region="fra1")
+    Proxy.objects.filter(provider="hetzner").update(region="nbg1")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0011_proxy_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='preferred_regions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='proxy',
+            name='region',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(fields=['region', 'name', 'id'], name='proxy_region_name_id_idx'),
+        ),
+        migrations.RunPython(set_region, migrations.RunPython.noop),
+    ]
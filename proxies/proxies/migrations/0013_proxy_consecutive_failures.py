@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0012_proxy_region'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proxy',
+            name='consecutive_failures',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
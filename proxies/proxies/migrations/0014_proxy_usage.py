@@ -0,0 +1,57 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0013_proxy_consecutive_failures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProxyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('requests', models.PositiveBigIntegerField(default=0)),
+                ('bytes', models.PositiveBigIntegerField(default=0)),
+                ('errors', models.PositiveBigIntegerField(default=0)),
+                ('latency_ms_sum', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'proxy usage',
+                'verbose_name_plural': 'proxy usage',
+                'ordering': ['-hour', 'proxy'],
+            },
+        ),
+        migrations.AddField(
+            model_name='proxy',
+            name='score',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='proxy',
+            index=models.Index(fields=['score'], name='proxy_score_idx'),
+        ),
+        migrations.AddField(
+            model_name='proxyusage',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='proxies.client'),
+        ),
+        migrations.AddField(
+            model_name='proxyusage',
+            name='proxy',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='proxies.proxy'),
+        ),
+        migrations.AddIndex(
+            model_name='proxyusage',
+            index=models.Index(fields=['hour'], name='proxy_usage_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='proxyusage',
+            constraint=models.UniqueConstraint(fields=('proxy', 'client', 'hour'), name='proxy_usage_proxy_client_hour_unique'),
+        ),
+    ]
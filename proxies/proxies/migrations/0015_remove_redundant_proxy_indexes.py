@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:44
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proxies', '0014_proxy_usage'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='proxy',
+            name='proxy_name_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='proxy',
+            name='proxy_active_name_id_idx',
+        ),
+    ]
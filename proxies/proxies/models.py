@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import TYPE_CHECKING
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 
 import httpx
+from model_utils import FieldTracker
 from model_utils.models import UUIDModel
 
+from proxies.proxies.metrics import PROXY_PROBE_DURATION
 from proxies.proxies.utils import get_random_string
 
 if TYPE_CHECKING:
@@ -41,6 +45,8 @@ class Proxy(UUIDModel):
     name = models.CharField(max_length=64, unique=True, default=default_proxy_name)
     alias = models.CharField(max_length=64, default="", blank=True)
     provider = models.CharField(max_length=32, choices=ProviderChoices, default=ProviderChoices.DIGITALOCEAN)
+    # DigitalOcean region or Hetzner location, chosen by `placement.choose_region` when empty
+    region = models.CharField(max_length=32, default="", blank=True)
     server_id = models.PositiveIntegerField(null=True)
     ipaddress = models.GenericIPAddressField(protocol="ipv4", null=True)
     active = models.BooleanField(default=False)
@@ -48,18 +54,70 @@ class Proxy(UUIDModel):
     create_response = models.JSONField(null=True)
     last_check_at = models.DateTimeField(null=True)
     last_check_response = models.JSONField(null=True)
+    ready_at = models.DateTimeField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
     reported = models.BooleanField(default=False, editable=False)
     is_removed = models.BooleanField(default=False)
+    check_count = models.PositiveIntegerField(default=0, editable=False)
+    failed_check_count = models.PositiveIntegerField(default=0, editable=False)
+    # failed checks since the last successful one, proxy is replaced when it reaches `PROXY_REMEDIATION_THRESHOLD`
+    consecutive_failures = models.PositiveIntegerField(default=0, editable=False)
+    # share of successful requests reported by clients in last `USAGE_SCORE_WINDOW`, see `proxies.proxies.usage`
+    score = models.FloatField(null=True, blank=True, editable=False)
+    image = models.ForeignKey(
+        "ProxyImage",
+        related_name="proxies",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    # server is deleted once its replacement is active
+    replaced_by = models.ForeignKey(
+        "self",
+        related_name="replaces",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    # changes of listed fields are published to change feed
+    tracker = FieldTracker(fields=["active", "name", "ipaddress", "server_id", "region"])
 
     class Meta:
         ordering = ["name"]
         verbose_name = "proxy"
         verbose_name_plural = "proxies"
+        indexes = [
+            # keyset pagination and filters of proxy listings, plain ordering by name uses its unique index
+            models.Index(fields=["provider", "name", "id"], name="proxy_provider_name_id_idx"),
+            models.Index(fields=["region", "name", "id"], name="proxy_region_name_id_idx"),
+            models.Index(fields=["updated_at"], name="proxy_updated_at_idx"),
+            models.Index(fields=["score"], name="proxy_score_idx"),
+            # hot paths of API, checks and sync, see `tests/test_query_plans.py`
+            models.Index(fields=["name", "id"], condition=models.Q(active=True), name="proxy_active_partial_idx"),
+            models.Index(
+                fields=["name"], condition=models.Q(server_id__isnull=False), name="proxy_server_id_notnull_idx"
+            ),
+            models.Index(fields=["provider", "server_id"], name="proxy_provider_server_id_idx"),
+            models.Index(fields=["provider", "is_removed"], name="proxy_provider_removed_idx"),
+        ]
+
+    # duration of the last verification request, not stored
+    probe_duration: float | None = None
 
     def __str__(self) -> str:
         """Return proxy name."""
         return f"{self.name} ({self.alias})" or self.name
 
+    @property
+    def uptime(self) -> float | None:
+        """Return share of successful checks."""
+        if not self.check_count:
+            return None
+        return 1 - self.failed_check_count / self.check_count
+
     def get_service(self) -> BaseService:
         """Get service for proxy provider."""
         if self.provider == self.ProviderChoices.DIGITALOCEAN:
@@ -91,18 +149,39 @@ class Proxy(UUIDModel):
         """
         Check if proxy works correctly.
 
-        Check if proxy is ready to use and works correctly by sending request to
-        httpbin and check if ip match proxy's IP.
+        Check if proxy is ready to use and works correctly by sending requests to `PROXY_CHECK_URLS` (httpbin by
+        default) and check if ip they see matches proxy's IP in at least `PROXY_CHECK_QUORUM` of them.
         """
-        logger.info("Checking if proxy %s works correctly.", self.name)
-        try:
-            r = httpx.post("https://httpbin.org/post", proxies=self.get_config(), timeout=5)
-            r.raise_for_status()
-        except Exception:
-            logger.exception("Can't get proxy status from httpbin.org.")
-            return False
+        logger.debug("Checking if proxy %s works correctly.", self.name)
+        urls = settings.PROXY_CHECK_URLS
+        # at least one URL must see the proxy even when settings are overridden
+        quorum = max(min(settings.PROXY_CHECK_QUORUM, len(urls)), 1)
+        passed = failed = errors = 0
+        start = time.perf_counter()
+        with httpx.Client(proxies=self.get_config(), timeout=settings.PROXY_CHECK_TIMEOUT) as client:
+            for url in urls:
+                # stop as soon as result is known
+                if passed >= quorum or failed > len(urls) - quorum:
+                    break
+                try:
+                    r = client.post(url)
+                    r.raise_for_status()
+                    origin = r.json()["origin"]
+                except Exception:
+                    logger.exception("Can't get proxy status from %s.", url)
+                    failed += 1
+                    errors += 1
+                    continue
+                if origin == self.ipaddress:
+                    passed += 1
+                else:
+                    failed += 1
 
-        if r.json()["origin"] == self.ipaddress:
+        works = passed >= quorum
+        self.probe_duration = time.perf_counter() - start
+        result = "ok" if works else "error" if errors == failed else "mismatch"
+        PROXY_PROBE_DURATION.labels(provider=self.provider, result=result).observe(self.probe_duration)
+        if works:
             logger.info("Proxy %s works OK.", self.name)
             return True
         logger.warning("Proxy %s doesn't work correctly.", self.name)
@@ -128,6 +207,8 @@ class Client(UUIDModel):
         null=True,
         blank=True,
     )
+    # regions (locations) close to client's targets, client gets proxies from them while any is active
+    preferred_regions = models.JSONField(default=list, blank=True)
 
     class Meta:
         ordering = ["name"]
@@ -137,3 +218,110 @@ class Client(UUIDModel):
     def __str__(self) -> str:
         """Return client name."""
         return self.name
+
+    def clean(self) -> None:
+        """Validate preferred regions."""
+        if not isinstance(self.preferred_regions, list) or not all(
+            isinstance(region, str) for region in self.preferred_regions
+        ):
+            raise ValidationError({"preferred_regions": 'Enter a list of regions, e.g. ["fra1", "nbg1"].'})
+
+
+class ProxyImage(UUIDModel):
+    """Provider snapshot with squid preinstalled, built by `manage.py build_proxy_image`."""
+
+    provider = models.CharField(
+        max_length=32, choices=Proxy.ProviderChoices, default=Proxy.ProviderChoices.DIGITALOCEAN
+    )
+    image_id = models.CharField(max_length=64)
+    name = models.CharField(max_length=64)
+    # image used for new proxies of provider, stock image is used when provider has none
+    active = models.BooleanField(default=False)
+    build_duration = models.FloatField(null=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "proxy image"
+        verbose_name_plural = "proxy images"
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "image_id"], name="proxy_image_provider_image_id_unique"),
+            models.UniqueConstraint(
+                fields=["provider"], condition=models.Q(active=True), name="proxy_image_one_active_per_provider"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Return image name."""
+        return self.name
+
+
+class PoolHealthRollup(models.Model):
+    """
+    Pool health of provider in one hour, updated incrementally at the end of every check run.
+
+    Latencies and times to ready are kept as histogram bucket counts (see `proxies.proxies.health`) so medians
+    can be estimated and merged across hours without keeping individual samples.
+    """
+
+    provider = models.CharField(max_length=32, choices=Proxy.ProviderChoices)
+    hour = models.DateTimeField()
+    active_count = models.PositiveIntegerField(default=0)
+    inactive_count = models.PositiveIntegerField(default=0)
+    reported_count = models.PositiveIntegerField(default=0)
+    checks = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    latency_buckets = models.JSONField(default=list)
+    ready_count = models.PositiveIntegerField(default=0)
+    ready_buckets = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-hour", "provider"]
+        verbose_name = "pool health"
+        verbose_name_plural = "pool health"
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "hour"], name="pool_health_provider_hour_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["hour", "provider"], name="pool_health_hour_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """Return provider and hour."""
+        return f"{self.provider} {self.hour:%Y-%m-%d %H:00}"
+
+
+class ProxyUsage(models.Model):
+    """Usage of proxy by client in one hour as reported by client, flushed from Redis counters."""
+
+    proxy = models.ForeignKey(Proxy, related_name="usage", on_delete=models.CASCADE)
+    client = models.ForeignKey(Client, related_name="usage", on_delete=models.CASCADE)
+    hour = models.DateTimeField()
+    requests = models.PositiveBigIntegerField(default=0)
+    bytes = models.PositiveBigIntegerField(default=0)
+    errors = models.PositiveBigIntegerField(default=0)
+    # sum of reported median latencies weighted by requests, divided by `requests` gives mean median latency
+    latency_ms_sum = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-hour", "proxy"]
+        verbose_name = "proxy usage"
+        verbose_name_plural = "proxy usage"
+        constraints = [
+            models.UniqueConstraint(fields=["proxy", "client", "hour"], name="proxy_usage_proxy_client_hour_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["hour"], name="proxy_usage_hour_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """Return proxy, client and hour."""
+        return f"{self.proxy_id} {self.client_id} {self.hour:%Y-%m-%d %H:00}"
+
+    @property
+    def latency_ms(self) -> float | None:
+        """Return mean of reported median latencies."""
+        if not self.requests:
+            return None
+        return self.latency_ms_sum / self.requests
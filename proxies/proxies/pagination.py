@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import uuid
+
+from django.db.models import Q, QuerySet
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
+
+from proxies.proxies.models import Proxy
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over `(name, id)`.
+
+    Unlike offset pagination every page is a single index range scan no matter how deep it is. Pagination is used
+    only when `limit` or `cursor` query param is present so plain listings keep returning a list.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    default_limit = 100
+    max_limit = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def is_requested(self, request: Request) -> bool:
+        """Return if client asked for paginated response."""
+        return self.limit_query_param in request.query_params or self.cursor_query_param in request.query_params
+
+    def get_limit(self, request: Request) -> int:
+        """Return page size."""
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def decode_cursor(self, cursor: str) -> tuple[str, uuid.UUID]:
+        """Return name and id of the last proxy on previous page."""
+        try:
+            name, _, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rpartition("|")
+            return name, uuid.UUID(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message) from None
+
+    @staticmethod
+    def encode_cursor(name: str, pk: uuid.UUID) -> str:
+        """Return cursor pointing after given proxy."""
+        return base64.urlsafe_b64encode(f"{name}|{pk}".encode()).decode()
+
+    def paginate_queryset(self, queryset: QuerySet[Proxy], request: Request, view=None) -> QuerySet[Proxy] | None:
+        """Return queryset limited to requested page plus one row to find out if there is next page."""
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        self.limit = self.get_limit(request)
+        queryset = queryset.order_by("name", "id")
+        if cursor := request.query_params.get(self.cursor_query_param):
+            name, pk = self.decode_cursor(cursor)
+            # `name__gte` lets the planner use the index range, the OR handles ties
+            queryset = queryset.filter(name__gte=name).filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+        return queryset[: self.limit + 1]
+
+    def get_paginated_data(self, rows: list[dict]) -> dict:
+        """Return page with link to next one."""
+        next_url = None
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            cursor = self.encode_cursor(rows[-1]["name"], rows[-1]["id"])
+            next_url = replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+        return {"next": next_url, "results": rows}
@@ -0,0 +1,40 @@
+"""
+Placement of proxies across regions (DigitalOcean regions, Hetzner locations).
+
+New proxies go to the configured region furthest below its weighted share of provider's proxies, so the pool converges
+to the configured weights even after proxies are deleted or replaced.
+"""
+
+from __future__ import annotations
+
+from django.conf import settings
+from django.db.models import Count
+
+from proxies.proxies.models import Proxy
+
+
+def get_region_weights(provider: str) -> dict[str, int]:
+    """Return regions new proxies of provider are spread across with their weights, builder region by default."""
+    weights, default = {
+        Proxy.ProviderChoices.DIGITALOCEAN: (settings.DO_PROXY_DROPLET_REGIONS, settings.DO_PROXY_DROPLET_REGION),
+        Proxy.ProviderChoices.HETZNER: (
+            settings.HETZNER_PROXY_SERVER_LOCATIONS,
+            settings.HETZNER_PROXY_SERVER_LOCATION,
+        ),
+    }[provider]
+    return {region: weight for region, weight in weights.items() if weight > 0} or {default: 1}
+
+
+def get_regions() -> list[str]:
+    """Return all regions proxies are placed in."""
+    regions = {region for provider in Proxy.ProviderChoices for region in get_region_weights(provider)}
+    return sorted(regions)
+
+
+def choose_region(provider: str) -> str:
+    """Return region for new proxy of provider."""
+    weights = get_region_weights(provider)
+    rows = Proxy.objects.filter(provider=provider, region__in=weights).order_by().values("region")
+    counts = {row["region"]: row["count"] for row in rows.annotate(count=Count("pk"))}
+    # sorted so ties always go to the same region
+    return min(sorted(weights), key=lambda region: (counts.get(region, 0) + 1) / weights[region])
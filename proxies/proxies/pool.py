@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.db.models import Count
+
+from config.cache import TwoTierCache
+from proxies.proxies.blacklist import get_blacklisted_ids
+from proxies.proxies.listing import get_proxy_rows
+from proxies.proxies.models import Client, Proxy
+from proxies.proxies.quarantine import get_quarantined_ids
+
+pool_cache = TwoTierCache("pool", maxsize=64, local_ttl=settings.POOL_LOCAL_CACHE_TTL)
+
+
+def get_active_pool() -> list[dict]:
+    """Return active proxies in the shape of `ProxySerializer`."""
+    return pool_cache.get_or_set(
+        "active", lambda: get_proxy_rows(Proxy.objects.filter(active=True)), settings.POOL_CACHE_TTL
+    )
+
+
+def get_available_pool() -> list[dict]:
+    """Return active proxies without quarantined ones."""
+    quarantined = get_quarantined_ids()
+    pool = get_active_pool()
+    return [row for row in pool if row["id"] not in quarantined] if quarantined else pool
+
+
+def get_preferred_regions(client: Client) -> set[str]:
+    """Return client's preferred regions with active proxy, empty set when client is served from all regions."""
+    if not client.preferred_regions:
+        return set()
+    return set(client.preferred_regions) & {row["region"] for row in get_active_pool()}
+
+
+def get_client_pool(client: Client) -> list[dict]:
+    """
+    Return active proxies not blacklisted by client nor quarantined, computed in memory from the cached active pool.
+
+    Only proxies from client's preferred regions are returned while there is any available one.
+    """
+    excluded = get_blacklisted_ids(client) | get_quarantined_ids()
+    rows = [row for row in get_active_pool() if row["id"] not in excluded]
+    if client.preferred_regions:
+        rows = [row for row in rows if row["region"] in client.preferred_regions] or rows
+    return [{**row, "client_default": row["id"] == client.default_proxy_id} for row in rows]
+
+
+def get_provider_counts() -> dict[str, int]:
+    """Return number of proxies per provider."""
+
+    def get_counts() -> dict[str, int]:
+        rows = Proxy.objects.order_by().values("provider").annotate(count=Count("pk"))
+        return {row["provider"]: row["count"] for row in rows}
+
+    return pool_cache.get_or_set("provider-counts", get_counts, settings.POOL_CACHE_TTL)
+
+
+def get_provider_limit_error(provider: str, overshoot: int = 0) -> str | None:
+    """Return error message when provider limit of proxies (raised by `overshoot`) is reached."""
+    limits = {
+        Proxy.ProviderChoices.DIGITALOCEAN: (settings.DO_LIMIT, "Digitalocean"),
+        Proxy.ProviderChoices.HETZNER: (settings.HETZNER_LIMIT, "Hetzner"),
+    }
+    if provider not in limits:
+        return None
+    limit, label = limits[provider]
+    if get_provider_counts().get(provider, 0) >= limit + overshoot:
+        return f"You can't create more then {limit} proxies for {label} provider."
+    return None
+
+
+def invalidate_pool() -> None:
+    """Drop cached pool data in all processes."""
+    pool_cache.delete("active")
+    pool_cache.delete("provider-counts")
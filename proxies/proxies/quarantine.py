@@ -0,0 +1,69 @@
+"""
+Quarantine of proxies reported as failing by clients.
+
+Failure reports are kept per proxy in Redis sorted set of client ids scored by report time. When
+`QUARANTINE_REPORT_CLIENTS` distinct clients report proxy within `QUARANTINE_REPORT_WINDOW` seconds the proxy is put
+to quarantine (sorted set of proxy ids scored by expiry) and excluded from all listings until re-verification releases
+it. Quarantine expires after `QUARANTINE_TTL` so proxy isn't excluded forever when re-verification doesn't run.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+
+from django.conf import settings
+
+import redis
+
+from config.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def get_reports_key(proxy_id: uuid.UUID | str) -> str:
+    """Return Redis key of failure reports of proxy."""
+    return f"{settings.PROJECT_NAME}:reports:{proxy_id}"
+
+
+def get_quarantine_key() -> str:
+    """Return Redis key of quarantined proxies."""
+    return f"{settings.PROJECT_NAME}:quarantine"
+
+
+def report_failure(client_id: uuid.UUID | str, proxy_id: uuid.UUID | str) -> tuple[int, bool]:
+    """Record failure of proxy reported by client, return number of reporting clients and if proxy was quarantined."""
+    key = get_reports_key(proxy_id)
+    now = time.time()
+    pipe = get_redis().pipeline()
+    pipe.zadd(key, {str(client_id): now})
+    pipe.zremrangebyscore(key, 0, now - settings.QUARANTINE_REPORT_WINDOW)
+    pipe.zcard(key)
+    pipe.expire(key, settings.QUARANTINE_REPORT_WINDOW)
+    _, _, reports, _ = pipe.execute()
+    if reports < settings.QUARANTINE_REPORT_CLIENTS:
+        return reports, False
+    # only the report crossing the threshold quarantines proxy
+    added = get_redis().zadd(get_quarantine_key(), {str(proxy_id): now + settings.QUARANTINE_TTL}, nx=True)
+    return reports, bool(added)
+
+
+def get_quarantined_ids() -> set[uuid.UUID]:
+    """Return ids of quarantined proxies, empty set when Redis is unavailable so listings keep working."""
+    try:
+        members = get_redis().zrangebyscore(get_quarantine_key(), time.time(), "+inf")
+    except redis.RedisError:
+        logger.exception("Can't get quarantined proxies from Redis.")
+        return set()
+    return {uuid.UUID(member.decode()) for member in members}
+
+
+def release(proxy_id: uuid.UUID | str) -> None:
+    """Remove proxy from quarantine and forget its failure reports."""
+    pipe = get_redis().pipeline()
+    pipe.zrem(get_quarantine_key(), str(proxy_id))
+    pipe.delete(get_reports_key(proxy_id))
+    # drop expired entries on the way
+    pipe.zremrangebyscore(get_quarantine_key(), 0, time.time())
+    pipe.execute()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from celery.signals import task_postrun, task_prerun
+
+from proxies.proxies.metrics import DB_DUPLICATE_QUERIES, DB_DURATION, DB_QUERIES
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceededError(AssertionError):
+    """More queries than allowed were executed."""
+
+
+class QueryRecorder:
+    """Record number, duration and duplicates of SQL queries executed on all database connections."""
+
+    def __init__(self):
+        """Initialize."""
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter[str] = Counter()
+        self._stack: ExitStack | None = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Execute wrapper, see `django.db.backends.base.base.BaseDatabaseWrapper.execute_wrapper`."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self) -> int:
+        """Return number of queries which were executed repeatedly."""
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def start(self) -> None:
+        """Start recording."""
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+
+    def stop(self) -> None:
+        """Stop recording."""
+        if self._stack is not None:
+            self._stack.close()
+            self._stack = None
+
+    def __enter__(self) -> QueryRecorder:
+        """Start recording."""
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop recording."""
+        self.stop()
+
+    def report(self, source: str) -> None:
+        """Send numbers to metrics and warn about repeated queries (possible N+1)."""
+        DB_QUERIES.labels(source=source).observe(self.count)
+        DB_DURATION.labels(source=source).observe(self.duration)
+        if self.duplicates:
+            DB_DUPLICATE_QUERIES.labels(source=source).inc(self.duplicates)
+
+        sql, count = max(self.statements.items(), key=lambda item: item[1], default=("", 0))
+        if count >= settings.QUERY_COUNT_DUPLICATE_WARNING:
+            logger.warning("Query executed %s times in %s, possible N+1: %s", count, source, sql)
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryRecorder]:
+    """
+    Fail when more than `max_queries` SQL queries are executed in the block.
+
+    Usage in tests::
+
+        with query_budget(5):
+            client.get(url)
+    """
+    with QueryRecorder() as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        statements = "\n".join(f"{count}x {sql}" for sql, count in recorder.statements.most_common())
+        raise QueryBudgetExceededError(f"{recorder.count} queries executed, budget is {max_queries}:\n{statements}")
+
+
+def get_view_query_budget(request: HttpRequest) -> int | None:
+    """Return `query_budget` declared on the view class which handled the request."""
+    match = request.resolver_match
+    if match is None:
+        return None
+    view_class = getattr(match.func, "view_class", None) or getattr(match.func, "cls", None)
+    return getattr(view_class, "query_budget", None)
+
+
+class QueryCountMiddleware:
+    """
+    Record queries per request.
+
+    Numbers are sent to metrics and with `QUERY_COUNT_HEADERS` also returned in response headers. Views can declare
+    `query_budget`, exceeding it is logged or with `QUERY_BUDGET_STRICT` raises error so tests fail.
+
+    Queries of streaming response run while its content is iterated, recording then continues until the stream is
+    exhausted or closed and counts them too. Headers are already sent at that point, so streaming responses don't
+    get them.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        """Initialize."""
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Process request."""
+        recorder = QueryRecorder()
+        recorder.start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            recorder.stop()
+            raise
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.record_stream(request, recorder, response.streaming_content)
+            return response
+
+        recorder.stop()
+        self.report(request, recorder)
+        if settings.QUERY_COUNT_HEADERS:
+            response["X-DB-Query-Count"] = str(recorder.count)
+            response["X-DB-Time-Ms"] = f"{recorder.duration * 1000:.1f}"
+            response["X-DB-Duplicate-Queries"] = str(recorder.duplicates)
+        self.check_budget(request, recorder)
+        return response
+
+    def record_stream(self, request: HttpRequest, recorder: QueryRecorder, content: Iterable[bytes]) -> Iterator[bytes]:
+        """Yield streamed content, queries executed while producing it are reported even when client disconnects."""
+        try:
+            yield from content
+        finally:
+            recorder.stop()
+            self.report(request, recorder)
+        self.check_budget(request, recorder)
+
+    def report(self, request: HttpRequest, recorder: QueryRecorder) -> None:
+        """Report recorded queries under name of the view."""
+        match = request.resolver_match
+        recorder.report(match.view_name if match else "<unresolved>")
+
+    def check_budget(self, request: HttpRequest, recorder: QueryRecorder) -> None:
+        """Check recorded queries against budget of the view."""
+        budget = get_view_query_budget(request)
+        if budget is not None and recorder.count > budget:
+            message = f"{request.method} {request.path} executed {recorder.count} queries, budget is {budget}."
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceededError(message)
+            logger.warning(message)
+
+
+_task_recorders: dict[str, QueryRecorder] = {}
+
+
+@task_prerun.connect
+def start_task_recording(task_id: str, **kwargs) -> None:
+    """Start recording queries of Celery task."""
+    recorder = QueryRecorder()
+    recorder.start()
+    _task_recorders[task_id] = recorder
+
+
+@task_postrun.connect
+def stop_task_recording(task_id: str, task, **kwargs) -> None:
+    """Stop recording queries of Celery task and report them."""
+    recorder = _task_recorders.pop(task_id, None)
+    if recorder is not None:
+        recorder.stop()
+        recorder.report(task.name)
@@ -0,0 +1,54 @@
+"""
+Automatic replacement of persistently failing proxies.
+
+Proxy failing `PROXY_REMEDIATION_THRESHOLD` checks in row gets a replacement, the broken server is deleted by
+`teardown_replaced_proxies` once the replacement is active. Replacements in progress and started per hour are limited
+so provider outage or broken check doesn't recreate the whole pool.
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from config.cache import get_redis
+from proxies.proxies.models import Proxy
+
+# seconds, window of `PROXY_REMEDIATION_RATE`
+RATE_WINDOW = 60 * 60
+
+
+def get_rate_key() -> str:
+    """Return Redis key of sorted set with start times of recent replacements."""
+    return f"{settings.PROJECT_NAME}:remediations"
+
+
+def get_failing_proxies() -> QuerySet[Proxy]:
+    """Return proxies to replace, the ones failing longest first."""
+    return Proxy.objects.filter(
+        consecutive_failures__gte=settings.PROXY_REMEDIATION_THRESHOLD,
+        create_request_at__lt=timezone.now() - timedelta(seconds=settings.PROXY_REMEDIATION_GRACE),
+        server_id__isnull=False,
+        replaced_by__isnull=True,
+        is_removed=False,
+    ).order_by("-consecutive_failures", "name")
+
+
+def get_remediation_slots() -> int:
+    """Return how many proxies can be replaced now without exceeding concurrency and rate limits."""
+    in_progress = Proxy.objects.filter(replaced_by__active=False, server_id__isnull=False, is_removed=False).count()
+    key = get_rate_key()
+    now = time.time()
+    _, started = get_redis().pipeline().zremrangebyscore(key, 0, now - RATE_WINDOW).zcard(key).execute()
+    return max(min(settings.PROXY_REMEDIATION_CONCURRENCY - in_progress, settings.PROXY_REMEDIATION_RATE - started), 0)
+
+
+def record_remediation(proxy: Proxy) -> None:
+    """Count replacement of proxy against rate limit."""
+    key = get_rate_key()
+    now = time.time()
+    get_redis().pipeline().zadd(key, {f"{proxy.pk}:{now}": now}).expire(key, RATE_WINDOW).execute()
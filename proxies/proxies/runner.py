@@ -0,0 +1,112 @@
+"""
+Concurrent runs of check and sync engines outside Celery (`proxies_check` and `proxies_sync` commands).
+
+Engine steps block on DB, provider APIs and probes through proxies, so asyncio runs them in threads of own executor
+sized to the concurrency and a semaphore bounds how many run at once. Every thread has its own DB connection which is
+closed after the step.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import statistics
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.db import connections
+
+from proxies.proxies.metrics import PROVIDER_API_RESPONSES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StepResult:
+    """Result of one step run by `run_steps`."""
+
+    group: str
+    ok: bool
+    duration: float
+    error: str | None = None
+
+
+def call_closing_connections(func: Callable[[], bool]) -> bool:
+    """Call func and close DB connections of current thread."""
+    try:
+        return func()
+    finally:
+        connections.close_all()
+
+
+async def run_steps(steps: Iterable[tuple[str, Callable[[], bool]]], concurrency: int) -> list[StepResult]:
+    """Run blocking steps (group, func) at most `concurrency` at once, return their results in order."""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(group: str, func: Callable[[], bool]) -> StepResult:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await loop.run_in_executor(executor, call_closing_connections, func)
+            except Exception as e:
+                logger.exception("Step of %s failed.", group)
+                return StepResult(group, False, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+            return StepResult(group, bool(ok), time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="runner") as executor:
+        return await asyncio.gather(*(run(group, func) for group, func in steps))
+
+
+class ApiCalls:
+    """Provider API calls made by this process since creation, counted from `PROVIDER_API_RESPONSES` metric."""
+
+    def __init__(self):
+        """Initialize."""
+        self.start = self.snapshot()
+
+    @staticmethod
+    def snapshot() -> Counter[tuple[str, bool]]:
+        """Return number of API responses by provider and if they were errors."""
+        counts: Counter[tuple[str, bool]] = Counter()
+        for metric in PROVIDER_API_RESPONSES.collect():
+            for sample in metric.samples:
+                if not sample.name.endswith("_total"):
+                    continue
+                status = sample.labels["status"]
+                error = status == "error" or int(status) >= 400
+                counts[sample.labels["provider"], error] += int(sample.value)
+        return counts
+
+    def get(self) -> dict[str, tuple[int, int]]:
+        """Return numbers of API calls and errors per provider made since creation."""
+        counts = self.snapshot()
+        counts.subtract(self.start)
+        providers = {provider for provider, _ in counts}
+        return {
+            provider: (counts[provider, False] + counts[provider, True], counts[provider, True])
+            for provider in providers
+        }
+
+
+def summarize_durations(durations: Sequence[float]) -> tuple[float, float, float]:
+    """Return sum, median and max of durations."""
+    if not durations:
+        return 0.0, 0.0, 0.0
+    return sum(durations), statistics.median(durations), max(durations)
+
+
+def format_table(headers: Sequence[str], rows: Iterable[Sequence]) -> list[str]:
+    """Return lines of text table, the first column is aligned left and the others right."""
+    rows = [[f"{value:.2f}" if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows, strict=True)]
+
+    def format_row(row: Sequence) -> str:
+        first, *others = (str(value) for value in row)
+        cells = (value.rjust(width) for value, width in zip(others, widths[1:], strict=True))
+        return "  ".join([first.ljust(widths[0]), *cells])
+
+    return [format_row(headers), "  ".join("-" * width for width in widths), *(format_row(row) for row in rows)]
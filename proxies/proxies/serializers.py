@@ -3,6 +3,7 @@ from __future__ import annotations
 from rest_framework import serializers
 
 from proxies.proxies.models import Client, Proxy
+from proxies.proxies.placement import get_region_weights
 
 
 class ProxySerializer(serializers.ModelSerializer):
@@ -16,6 +17,7 @@ class ProxySerializer(serializers.ModelSerializer):
             "name",
             "ipaddress",
             "provider",
+            "region",
         ]
         read_only_fields = [
             "id",
@@ -24,10 +26,17 @@ class ProxySerializer(serializers.ModelSerializer):
             "ipaddress",
         ]
 
+    def validate(self, attrs: dict) -> dict:
+        """Validate region is one of the provider's regions, it's chosen by placement weights when not given."""
+        provider = attrs.get("provider", Proxy.ProviderChoices.DIGITALOCEAN)
+        if attrs.get("region") and attrs["region"] not in get_region_weights(provider):
+            raise serializers.ValidationError({"region": f"Proxies of {provider} can't be placed in this region."})
+        return attrs
+
     def get_client_default(self, instance: Proxy) -> bool:
         """Return client default."""
         client: Client | None = self.context.get("client", None)
-        return client and client.default_proxy == instance
+        return client and client.default_proxy_id == instance.pk
 
     def get_fields(self):
         """Return fields."""
@@ -1,17 +1,122 @@
 from __future__ import annotations
 
+import logging
+import time
 from abc import ABC, abstractmethod
+from collections.abc import Callable
+from dataclasses import dataclass, field
 
-from proxies.proxies.models import Proxy
+from django.conf import settings
+from django.utils import timezone
+
+import httpx
+
+from proxies.proxies.metrics import PROVIDER_API_DURATION, PROVIDER_API_RESPONSES, PROXY_TIME_TO_READY, get_endpoint
+from proxies.proxies.models import Proxy, ProxyImage
+from proxies.proxies.placement import choose_region
+from proxies.proxies.services.auth import TokenAuth
+from proxies.proxies.services.cloudinit import get_boot_user_data, get_user_data
+
+logger = logging.getLogger(__name__)
+
+
+class ImageBuildError(Exception):
+    """Building of proxy image failed."""
+
+
+@dataclass
+class SyncPlan:
+    """Names of proxies sync would create, update and remove."""
+
+    created: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
 
 
 class BaseService(ABC):
     """Base service."""
 
+    provider: Proxy.ProviderChoices
+    # field matching provider servers to proxies on sync
+    sync_lookup: str
+
     def __init__(self, proxy: Proxy):
         """Initialize."""
         self.proxy = proxy
 
+    @classmethod
+    @abstractmethod
+    def get_api_url(cls) -> str:
+        """Return provider API base URL."""
+        ...
+
+    @classmethod
+    @abstractmethod
+    def get_token(cls) -> str:
+        """Return provider API token."""
+        ...
+
+    @classmethod
+    def api_request(cls, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send request to provider API, absolute URL (e.g. next page link) must be on the API too."""
+        kwargs.setdefault("timeout", 10)
+        if path.startswith(("http://", "https://")):
+            # API token must not be sent anywhere a response points to
+            if not path.startswith(f"{cls.get_api_url().rstrip('/')}/"):
+                raise ValueError(f"URL {path} is not on {cls.provider} API.")
+            url = path
+        else:
+            url = f"{cls.get_api_url()}{path}"
+        endpoint = get_endpoint(url.removeprefix(cls.get_api_url()))
+        labels = {"provider": cls.provider, "method": method, "endpoint": endpoint}
+        start = time.perf_counter()
+        status = "error"
+        try:
+            r = httpx.request(method, url, auth=TokenAuth(cls.get_token()), **kwargs)
+            status = str(r.status_code)
+            return r
+        finally:
+            PROVIDER_API_DURATION.labels(**labels).observe(time.perf_counter() - start)
+            PROVIDER_API_RESPONSES.labels(**labels, status=status).inc()
+
+    @classmethod
+    @abstractmethod
+    def get_stock_image(cls) -> str:
+        """Return provider image squid is installed on during boot."""
+        ...
+
+    def get_image_and_user_data(self) -> tuple[str | int, str]:
+        """Return image of new server and its user data, prebaked image is used when provider has one."""
+        self.proxy.image = ProxyImage.objects.filter(provider=self.provider, active=True).first()
+        if self.proxy.image is None:
+            return self.get_stock_image(), get_user_data()
+        image_id = self.proxy.image.image_id
+        return int(image_id) if image_id.isdigit() else image_id, get_boot_user_data()
+
+    def get_region(self) -> str:
+        """Return region of new server, chosen by placement weights unless proxy already has one."""
+        if not self.proxy.region:
+            self.proxy.region = choose_region(self.provider)
+        return self.proxy.region
+
+    @classmethod
+    def wait_for(cls, condition: Callable[[], bool], description: str) -> None:
+        """Poll condition until it's true, raise `ImageBuildError` when it isn't in `IMAGE_BUILD_TIMEOUT`."""
+        deadline = time.monotonic() + settings.IMAGE_BUILD_TIMEOUT
+        while not condition():
+            if time.monotonic() > deadline:
+                raise ImageBuildError(f"Timed out waiting for {description}.")
+            time.sleep(settings.IMAGE_BUILD_POLL_INTERVAL)
+
+    def set_active(self, active: bool) -> None:
+        """Set proxy active state and track when new proxy got ready for the first time."""
+        self.proxy.active = active
+        if active and self.proxy.ready_at is None:
+            self.proxy.ready_at = timezone.now()
+            if self.proxy.create_request_at:
+                time_to_ready = (self.proxy.ready_at - self.proxy.create_request_at).total_seconds()
+                PROXY_TIME_TO_READY.labels(provider=self.provider).observe(time_to_ready)
+
     @abstractmethod
     def create_proxy(self) -> bool:
         """Create proxy."""
@@ -29,6 +134,78 @@ class BaseService(ABC):
 
     @classmethod
     @abstractmethod
+    def fetch_servers(cls) -> list[dict]:
+        """Return proxy servers on provider, raise when they can't be listed."""
+        ...
+
+    @classmethod
+    @abstractmethod
+    def get_server_fields(cls, server: dict) -> dict:
+        """Return proxy fields (`name`, `server_id`, `ipaddress`, `region`, `create_request_at`) of provider server."""
+        ...
+
+    @classmethod
     def get_existing_proxies(cls) -> bool:
         """Get existing proxies from provider."""
+        logger.info("Getting existing %s proxies.", cls.provider.label)
+        try:
+            servers = cls.fetch_servers()
+        except Exception:
+            logger.exception("Can't get existing %s proxies.", cls.provider.label)
+            return False
+
+        logger.info("Found %s existing %s proxies.", len(servers), cls.provider.label)
+        for proxy in cls.sync_servers(servers):
+            cls.check_new_proxy(proxy)
+        return True
+
+    @classmethod
+    def sync_servers(cls, servers: list[dict]) -> list[Proxy]:
+        """Create and update proxies of servers, delete proxies without server. Return created proxies."""
+        Proxy.objects.filter(provider=cls.provider).update(is_removed=True)
+
+        created_proxies = []
+        for server in servers:
+            fields = cls.get_server_fields(server)
+            logger.info("Found proxy %s", fields["name"])
+            lookup = {cls.sync_lookup: fields.pop(cls.sync_lookup)}
+            proxy, created = Proxy.objects.update_or_create(
+                provider=cls.provider, **lookup, defaults={**fields, "is_removed": False}
+            )
+            if created:
+                logger.info("Proxy %s newly created.", proxy.name)
+                created_proxies.append(proxy)
+
+        Proxy.objects.filter(provider=cls.provider, is_removed=True).delete()
+        return created_proxies
+
+    @classmethod
+    def plan_sync(cls, servers: list[dict]) -> SyncPlan:
+        """Return changes `sync_servers` would make without making them."""
+        compared = ("name", "server_id", "ipaddress", "region")
+        existing = {
+            row[cls.sync_lookup]: row
+            for row in Proxy.objects.filter(provider=cls.provider).values(*compared).order_by(cls.sync_lookup)
+        }
+        plan = SyncPlan()
+        for server in servers:
+            fields = cls.get_server_fields(server)
+            if (row := existing.pop(fields[cls.sync_lookup], None)) is None:
+                plan.created.append(fields["name"])
+            elif any(row[name] != fields[name] for name in compared):
+                plan.updated.append(fields["name"])
+        plan.removed = [row["name"] for row in existing.values()]
+        return plan
+
+    @staticmethod
+    def check_new_proxy(proxy: Proxy) -> None:
+        """Verify proxy found on provider for the first time."""
+        proxy.active = proxy.check_proxy_works_correct()
+        proxy.last_check_at = timezone.now()
+        proxy.save()
+
+    @classmethod
+    @abstractmethod
+    def build_image(cls, name: str) -> str:
+        """Boot builder server, snapshot it when provisioned and delete it. Return provider id of the snapshot."""
         ...
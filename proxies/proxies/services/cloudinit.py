@@ -0,0 +1,76 @@
+"""
+Cloud-init user data of proxy servers.
+
+Stock images install and configure squid on every boot (`get_user_data`). Prebaked images (`ProxyImage`) are built
+with `get_builder_user_data` and new servers only get credentials on boot (`get_boot_user_data`).
+"""
+
+from __future__ import annotations
+
+from django.conf import settings
+
+SQUID_FILES = f"""
+write_files:
+  - path: /etc/squid/squid.conf
+    content: |
+      auth_param basic program /usr/lib64/squid/basic_ncsa_auth  /etc/squid/passwords
+      auth_param basic realm proxy
+      acl authenticated proxy_auth REQUIRED
+      http_access allow authenticated
+      http_port {settings.PROXY_PORT}
+      forwarded_for delete
+      via off
+      follow_x_forwarded_for deny all
+      request_header_access X-Forwarded-For deny all
+      header_access X_Forwarded_For deny all
+  - path: /etc/cron.daily/update.sh
+    content: |
+      #!/bin/bash
+      /usr/bin/yum -y update
+      systemctl restart squid
+"""
+
+
+def get_user_data() -> str:
+    """Return user data installing and starting squid on stock image."""
+    return f"""
+#cloud-config
+packages:
+  - squid
+  - httpd-tools
+{SQUID_FILES}
+runcmd:
+  - htpasswd -nb {settings.PROXY_LOGIN} {settings.PROXY_PASSWORD} >> /etc/squid/passwords
+  - chmod a+x /etc/cron.daily/update.sh
+  - systemctl start squid
+  - systemctl enable squid
+"""
+
+
+def get_builder_user_data() -> str:
+    """Return user data of image builder, squid is installed without credentials and server powers off when done."""
+    return f"""
+#cloud-config
+package_upgrade: true
+packages:
+  - squid
+  - httpd-tools
+{SQUID_FILES}
+runcmd:
+  - chmod a+x /etc/cron.daily/update.sh
+  - systemctl enable squid
+
+power_state:
+  mode: poweroff
+  condition: true
+"""
+
+
+def get_boot_user_data() -> str:
+    """Return user data of server created from prebaked image, only credentials are injected."""
+    return f"""
+#cloud-config
+runcmd:
+  - htpasswd -cb /etc/squid/passwords {settings.PROXY_LOGIN} {settings.PROXY_PASSWORD}
+  - systemctl restart squid
+"""
@@ -3,80 +3,62 @@ from __future__ import annotations
 import json
 import logging
 import traceback
+from functools import partial
 
 from django.conf import settings
 from django.utils import timezone
 
 import dateutil.parser
-import httpx
 
 from proxies.proxies.models import Proxy
-from proxies.proxies.services.auth import TokenAuth
-from proxies.proxies.services.base import BaseService
+from proxies.proxies.placement import get_region_weights
+from proxies.proxies.services.base import BaseService, ImageBuildError
+from proxies.proxies.services.cloudinit import get_builder_user_data
 
 logger = logging.getLogger(__name__)
 
 
-DO_PROXY_DROPLET_USER_DATA = f"""
-#cloud-config
-packages:
-  - squid
-  - httpd-tools
-
-write_files:
-  - path: /etc/squid/squid.conf
-    content: |
-      auth_param basic program /usr/lib64/squid/basic_ncsa_auth  /etc/squid/passwords
-      auth_param basic realm proxy
-      acl authenticated proxy_auth REQUIRED
-      http_access allow authenticated
-      http_port {settings.PROXY_PORT}
-      forwarded_for delete
-      via off
-      follow_x_forwarded_for deny all
-      request_header_access X-Forwarded-For deny all
-      header_access X_Forwarded_For deny all
-  - path: /etc/cron.daily/update.sh
-    content: |
-      #!/bin/bash
-      /usr/bin/yum -y update
-      systemctl restart squid
-
-runcmd:
-  - htpasswd -nb {settings.PROXY_LOGIN} {settings.PROXY_PASSWORD} >> /etc/squid/passwords
-  - chmod a+x /etc/cron.daily/update.sh
-  - systemctl start squid
-  - systemctl enable squid
-"""
-
-
 class DigitalOceanService(BaseService):
     """DigitalOcean service for proxies."""
 
+    provider = Proxy.ProviderChoices.DIGITALOCEAN
+    sync_lookup = "name"
+
+    @classmethod
+    def get_api_url(cls) -> str:
+        """Return DigitalOcean API base URL."""
+        return settings.DO_API_URL
+
+    @classmethod
+    def get_token(cls) -> str:
+        """Return DigitalOcean API token."""
+        return settings.DO_TOKEN
+
+    @classmethod
+    def get_stock_image(cls) -> str:
+        """Return DigitalOcean stock image."""
+        return settings.DO_PROXY_DROPLET_IMAGE
+
     def create_proxy(self) -> bool:
         """Create new droplet."""
         logger.info("Creating droplet %s.", self.proxy.name)
+        image, user_data = self.get_image_and_user_data()
         payload = {
             "name": self.proxy.name,
-            "region": settings.DO_PROXY_DROPLET_REGION,
+            "region": self.get_region(),
             "size": settings.DO_PROXY_DROPLET_SIZE,
-            "image": settings.DO_PROXY_DROPLET_IMAGE,
+            "image": image,
             "ssh_keys": [],
             "backups": False,
             "ipv6": False,
             "monitoring": False,
             "tags": [settings.PROJECT_NAME, f"{settings.PROJECT_NAME}:proxy"],
-            "user_data": DO_PROXY_DROPLET_USER_DATA,
+            "user_data": user_data,
         }
 
         self.proxy.create_request_at = timezone.now()
         try:
-            r = httpx.post(
-                "https://api.digitalocean.com/v2/droplets/",
-                auth=TokenAuth(settings.DO_TOKEN),
-                json=payload,
-                timeout=10,
-            )
+            r = self.api_request("POST", "/droplets", json=payload)
             r.raise_for_status()
         except Exception:
             logger.exception("Request error on creating droplet %s", self.proxy.name)
@@ -97,12 +79,7 @@ class DigitalOceanService(BaseService):
             ]
         }
         try:
-            r = httpx.post(
-                f"https://api.digitalocean.com/v2/projects/{settings.DO_PROJECT_ID}/resources",
-                auth=TokenAuth(settings.DO_TOKEN),
-                json=payload,
-                timeout=10,
-            )
+            r = self.api_request("POST", f"/projects/{settings.DO_PROJECT_ID}/resources", json=payload)
             r.raise_for_status()
         except Exception:
             logger.exception("Can't move droplet %s to selected project", self.proxy.name)
@@ -111,15 +88,11 @@ class DigitalOceanService(BaseService):
 
     def check_proxy(self) -> bool:
         """Check status of droplet."""
-        logger.info("Checking droplet %s status.", self.proxy.name)
+        logger.debug("Checking droplet %s status.", self.proxy.name)
         self.proxy.last_check_at = timezone.now()
 
         try:
-            r = httpx.get(
-                f"https://api.digitalocean.com/v2/droplets/{self.proxy.server_id}",
-                auth=TokenAuth(settings.DO_TOKEN),
-                timeout=10,
-            )
+            r = self.api_request("GET", f"/droplets/{self.proxy.server_id}")
         except Exception:
             # request error... set proxy as inactive
             logger.exception("Can't get droplet %s status.", self.proxy.name)
@@ -140,7 +113,7 @@ class DigitalOceanService(BaseService):
                         self.proxy.ipaddress = ip["ip_address"]
                         self.proxy.save()
                         logger.info("Droplet %s is ready.", self.proxy.name)
-                        self.proxy.active = self.proxy.check_proxy_works_correct()
+                        self.set_active(self.proxy.check_proxy_works_correct())
                         self.proxy.save()
                         return True
 
@@ -154,11 +127,7 @@ class DigitalOceanService(BaseService):
     def delete_proxy(self) -> bool:
         """Delete existing droplet."""
         logger.info("Deleting droplet %s.", self.proxy.name)
-        r = httpx.delete(
-            f"https://api.digitalocean.com/v2/droplets/{self.proxy.server_id}",
-            auth=TokenAuth(settings.DO_TOKEN),
-            timeout=10,
-        )
+        r = self.api_request("DELETE", f"/droplets/{self.proxy.server_id}")
         if r.status_code == 204:
             logger.info("Droplet %s deleted.", self.proxy.name)
             return True
@@ -172,51 +141,101 @@ class DigitalOceanService(BaseService):
             return False
 
     @classmethod
-    def get_existing_proxies(cls) -> bool:
-        """Get existing proxies from DO."""
-        logger.info("Getting existing proxies.")
-        params: dict[str, str] = {"tag_name": f"{settings.PROJECT_NAME}:proxy", "per_page": "50"}
-        try:
-            r = httpx.get(
-                "https://api.digitalocean.com/v2/droplets",
-                params=params,
-                auth=TokenAuth(settings.DO_TOKEN),
-                timeout=10,
-            )
+    def fetch_servers(cls) -> list[dict]:
+        """Return proxy droplets on DO."""
+        params: dict[str, str] | None = {"tag_name": f"{settings.PROJECT_NAME}:proxy", "per_page": "50"}
+        url = "/droplets"
+        droplets = []
+        while url:
+            r = cls.api_request("GET", url, params=params)
             r.raise_for_status()
-        except Exception:
-            logger.exception("Can't get existing proxies.")
-            return False
+            data = r.json()
+            droplets += data["droplets"]
+            # next page link already contains all query params
+            url = data.get("links", {}).get("pages", {}).get("next")
+            params = None
+        return droplets
+
+    @classmethod
+    def get_server_fields(cls, server: dict) -> dict:
+        """Return proxy fields of droplet."""
+        # get ip address
+        ipaddress = None
+        for ip in server["networks"]["v4"]:
+            if ip["type"] == "public" and "ip_address" in ip and ip["ip_address"]:
+                ipaddress = ip["ip_address"]
+                break
+        return {
+            "name": server["name"],
+            "server_id": server["id"],
+            "ipaddress": ipaddress,
+            "region": server["region"]["slug"],
+            "create_request_at": dateutil.parser.parse(server["created_at"]),
+        }
+
+    @classmethod
+    def build_image(cls, name: str) -> str:
+        """Build droplet snapshot with squid preinstalled."""
+        logger.info("Creating image builder droplet %s.", name)
+        payload = {
+            "name": name,
+            "region": settings.DO_PROXY_DROPLET_REGION,
+            "size": settings.DO_PROXY_DROPLET_SIZE,
+            "image": settings.DO_PROXY_DROPLET_IMAGE,
+            "ssh_keys": [],
+            "backups": False,
+            "ipv6": False,
+            "monitoring": False,
+            # without proxy tag so sync doesn't take builder for proxy
+            "tags": [settings.PROJECT_NAME, f"{settings.PROJECT_NAME}:builder"],
+            "user_data": get_builder_user_data(),
+        }
+        r = cls.api_request("POST", "/droplets", json=payload)
+        r.raise_for_status()
+        droplet_id = r.json()["droplet"]["id"]
 
-        logger.info("Found %s existing proxies.", len(r.json()["droplets"]))
+        try:
+            # builder powers off when provisioning is done
+            cls.wait_for(
+                lambda: cls.api_request("GET", f"/droplets/{droplet_id}").json()["droplet"]["status"] == "off",
+                f"builder droplet {name} to power off",
+            )
 
-        Proxy.objects.filter(provider=Proxy.ProviderChoices.DIGITALOCEAN).update(is_removed=True)
+            logger.info("Creating snapshot %s.", name)
+            r = cls.api_request("POST", f"/droplets/{droplet_id}/actions", json={"type": "snapshot", "name": name})
+            r.raise_for_status()
+            cls.wait_for(partial(cls.is_action_completed, r.json()["action"]["id"]), f"snapshot {name}")
 
-        for droplet in r.json()["droplets"]:
-            # get ip address
-            ipaddress = None
-            for ip in droplet["networks"]["v4"]:
-                if ip["type"] == "public" and "ip_address" in ip and ip["ip_address"]:
-                    ipaddress = ip["ip_address"]
+            r = cls.api_request("GET", f"/droplets/{droplet_id}/snapshots")
+            r.raise_for_status()
+            for snapshot in r.json()["snapshots"]:
+                if snapshot["name"] == name:
                     break
-            logger.info("Found proxy %s", droplet["name"])
-            proxy: Proxy
-            proxy, created = Proxy.objects.update_or_create(
-                name=droplet["name"],
-                provider=Proxy.ProviderChoices.DIGITALOCEAN,
-                defaults={
-                    "server_id": droplet["id"],
-                    "ipaddress": ipaddress,
-                    "create_request_at": dateutil.parser.parse(droplet["created_at"]),
-                    "is_removed": False,
-                },
+            else:
+                raise ImageBuildError(f"Snapshot {name} not found.")
+        finally:
+            logger.info("Deleting image builder droplet %s.", name)
+            cls.api_request("DELETE", f"/droplets/{droplet_id}")
+
+        # snapshots are available only in region they were created in
+        actions = []
+        for region in get_region_weights(cls.provider).keys() - {settings.DO_PROXY_DROPLET_REGION}:
+            logger.info("Transferring snapshot %s to %s.", name, region)
+            r = cls.api_request(
+                "POST", f"/images/{snapshot['id']}/actions", json={"type": "transfer", "region": region}
             )
+            r.raise_for_status()
+            actions.append(r.json()["action"]["id"])
+        for action_id in actions:
+            cls.wait_for(partial(cls.is_action_completed, action_id), f"transfer of snapshot {name}")
+        return str(snapshot["id"])
 
-            if created:
-                logger.info("Proxy %s newly created.", droplet["name"])
-                proxy.active = proxy.check_proxy_works_correct()
-                proxy.last_check_at = timezone.now()
-                proxy.save()
-
-        Proxy.objects.filter(provider=Proxy.ProviderChoices.DIGITALOCEAN, is_removed=True).delete()
-        return True
+    @classmethod
+    def is_action_completed(cls, action_id: int) -> bool:
+        """Return if action completed, raise `ImageBuildError` when it errored."""
+        r = cls.api_request("GET", f"/actions/{action_id}")
+        r.raise_for_status()
+        status = r.json()["action"]["status"]
+        if status == "errored":
+            raise ImageBuildError(f"Action {action_id} failed.")
+        return status == "completed"
@@ -8,60 +8,46 @@ from django.conf import settings
 from django.utils import timezone
 
 import dateutil.parser
-import httpx
 
 from proxies.proxies.models import Proxy
-from proxies.proxies.services.auth import TokenAuth
-from proxies.proxies.services.base import BaseService
+from proxies.proxies.services.base import BaseService, ImageBuildError
+from proxies.proxies.services.cloudinit import get_builder_user_data
 
 logger = logging.getLogger(__name__)
 
 
-HETZNER_PROXY_SERVER_USER_DATA = f"""
-#cloud-config
-packages:
-  - squid
-  - httpd-tools
-
-write_files:
-  - path: /etc/squid/squid.conf
-    content: |
-      auth_param basic program /usr/lib64/squid/basic_ncsa_auth  /etc/squid/passwords
-      auth_param basic realm proxy
-      acl authenticated proxy_auth REQUIRED
-      http_access allow authenticated
-      http_port {settings.PROXY_PORT}
-      forwarded_for delete
-      via off
-      follow_x_forwarded_for deny all
-      request_header_access X-Forwarded-For deny all
-      header_access X_Forwarded_For deny all
-  - path: /etc/cron.daily/update.sh
-    content: |
-      #!/bin/bash
-      /usr/bin/yum -y update
-      systemctl restart squid
-
-runcmd:
-  - htpasswd -nb {settings.PROXY_LOGIN} {settings.PROXY_PASSWORD} >> /etc/squid/passwords
-  - chmod a+x /etc/cron.daily/update.sh
-  - systemctl start squid
-  - systemctl enable squid
-"""
-
-
 class HetznerService(BaseService):
     """Hetzner service for creating, checking and deleting proxies."""
 
+    provider = Proxy.ProviderChoices.HETZNER
+    # servers can be renamed, id is stable
+    sync_lookup = "server_id"
+
+    @classmethod
+    def get_api_url(cls) -> str:
+        """Return Hetzner API base URL."""
+        return settings.HETZNER_API_URL
+
+    @classmethod
+    def get_token(cls) -> str:
+        """Return Hetzner API token."""
+        return settings.HETZNER_TOKEN
+
+    @classmethod
+    def get_stock_image(cls) -> str:
+        """Return Hetzner stock image."""
+        return settings.HETZNER_PROXY_SERVER_IMAGE
+
     def create_proxy(self) -> bool:
         """Create server on Hetzner."""
         logger.info("Creating Hetzner server %s.", self.proxy.name)
+        image, user_data = self.get_image_and_user_data()
         payload = {
-            "image": settings.HETZNER_PROXY_SERVER_IMAGE,
+            "image": image,
             "name": self.proxy.name,
             "server_type": settings.HETZNER_PROXY_SERVER_TYPE,
-            "location": settings.HETZNER_PROXY_SERVER_LOCATION,
-            "user_data": HETZNER_PROXY_SERVER_USER_DATA,
+            "location": self.get_region(),
+            "user_data": user_data,
             "labels": {
                 settings.PROJECT_NAME: "",
                 f"{settings.PROJECT_NAME}/proxy": "",
@@ -73,12 +59,7 @@ class HetznerService(BaseService):
 
         self.proxy.create_request_at = timezone.now()
         try:
-            r = httpx.post(
-                "https://api.hetzner.cloud/v1/servers",
-                auth=TokenAuth(settings.HETZNER_TOKEN),
-                json=payload,
-                timeout=10,
-            )
+            r = self.api_request("POST", "/servers", json=payload)
             r.raise_for_status()
         except Exception:
             logger.exception("Request error on creating Hetzner server %s", self.proxy.name)
@@ -95,15 +76,11 @@ class HetznerService(BaseService):
 
     def check_proxy(self) -> bool:
         """Check if server is ready."""
-        logger.info("Checking Server %s status.", self.proxy.name)
+        logger.debug("Checking Server %s status.", self.proxy.name)
         self.proxy.last_check_at = timezone.now()
 
         try:
-            r = httpx.get(
-                f"https://api.hetzner.cloud/v1/servers/{self.proxy.server_id}",
-                auth=TokenAuth(settings.HETZNER_TOKEN),
-                timeout=10,
-            )
+            r = self.api_request("GET", f"/servers/{self.proxy.server_id}")
         except Exception:
             # request error... set proxy as inactive
             logger.exception("Can't get server %s status.", self.proxy.name)
@@ -123,7 +100,7 @@ class HetznerService(BaseService):
                     self.proxy.ipaddress = data["server"]["public_net"]["ipv4"]["ip"]
                     self.proxy.save()
                     logger.info("Server %s is ready.", self.proxy.name)
-                    self.proxy.active = self.proxy.check_proxy_works_correct()
+                    self.set_active(self.proxy.check_proxy_works_correct())
                     self.proxy.save()
                     return True
 
@@ -137,11 +114,7 @@ class HetznerService(BaseService):
     def delete_proxy(self) -> bool:
         """Delete server from Hetzner."""
         logger.info("Deleting server %s.", self.proxy.name)
-        r = httpx.delete(
-            f"https://api.hetzner.cloud/v1/servers/{self.proxy.server_id}",
-            auth=TokenAuth(settings.HETZNER_TOKEN),
-            timeout=10,
-        )
+        r = self.api_request("DELETE", f"/servers/{self.proxy.server_id}")
         data = r.json()
 
         if r.status_code == 200:
@@ -161,51 +134,74 @@ class HetznerService(BaseService):
         return False
 
     @classmethod
-    def get_existing_proxies(cls) -> bool:
-        """Get existing proxies from Hetzner."""
-        logger.info("Getting existing Hetzner proxies.")
-
+    def fetch_servers(cls) -> list[dict]:
+        """Return proxy servers on Hetzner."""
         params: dict[str, str] = {"label_selector": f"{settings.PROJECT_NAME}/proxy", "per_page": "50"}
-        try:
-            r = httpx.get(
-                "https://api.hetzner.cloud/v1/servers",
-                params=params,
-                auth=TokenAuth(settings.HETZNER_TOKEN),
-                timeout=10,
-            )
+        page: int | None = 1
+        servers = []
+        while page:
+            r = cls.api_request("GET", "/servers", params={**params, "page": str(page)})
             r.raise_for_status()
-        except Exception:
-            logger.exception("Can't get existing Hetzner proxies.")
-            return False
+            data = r.json()
+            servers += data["servers"]
+            page = data.get("meta", {}).get("pagination", {}).get("next_page")
+        return servers
 
-        logger.info("Found %s existing Hetzner proxies.", len(r.json()["servers"]))
-
-        Proxy.objects.filter(provider=Proxy.ProviderChoices.HETZNER).update(is_removed=True)
-
-        for server in r.json()["servers"]:
-            server_id = server["id"]
-            create_request_at = dateutil.parser.parse(server["created"])
-            name = server["name"]
-            ipaddress = server["public_net"]["ipv4"]["ip"]
-
-            logger.info("Found proxy %s", name)
-            proxy: Proxy
-            proxy, created = Proxy.objects.update_or_create(
-                server_id=server_id,
-                provider=Proxy.ProviderChoices.HETZNER,
-                defaults={
-                    "name": name,
-                    "ipaddress": ipaddress,
-                    "create_request_at": create_request_at,
-                    "is_removed": False,
-                },
-            )
+    @classmethod
+    def get_server_fields(cls, server: dict) -> dict:
+        """Return proxy fields of Hetzner server."""
+        return {
+            "server_id": server["id"],
+            "name": server["name"],
+            "ipaddress": server["public_net"]["ipv4"]["ip"],
+            "region": server["datacenter"]["location"]["name"],
+            "create_request_at": dateutil.parser.parse(server["created"]),
+        }
 
-            if created:
-                logger.info("Proxy %s newly created.", name)
-                proxy.active = proxy.check_proxy_works_correct()
-                proxy.last_check_at = timezone.now()
-                proxy.save()
+    @classmethod
+    def build_image(cls, name: str) -> str:
+        """Build server snapshot with squid preinstalled."""
+        logger.info("Creating image builder server %s.", name)
+        payload = {
+            "image": settings.HETZNER_PROXY_SERVER_IMAGE,
+            "name": name,
+            "server_type": settings.HETZNER_PROXY_SERVER_TYPE,
+            "location": settings.HETZNER_PROXY_SERVER_LOCATION,
+            "user_data": get_builder_user_data(),
+            # without proxy label so sync doesn't take builder for proxy
+            "labels": {
+                settings.PROJECT_NAME: "",
+                f"{settings.PROJECT_NAME}/builder": "",
+            },
+            "public_net": {
+                "enable_ipv6": False,
+            },
+        }
+        r = cls.api_request("POST", "/servers", json=payload)
+        r.raise_for_status()
+        server_id = r.json()["server"]["id"]
 
-        Proxy.objects.filter(provider=Proxy.ProviderChoices.HETZNER, is_removed=True).delete()
-        return True
+        try:
+            # builder powers off when provisioning is done
+            cls.wait_for(
+                lambda: cls.api_request("GET", f"/servers/{server_id}").json()["server"]["status"] == "off",
+                f"builder server {name} to power off",
+            )
+
+            logger.info("Creating snapshot %s.", name)
+            payload = {"type": "snapshot", "description": name, "labels": {settings.PROJECT_NAME: ""}}
+            r = cls.api_request("POST", f"/servers/{server_id}/actions/create_image", json=payload)
+            r.raise_for_status()
+            data = r.json()
+
+            def is_snapshot_done() -> bool:
+                status = cls.api_request("GET", f"/actions/{data['action']['id']}").json()["action"]["status"]
+                if status == "error":
+                    raise ImageBuildError(f"Snapshot {name} failed.")
+                return status == "success"
+
+            cls.wait_for(is_snapshot_done, f"snapshot {name}")
+            return str(data["image"]["id"])
+        finally:
+            logger.info("Deleting image builder server %s.", name)
+            cls.api_request("DELETE", f"/servers/{server_id}")
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from proxies.proxies.blacklist import add_to_blacklists, drop_blacklists, remove_from_blacklists
+from proxies.proxies.changefeed import ChangeEvent, publish_change, publish_changes
+from proxies.proxies.listing import PROXY_LIST_FIELDS, get_proxy_rows
+from proxies.proxies.models import Client, Proxy
+from proxies.proxies.pool import invalidate_pool
+
+
+@receiver(post_save, sender=Proxy)
+@receiver(post_delete, sender=Proxy)
+def invalidate_pool_cache(sender, instance: Proxy, **kwargs) -> None:
+    """Drop cached pool once the change is committed so other processes don't cache uncommitted state."""
+    transaction.on_commit(invalidate_pool)
+
+
+@receiver(post_save, sender=Proxy)
+def publish_proxy_change(sender, instance: Proxy, created: bool, **kwargs) -> None:
+    """Publish proxy entering or leaving the pool or changing its address to change feed."""
+    if not settings.CHANGE_FEED_ENABLED:
+        return
+    was_active = not created and bool(instance.tracker.previous("active"))
+    if instance.active and not was_active:
+        event = ChangeEvent.ADDED
+    elif was_active and not instance.active:
+        event = ChangeEvent.REMOVED
+    elif instance.active and instance.tracker.changed():
+        event = ChangeEvent.CHANGED
+    else:
+        return
+    row = {field: getattr(instance, field) for field in PROXY_LIST_FIELDS}
+    transaction.on_commit(partial(publish_change, event, row))
+
+
+@receiver(post_delete, sender=Proxy)
+def publish_proxy_delete(sender, instance: Proxy, **kwargs) -> None:
+    """Publish deleted active proxy as removed to change feed."""
+    if settings.CHANGE_FEED_ENABLED and instance.tracker.previous("active"):
+        row = {field: getattr(instance, field) for field in PROXY_LIST_FIELDS}
+        transaction.on_commit(partial(publish_change, ChangeEvent.REMOVED, row))
+
+
+@receiver(m2m_changed, sender=Client.blacklisted_proxies.through)
+def sync_blacklist_store(sender, instance: Client | Proxy, action: str, reverse: bool, pk_set: set | None, **kwargs):
+    """Mirror changes of `Client.blacklisted_proxies` (from both sides) into Redis sets."""
+    if action == "pre_clear" and reverse:
+        client_ids = list(instance.blacklisted_clients.values_list("pk", flat=True))
+        transaction.on_commit(partial(drop_blacklists, client_ids))
+    elif action == "post_clear" and not reverse:
+        transaction.on_commit(partial(drop_blacklists, [instance.pk]))
+    elif action in ("post_add", "post_remove") and pk_set:
+        client_ids, proxy_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        update = add_to_blacklists if action == "post_add" else remove_from_blacklists
+        transaction.on_commit(partial(update, list(client_ids), list(proxy_ids)))
+
+
+@receiver(pre_delete, sender=Proxy)
+def remove_deleted_proxy_from_blacklists(sender, instance: Proxy, **kwargs) -> None:
+    """Remove deleted proxy from blacklists, the cascade delete doesn't send `m2m_changed`."""
+    if not settings.BLACKLIST_STORE_ENABLED:
+        return
+    client_ids = list(instance.blacklisted_clients.values_list("pk", flat=True))
+    if client_ids:
+        transaction.on_commit(partial(remove_from_blacklists, client_ids, [instance.pk]))
+
+
+@receiver(m2m_changed, sender=Client.blacklisted_proxies.through)
+def publish_blacklist_change(
+    sender, instance: Client | Proxy, action: str, reverse: bool, pk_set: set | None, **kwargs
+):
+    """Publish blacklisting changes to feeds of affected clients, cleared blacklists make clients reload."""
+    if not settings.CHANGE_FEED_ENABLED:
+        return
+    if action == "pre_clear" and reverse:
+        client_ids = list(instance.blacklisted_clients.values_list("pk", flat=True))
+        transaction.on_commit(partial(publish_changes, [(ChangeEvent.RESET, None, pk) for pk in client_ids]))
+    elif action == "post_clear" and not reverse:
+        transaction.on_commit(partial(publish_change, ChangeEvent.RESET, None, instance.pk))
+    elif action in ("post_add", "post_remove") and pk_set:
+        client_ids, proxy_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        if action == "post_add":
+            # clients only drop blacklisted proxy so its id is enough
+            changes = [(ChangeEvent.BLACKLISTED, {"id": pk}, client_id) for client_id in client_ids for pk in proxy_ids]
+            transaction.on_commit(partial(publish_changes, changes))
+            return
+
+        def publish() -> None:
+            rows = get_proxy_rows(Proxy.objects.filter(pk__in=proxy_ids, active=True))
+            publish_changes([(ChangeEvent.UNBLACKLISTED, row, client_id) for client_id in client_ids for row in rows])
+
+        transaction.on_commit(publish)
@@ -1,52 +1,182 @@
 from __future__ import annotations
 
 from datetime import timedelta
+from functools import partial
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
+import redis
 from celery.utils.log import get_task_logger
 
 from config import celery
-from proxies.proxies.models import Proxy
+from config.locks import single_flight
+from proxies.proxies import quarantine, usage
+from proxies.proxies.bulk import record_result
+from proxies.proxies.changefeed import ChangeEvent, publish_change, publish_changes
+from proxies.proxies.health import CheckRunStats
+from proxies.proxies.listing import PROXY_LIST_FIELDS
+from proxies.proxies.metrics import CHECK_RUN_DURATION, PROXY_QUARANTINES, PROXY_REMEDIATIONS
+from proxies.proxies.models import Client, Proxy
+from proxies.proxies.pool import get_provider_limit_error
+from proxies.proxies.remediation import get_failing_proxies, get_remediation_slots, record_remediation
 from proxies.proxies.services.digitalocean import DigitalOceanService
 from proxies.proxies.services.hetzner import HetznerService
 
 logger = get_task_logger(__name__)
 
 
-@celery.task
+# checks and sync are idempotent so they are acknowledged after run and redelivered when worker dies
+@celery.task(acks_late=True)
+@single_flight("check_all_proxies")
+@CHECK_RUN_DURATION.time()
 def check_all_proxies() -> None:
     """
     Check all created proxies(droplets) if there are active on DO and proxy actually works.
 
     :return: None
     """
-    proxy: Proxy
-    state = {}
+    stats = CheckRunStats()
     for proxy in Proxy.objects.filter(server_id__isnull=False):
-        state[proxy.id] = proxy.active
+        if needs_check(proxy):
+            check_proxy(proxy, stats)
+        update_reported(proxy)
+    finish_check_run(stats)
+
+
+def needs_check(proxy: Proxy) -> bool:
+    """Return if proxy should be checked, inactive proxies are checked every run, active ones once per hour."""
+    return not proxy.active or (proxy.last_check_at + timedelta(hours=1) < timezone.now())
+
+
+def check_proxy(proxy: Proxy, stats: CheckRunStats) -> bool:
+    """Check proxy and record the result to stats, return if it passed."""
+    was_ready = proxy.ready_at is not None
+    # server can be running while proxy on it doesn't work, only verified proxy is active
+    ok = proxy.check_status() and proxy.active
+    stats.add_check(proxy, ok, was_ready)
+    return ok
+
+
+def update_reported(proxy: Proxy) -> None:
+    """Report proxy not active 10 minutes after create request, clear the flag once it's active."""
+    if proxy.active and proxy.reported:
+        # was reported but now is active so clear reported flag
+        proxy.reported = False
+        proxy.save()
+
+    if not proxy.active and not proxy.reported and (proxy.create_request_at + timedelta(minutes=10) < timezone.now()):
+        # create 10 minutes ago but still not active... report it
+        logger.warning("Proxy %s created more then 10 minutes ago but still not active.", proxy.name)
+        proxy.reported = True
+        proxy.save()
+
+
+def finish_check_run(stats: CheckRunStats) -> None:
+    """Save results of check run, tear down replaced proxies and start remediation of failing ones."""
+    stats.save()
+    teardown_replaced_proxies()
+    if settings.PROXY_REMEDIATION_THRESHOLD:
+        remediate_failing_proxies.delay()
+
+
+def teardown_replaced_proxies(in_process: bool = False) -> None:
+    """
+    Delete servers of proxies whose replacement is already active, their default clients move to replacement.
+
+    Servers are deleted by `delete_server` task, or right away with `in_process`.
+    """
+    for proxy in Proxy.objects.filter(replaced_by__active=True, server_id__isnull=False, is_removed=False):
+        logger.info("Proxy %s was replaced by active proxy, deleting it.", proxy.name)
+        move_default_clients(proxy)
+        if in_process:
+            proxy.delete_server()
+        else:
+            delete_server.delay(proxy.pk)
+
+
+def move_default_clients(proxy: Proxy) -> None:
+    """Move clients with replaced proxy as default to its replacement and publish the change to their feeds."""
+    client_ids = list(Client.objects.filter(default_proxy=proxy).values_list("pk", flat=True))
+    if not client_ids:
+        return
+    Client.objects.filter(pk__in=client_ids).update(default_proxy_id=proxy.replaced_by_id)
+    rows = [({field: getattr(proxy.replaced_by, field) for field in PROXY_LIST_FIELDS}, True)]
+    if proxy.active:
+        rows.append(({field: getattr(proxy, field) for field in PROXY_LIST_FIELDS}, False))
+    changes = [
+        (ChangeEvent.CHANGED, {**row, "client_default": default}, client_id)
+        for client_id in client_ids
+        for row, default in rows
+    ]
+    transaction.on_commit(partial(publish_changes, changes))
 
-        if not proxy.active or (proxy.last_check_at + timedelta(hours=1) < timezone.now()):
-            # check every run if not active otherwise once per hour
-            proxy.check_status()
 
-        if proxy.active and proxy.reported:
-            # was reported but now is active so clear reported flag
-            proxy.reported = False
-            proxy.save()
+@celery.task
+@single_flight("remediate_failing_proxies")
+def remediate_failing_proxies() -> None:
+    """Replace proxies failing checks in row, broken servers are deleted once their replacement is active."""
+    failing = get_failing_proxies()
+    try:
+        slots = get_remediation_slots()
+    except redis.RedisError:
+        logger.exception("Can't get remediation rate from Redis, skipping remediation.")
+        return
 
-        if (
-            not proxy.active
-            and not proxy.reported
-            and (proxy.create_request_at + timedelta(minutes=10) < timezone.now())
-        ):
-            # create 10 minutes ago but still not active... report it
-            logger.warning("Proxy %s created more then 10 minutes ago but still not active.", proxy.name)
-            proxy.reported = True
-            proxy.save()
+    # counted before remediation changes the failing proxies
+    failing_count = failing.count()
+    for proxy in failing[:slots]:
+        logger.warning("Proxy %s failed %s checks in row, replacing it.", proxy.name, proxy.consecutive_failures)
+        record_remediation(proxy)
+        ok = replace_proxy(proxy)
+        if not ok:
+            logger.error("Can't create replacement of proxy %s.", proxy.name)
+        PROXY_REMEDIATIONS.labels(provider=proxy.provider, result="replaced" if ok else "error").inc()
+
+    if waiting := max(failing_count - slots, 0):
+        logger.info("%s failing proxies wait for remediation limits.", waiting)
 
 
 @celery.task
+def reverify_proxy(instance_id: str) -> None:
+    """Check quarantined proxy out of band, release it when it works, hand it to remediation otherwise."""
+    try:
+        proxy = Proxy.objects.get(pk=instance_id)
+    except Proxy.DoesNotExist:
+        quarantine.release(instance_id)
+        return
+
+    ok = proxy.check_status() and proxy.active
+    quarantine.release(proxy.pk)
+    if ok:
+        logger.info("Quarantined proxy %s works, releasing it.", proxy.name)
+        PROXY_QUARANTINES.labels(result="restored").inc()
+        publish_change(ChangeEvent.ADDED, {field: getattr(proxy, field) for field in PROXY_LIST_FIELDS})
+        return
+
+    # check has deactivated proxy, replace it without waiting for more failed check runs
+    logger.warning("Quarantined proxy %s doesn't work, handing it to remediation.", proxy.name)
+    PROXY_QUARANTINES.labels(result="failed").inc()
+    Proxy.objects.filter(pk=proxy.pk).update(
+        consecutive_failures=Greatest(F("consecutive_failures") + 1, settings.PROXY_REMEDIATION_THRESHOLD)
+    )
+    if settings.PROXY_REMEDIATION_THRESHOLD:
+        remediate_failing_proxies.delay()
+
+
+@celery.task(acks_late=True)
+@single_flight("flush_usage")
+def flush_usage() -> None:
+    """Move usage reported by clients from Redis counters to DB."""
+    if rows := usage.flush_usage():
+        logger.info("Flushed usage of %s proxies by clients.", rows)
+
+
+@celery.task(acks_late=True)
+@single_flight("update_proxies_from_services")
 def update_proxies_from_services() -> None:
     """Update proxies from services."""
     try:
@@ -60,6 +190,7 @@ def update_proxies_from_services() -> None:
         logger.exception("Error on updating proxies from DigitalOcean.")
 
 
+# not acknowledged late, redelivery could create a second server
 @celery.task
 def create_server(instance_id: int) -> None:
     """Create proxy server."""
@@ -67,8 +198,48 @@ def create_server(instance_id: int) -> None:
     proxy.create_server()
 
 
-@celery.task
+@celery.task(acks_late=True)
 def delete_server(instance_id: int) -> None:
     """Delete proxy server."""
     proxy = Proxy.objects.get(pk=instance_id)
     proxy.delete_server()
+
+
+def replace_proxy(proxy: Proxy) -> bool:
+    """
+    Create replacement of proxy in the same provider and region, proxy is deleted once replacement is active.
+
+    Until then both servers exist, so provider limit can be exceeded by at most `PROXY_REMEDIATION_CONCURRENCY`
+    replacements.
+    """
+    if error := get_provider_limit_error(proxy.provider, overshoot=settings.PROXY_REMEDIATION_CONCURRENCY):
+        logger.error("Can't replace proxy %s: %s", proxy.name, error)
+        return False
+    replacement = Proxy.objects.create(provider=proxy.provider, region=proxy.region, alias=proxy.alias)
+    proxy.replaced_by = replacement
+    proxy.save(update_fields=["replaced_by"])
+    if not replacement.create_server():
+        # there is no server to wait for, proxy can be replaced again
+        replacement.delete()
+        return False
+    # proxies replaced by this one (it failed too) wait for its replacement instead
+    Proxy.objects.filter(replaced_by=proxy).update(replaced_by=replacement)
+    return True
+
+
+BULK_ACTIONS = {
+    "recheck": Proxy.check_status,
+    "delete": Proxy.delete_server,
+    "replace": replace_proxy,
+}
+
+
+@celery.task
+def run_bulk_action(operation_id: str, action: str, instance_id: int) -> None:
+    """Run bulk admin action on proxy and record its result to the operation progress."""
+    try:
+        ok = BULK_ACTIONS[action](Proxy.objects.get(pk=instance_id))
+    except Exception:
+        logger.exception("Bulk %s of proxy %s failed.", action, instance_id)
+        ok = False
+    record_result(operation_id, ok)
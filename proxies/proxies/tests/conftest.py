@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from rest_framework.test import APIClient
+
+import pytest
+
+from proxies.proxies.pool import invalidate_pool
+from proxies.proxies.tests.factories import UserFactory
+
+
+@pytest.fixture(autouse=True)
+def _clear_pool_cache():
+    """Drop pool cached by previous test, its invalidation on commit never runs as test transactions roll back."""
+    invalidate_pool()
+    yield
+    invalidate_pool()
+
+
+@pytest.fixture
+def api_client(db) -> APIClient:
+    """Return API client authenticated as user."""
+    client = APIClient()
+    client.force_authenticate(UserFactory())
+    return client
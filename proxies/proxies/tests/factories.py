@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from django.utils import timezone
+
+import factory
+from factory.django import DjangoModelFactory
+
+from proxies.proxies.models import Client, Proxy
+from proxies.users.models import User
+
+
+class UserFactory(DjangoModelFactory):
+    """User factory."""
+
+    email = factory.Sequence(lambda n: f"user{n}@example.com")
+
+    class Meta:
+        model = User
+
+
+class ProxyFactory(DjangoModelFactory):
+    """Active proxy factory."""
+
+    name = factory.Sequence(lambda n: f"proxy{n:04d}")
+    provider = Proxy.ProviderChoices.HETZNER
+    region = "nbg1"
+    server_id = factory.Sequence(lambda n: n + 1)
+    ipaddress = factory.Sequence(lambda n: f"10.0.{n // 250}.{n % 250 + 1}")
+    active = True
+    create_request_at = factory.LazyFunction(timezone.now)
+    last_check_at = factory.LazyFunction(timezone.now)
+
+    class Meta:
+        model = Proxy
+
+
+class ClientFactory(DjangoModelFactory):
+    """Client factory."""
+
+    name = factory.Sequence(lambda n: f"client{n}")
+
+    class Meta:
+        model = Client
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import threading
+
+import httpx
+import pytest
+
+from proxies.proxies.emulator import DO_PREFIX, HETZNER_PREFIX, EmulatorConfig, EmulatorHTTPServer, EmulatorState
+from proxies.proxies.models import Proxy
+from proxies.proxies.services.digitalocean import DigitalOceanService
+from proxies.proxies.services.hetzner import HetznerService
+from proxies.proxies.tests.factories import ProxyFactory
+
+pytestmark = pytest.mark.django_db
+
+SERVICES = {
+    Proxy.ProviderChoices.DIGITALOCEAN: DigitalOceanService,
+    Proxy.ProviderChoices.HETZNER: HetznerService,
+}
+
+
+@pytest.fixture
+def emulator(settings) -> EmulatorHTTPServer:
+    """Run emulator on free loopback port and point services to it."""
+    state = EmulatorState(EmulatorConfig(boot_delay=0, image_boot_delay=0, action_delay=0))
+    server = EmulatorHTTPServer(("127.0.0.1", 0), state)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.DO_API_URL = f"{server.base_url}{DO_PREFIX}"
+    settings.HETZNER_API_URL = f"{server.base_url}{HETZNER_PREFIX}"
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.mark.parametrize("provider", SERVICES)
+def test_create_list_delete(emulator, provider):
+    """Server created by service is listed with loopback address and deleted."""
+    service = SERVICES[provider]
+    proxy = ProxyFactory(provider=provider, server_id=None, ipaddress=None, active=False, region="")
+    assert proxy.create_server()
+    proxy.refresh_from_db()
+    assert proxy.server_id
+
+    servers = service.fetch_servers()
+    assert [service.get_server_fields(server)["name"] for server in servers] == [proxy.name]
+    assert service.get_server_fields(servers[0])["ipaddress"].startswith("127.0.")
+
+    assert proxy.delete_server()
+    assert not Proxy.objects.filter(pk=proxy.pk).exists()
+    assert service.fetch_servers() == []
+
+
+def test_droplet_pages_link_to_emulator(emulator):
+    """Next page link points to emulator itself whatever `Host` header says, all pages are fetched."""
+    for _ in range(3):
+        emulator.state.create_server("digitalocean", name="proxy", tags=["tag"])
+    r = httpx.get(
+        f"{emulator.base_url}{DO_PREFIX}/droplets",
+        params={"tag_name": "tag", "per_page": "2"},
+        headers={"Host": "attacker.example.com"},
+    )
+    assert r.json()["links"]["pages"]["next"].startswith(f"{emulator.base_url}{DO_PREFIX}/droplets?")
+
+
+def test_api_request_rejects_foreign_url(emulator):
+    """Absolute URL outside provider API isn't requested so API token isn't leaked."""
+    with pytest.raises(ValueError, match="not on digitalocean API"):
+        DigitalOceanService.api_request("GET", "http://attacker.example.com/v2/droplets?page=2")
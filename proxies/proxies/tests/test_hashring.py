@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pytest
+
+from proxies.proxies.hashring import get_active_ring
+from proxies.proxies.pool import invalidate_pool
+from proxies.proxies.tests.factories import ProxyFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_ring_cached_until_pool_changes():
+    """Ring is reused while cached active pool is the same and rebuilt after it's invalidated."""
+    ProxyFactory.create_batch(3)
+    ring = get_active_ring()
+    assert len(ring) == 3
+    assert get_active_ring() is ring
+
+    ProxyFactory()
+    invalidate_pool()
+    rebuilt = get_active_ring()
+    assert rebuilt is not ring
+    assert len(rebuilt) == 4
+
+
+def test_ring_per_regions():
+    """Rings of regions hold only proxies from them and are cached separately."""
+    ProxyFactory.create_batch(2)
+    ProxyFactory.create_batch(3, region="fra1")
+    regions = frozenset({"fra1"})
+    assert len(get_active_ring(regions)) == 3
+    assert len(get_active_ring()) == 5
+    assert get_active_ring(regions) is get_active_ring(regions)
+
+
+def test_session_keeps_proxy_when_other_proxy_leaves():
+    """Sessions of proxies still in the pool keep their proxy after another proxy is deactivated."""
+    proxies = ProxyFactory.create_batch(5)
+    assigned = {key: get_active_ring().get(key)["id"] for key in map(str, range(100))}
+
+    proxies[0].active = False
+    proxies[0].save()
+    invalidate_pool()
+    ring = get_active_ring()
+    for key, pk in assigned.items():
+        if pk != proxies[0].pk:
+            assert ring.get(key)["id"] == pk
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+import pytest
+
+from proxies.proxies.health import CheckRunStats
+from proxies.proxies.remediation import get_failing_proxies
+from proxies.proxies.tests.factories import ProxyFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def fail_checks(proxy, runs: int = 1) -> None:
+    """Record failed check of proxy in several check runs."""
+    for _ in range(runs):
+        stats = CheckRunStats()
+        stats.add_check(proxy, ok=False, was_ready=proxy.ready_at is not None)
+        stats.save()
+    proxy.refresh_from_db()
+
+
+def test_booting_proxy_failures_not_counted(settings):
+    """Booting proxy which isn't ready isn't replaced right after its grace ends for failures during boot."""
+    settings.PROXY_REMEDIATION_THRESHOLD = 3
+    proxy = ProxyFactory(active=False, ready_at=None)
+    fail_checks(proxy, runs=5)
+    assert proxy.failed_check_count == 5
+    assert proxy.consecutive_failures == 0
+
+    # grace passes while the proxy still boots, it needs threshold of further failures to be replaced
+    proxy.create_request_at = timezone.now() - timedelta(seconds=settings.PROXY_REMEDIATION_GRACE + 1)
+    proxy.save()
+    fail_checks(proxy)
+    assert proxy.consecutive_failures == 1
+    assert proxy not in get_failing_proxies()
+    fail_checks(proxy, runs=2)
+    assert proxy in get_failing_proxies()
+
+
+def test_ready_proxy_failures_counted():
+    """Failures of proxy which was ready count even within its boot grace."""
+    proxy = ProxyFactory(ready_at=timezone.now())
+    fail_checks(proxy, runs=2)
+    assert proxy.consecutive_failures == 2
+
+
+def test_passed_check_resets_failures():
+    """Passed check resets failures in row."""
+    proxy = ProxyFactory(ready_at=timezone.now(), consecutive_failures=2)
+    stats = CheckRunStats()
+    stats.add_check(proxy, ok=True, was_ready=True)
+    stats.save()
+    proxy.refresh_from_db()
+    assert proxy.consecutive_failures == 0
+    assert proxy.check_count == 1
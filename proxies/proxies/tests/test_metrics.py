@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+def test_metrics_require_token(client, settings):
+    """Metrics are served only with the right Bearer token."""
+    settings.METRICS_TOKEN = get_random_string(32)
+    url = reverse("metrics")
+    assert client.get(url).status_code == 403
+    assert client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code == 403
+    response = client.get(url, HTTP_AUTHORIZATION=f"Bearer {settings.METRICS_TOKEN}")
+    assert response.status_code == 200
+    assert b"proxies_pool_active" in response.content
+
+
+@pytest.mark.parametrize(("debug", "status_code"), [(False, 403), (True, 200)])
+def test_metrics_without_token_only_in_debug(client, settings, debug, status_code):
+    """Without token metrics are refused unless DEBUG is on."""
+    settings.METRICS_TOKEN = ""
+    settings.DEBUG = debug
+    assert client.get(reverse("metrics")).status_code == status_code
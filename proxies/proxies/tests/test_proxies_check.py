@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from contextlib import nullcontext
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+
+import pytest
+
+from proxies.proxies.management.commands import proxies_check
+from proxies.proxies.models import PoolHealthRollup, Proxy
+from proxies.proxies.tasks import delete_server, remediate_failing_proxies
+from proxies.proxies.tests.factories import ProxyFactory
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures("_lock")]
+
+
+@pytest.fixture
+def _lock(monkeypatch) -> None:
+    """Replace Redis lock of the command, its release needs Redis with Lua scripting."""
+    monkeypatch.setattr(proxies_check, "HeartbeatLock", lambda name: nullcontext(True))
+
+
+@pytest.fixture
+def queued(monkeypatch) -> list[str]:
+    """Record tasks queued to Celery instead of queueing them."""
+    queued = []
+    monkeypatch.setattr(remediate_failing_proxies, "delay", lambda *args: queued.append("remediate_failing_proxies"))
+    monkeypatch.setattr(delete_server, "delay", lambda *args: queued.append("delete_server"))
+    return queued
+
+
+@pytest.fixture
+def calls(monkeypatch, settings) -> list[str]:
+    """Record remediation run by the command."""
+    settings.PROXY_REMEDIATION_THRESHOLD = 3
+    calls = []
+    monkeypatch.setattr(proxies_check, "remediate_failing_proxies", lambda: calls.append("remediate"))
+    monkeypatch.setattr(
+        proxies_check, "teardown_replaced_proxies", lambda in_process: calls.append(f"teardown {in_process}")
+    )
+    return calls
+
+
+def test_check_saves_stats_and_prints_summary(monkeypatch, queued):
+    """Checks of proxies are saved to their counters and pool health, summary is printed and nothing is queued."""
+    checked_at = timezone.now() - timedelta(hours=2)
+    passing = ProxyFactory(last_check_at=checked_at, ready_at=checked_at)
+    failing = ProxyFactory(last_check_at=checked_at, ready_at=checked_at)
+    monkeypatch.setattr(Proxy, "check_status", lambda self: self.pk == passing.pk)
+
+    stdout = StringIO()
+    call_command("proxies_check", stdout=stdout, stderr=StringIO())
+
+    passing.refresh_from_db()
+    failing.refresh_from_db()
+    assert (passing.check_count, passing.failed_check_count, passing.consecutive_failures) == (1, 0, 0)
+    assert (failing.check_count, failing.failed_check_count, failing.consecutive_failures) == (1, 1, 1)
+    rollup = PoolHealthRollup.objects.get(provider=Proxy.ProviderChoices.HETZNER)
+    assert (rollup.checks, rollup.failures, rollup.active_count) == (2, 1, 2)
+
+    lines = stdout.getvalue().splitlines()
+    row = next(line.split() for line in lines if line.startswith(Proxy.ProviderChoices.HETZNER))
+    # provider, checked, passed, failed, errors, durations, api calls and api errors
+    assert row[:5] == [Proxy.ProviderChoices.HETZNER, "2", "1", "1", "0"]
+    assert row[-2:] == ["0", "0"]
+    assert lines[-1].startswith("Checked 2 proxies in ")
+    assert queued == []
+
+
+def test_remediation_skipped_by_default(calls, queued):
+    """Without `--remediate` nothing is remediated nor queued."""
+    call_command("proxies_check", stdout=StringIO())
+    assert calls == []
+    assert queued == []
+
+
+def test_remediation_runs_in_process(calls, queued):
+    """With `--remediate` replaced proxies are torn down and failing ones replaced in process."""
+    call_command("proxies_check", "--remediate", stdout=StringIO())
+    assert calls == ["teardown True", "remediate"]
+    assert queued == []
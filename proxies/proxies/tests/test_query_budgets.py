@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from django.urls import reverse
+
+import pytest
+
+from proxies.proxies.pool import invalidate_pool
+from proxies.proxies.querycount import QueryBudgetExceededError, query_budget
+from proxies.proxies.tests.factories import ClientFactory, ProxyFactory
+from proxies.proxies.views import ClientAPIView, ProxyViewSet
+
+pytestmark = pytest.mark.django_db
+
+
+def count_queries(api_client, method: str, url: str, budget: int, **kwargs) -> int:
+    """Send request within query budget and return number of its queries, pool cache is cold so it's counted too."""
+    invalidate_pool()
+    with query_budget(budget) as recorder:
+        response = getattr(api_client, method)(url, **kwargs)
+    assert response.status_code == 200, response.content
+    return recorder.count
+
+
+@pytest.mark.parametrize("accept", ["application/json", "text/html"])
+def test_proxy_list_within_budget(api_client, accept):
+    """Proxy list stays within budget of the view, in JSON fast path and browsable API."""
+    ProxyFactory.create_batch(3)
+    url = reverse("proxies:proxy-list")
+    small = count_queries(api_client, "get", url, ProxyViewSet.query_budget, HTTP_ACCEPT=accept)
+
+    ProxyFactory.create_batch(30)
+    large = count_queries(api_client, "get", url, ProxyViewSet.query_budget, HTTP_ACCEPT=accept)
+    # number of queries doesn't grow with number of proxies
+    assert large == small
+
+
+def test_proxy_list_filtered_within_budget(api_client):
+    """Filtered proxy list queries database within budget."""
+    ProxyFactory.create_batch(10)
+    ProxyFactory.create_batch(5, provider="digitalocean", region="fra1")
+    url = reverse("proxies:proxy-list")
+    count_queries(api_client, "get", url, ProxyViewSet.query_budget, data={"provider": "digitalocean", "active": True})
+    count_queries(api_client, "get", url, ProxyViewSet.query_budget, data={"region": "fra1,nbg1"})
+
+
+def test_client_list_within_budget(api_client):
+    """Client listing stays within budget regardless of pool size and blacklist."""
+    ProxyFactory.create_batch(3)
+    client = ClientFactory(default_proxy=ProxyFactory())
+    url = reverse("proxies:client", kwargs={"name": client.name})
+    small = count_queries(api_client, "get", url, ClientAPIView.query_budget)
+
+    client.blacklisted_proxies.set(ProxyFactory.create_batch(10))
+    ProxyFactory.create_batch(30)
+    large = count_queries(api_client, "get", url, ClientAPIView.query_budget)
+    assert large == small
+
+
+def test_client_list_new_client_within_budget(api_client):
+    """Listing of client seen for the first time (created on request) stays within budget."""
+    ProxyFactory.create_batch(5)
+    count_queries(
+        api_client, "get", reverse("proxies:client", kwargs={"name": "new-client"}), ClientAPIView.query_budget
+    )
+
+
+def test_client_blacklist_within_budget(api_client):
+    """Blacklisting proxy for client stays within budget and returns listing without it."""
+    proxies = ProxyFactory.create_batch(5)
+    client = ClientFactory()
+    url = reverse("proxies:client", kwargs={"name": client.name})
+    with query_budget(ClientAPIView.query_budget):
+        response = api_client.put(url, {"proxy_id": str(proxies[0].pk)}, format="json")
+    assert response.status_code == 200, response.content
+    assert str(proxies[0].pk) not in {row["id"] for row in response.json()}
+    assert list(client.blacklisted_proxies.all()) == [proxies[0]]
+
+
+def test_streamed_proxy_list_queries_counted(api_client, monkeypatch):
+    """Queries executed while streamed listing is iterated count against budget of the view."""
+    ProxyFactory.create_batch(3)
+    monkeypatch.setattr(ProxyViewSet, "query_budget", 0)
+    response = api_client.get(reverse("proxies:proxy-list"), {"stream": "1"}, HTTP_ACCEPT="application/json")
+    assert response.status_code == 200
+    assert response.streaming
+    with pytest.raises(QueryBudgetExceededError, match="budget is 0"):
+        b"".join(response.streaming_content)
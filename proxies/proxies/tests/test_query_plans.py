@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from django.db import connection
+
+import pytest
+
+from proxies.proxies.models import Client, Proxy
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="query plans are checked only on PostgreSQL"),
+]
+
+# hot queries with indexes any of which must serve them, empty when any index will do
+HOT_QUERIES: dict[str, tuple[Callable[[Client], object], tuple[str, ...]]] = {
+    "active proxies listing": (
+        lambda client: Proxy.objects.filter(active=True),
+        ("proxy_active_partial_idx",),
+    ),
+    "check_all_proxies": (
+        lambda client: Proxy.objects.filter(server_id__isnull=False),
+        ("proxy_server_id_notnull_idx",),
+    ),
+    "provider count": (
+        lambda client: Proxy.objects.filter(provider=Proxy.ProviderChoices.HETZNER).order_by().values("pk"),
+        ("proxy_provider_server_id_idx", "proxy_provider_removed_idx", "proxy_provider_name_id_idx"),
+    ),
+    "sync update_or_create": (
+        lambda client: Proxy.objects.filter(server_id=1, provider=Proxy.ProviderChoices.HETZNER),
+        ("proxy_provider_server_id_idx",),
+    ),
+    "sync removed proxies": (
+        lambda client: Proxy.objects.filter(provider=Proxy.ProviderChoices.HETZNER, is_removed=True),
+        ("proxy_provider_removed_idx",),
+    ),
+    "client blacklist exclusion": (
+        lambda client: Proxy.objects.filter(active=True).exclude(
+            pk__in=client.blacklisted_proxies.all().values_list("id", flat=True)
+        ),
+        (),
+    ),
+}
+
+
+@pytest.fixture
+def seeded_client() -> Client:
+    """Seed proxies with mixed state and return client with blacklist, sequential scans are disabled for the test."""
+    providers = Proxy.ProviderChoices.values
+    proxies = Proxy.objects.bulk_create(
+        Proxy(
+            name=f"queryplan{i:07d}",
+            provider=providers[i % len(providers)],
+            server_id=i if i % 10 else None,
+            active=i % 4 != 0,
+            reported=i % 20 == 0,
+            is_removed=i % 50 == 0,
+        )
+        for i in range(2000)
+    )
+    client = Client.objects.create(name="queryplan-client")
+    client.blacklisted_proxies.add(*proxies[::25])
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Proxy._meta.db_table}")
+        # verifies a usable index exists even though seeded table is small
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    return client
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(seeded_client, name):
+    """Hot query is served by its index without sequential scan."""
+    get_queryset, indexes = HOT_QUERIES[name]
+    plan = get_queryset(seeded_client).explain()
+    assert "Seq Scan" not in plan, plan
+    if indexes:
+        assert any(index in plan for index in indexes), plan
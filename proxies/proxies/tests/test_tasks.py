@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pytest
+
+from proxies.proxies import tasks
+from proxies.proxies.changefeed import ChangeEvent
+from proxies.proxies.models import Client, Proxy
+from proxies.proxies.tests.factories import ClientFactory, ProxyFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def created_servers(monkeypatch) -> list[Proxy]:
+    """Record servers created for proxies instead of calling provider API."""
+    created = []
+
+    def create_server(proxy: Proxy) -> bool:
+        created.append(proxy)
+        return True
+
+    monkeypatch.setattr(Proxy, "create_server", create_server)
+    return created
+
+
+def test_replace_proxy_within_provider_limit_overshoot(settings, created_servers, django_capture_on_commit_callbacks):
+    """Replacements may exceed provider limit only by `PROXY_REMEDIATION_CONCURRENCY`."""
+    settings.HETZNER_LIMIT = 2
+    settings.PROXY_REMEDIATION_CONCURRENCY = 1
+    first, second = ProxyFactory.create_batch(2)
+
+    # cached provider counts are invalidated on commit like in autocommit of Celery task
+    with django_capture_on_commit_callbacks(execute=True):
+        assert tasks.replace_proxy(first)
+    assert Proxy.objects.count() == 3
+    first.refresh_from_db()
+    assert first.replaced_by == created_servers[0]
+
+    assert not tasks.replace_proxy(second)
+    assert Proxy.objects.count() == 3
+    second.refresh_from_db()
+    assert second.replaced_by is None
+
+
+def test_teardown_moves_default_clients_and_publishes_change(monkeypatch, django_capture_on_commit_callbacks):
+    """Clients with replaced default proxy move to replacement and their feeds get the change."""
+    published, deleted = [], []
+    monkeypatch.setattr(tasks, "publish_changes", published.extend)
+    monkeypatch.setattr(tasks.delete_server, "delay", deleted.append)
+    replacement = ProxyFactory()
+    proxy = ProxyFactory(replaced_by=replacement)
+    client, other = ClientFactory(default_proxy=proxy), ClientFactory()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks.teardown_replaced_proxies()
+
+    assert deleted == [proxy.pk]
+    client.refresh_from_db()
+    assert client.default_proxy == replacement
+    assert Client.objects.get(pk=other.pk).default_proxy is None
+    assert [(event, row["id"], row["client_default"], client_id) for event, row, client_id in published] == [
+        (ChangeEvent.CHANGED, replacement.pk, True, client.pk),
+        (ChangeEvent.CHANGED, proxy.pk, False, client.pk),
+    ]
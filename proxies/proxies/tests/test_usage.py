@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import uuid
+
+import pytest
+
+from config.cache import get_redis
+from proxies.proxies import usage
+from proxies.proxies.models import ProxyUsage
+from proxies.proxies.tests.factories import ClientFactory, ProxyFactory
+from proxies.proxies.usage import parse_samples
+
+PROXY_ID = "6f1c1c3e-54a4-4c1a-9f55-0a4e3a4c2a10"
+
+
+def test_parse_samples_sums_per_proxy():
+    """Counters of samples of the same proxy are summed, latency is weighted by requests."""
+    totals = parse_samples([[PROXY_ID, 2, 100, 1, 50], [PROXY_ID, 3, 200, 0, 10.5]])
+    assert totals == {uuid.UUID(PROXY_ID): [5, 300, 1, 132]}
+
+
+@pytest.mark.parametrize(
+    "sample",
+    [
+        [5, 1, 1, 0, 1],
+        [None, 1, 1, 0, 1],
+        [["id"], 1, 1, 0, 1],
+        ["not-uuid", 1, 1, 0, 1],
+        [PROXY_ID, 1, 1, 0],
+        "sample",
+        5,
+    ],
+)
+def test_parse_samples_rejects_malformed_sample(sample):
+    """Malformed sample including non-string proxy id raises `ValueError`, not other errors."""
+    with pytest.raises(ValueError, match="Sample 0: expected"):
+        parse_samples([sample])
+
+
+@pytest.mark.parametrize(
+    ("sample", "message"),
+    [
+        ([PROXY_ID, 1.5, 1, 0, 1], "must be integers"),
+        ([PROXY_ID, 1, 1, 0, "1"], "must be a number"),
+        ([PROXY_ID, 1, 1, 2, 1], "can't exceed requests"),
+    ],
+)
+def test_parse_samples_rejects_invalid_values(sample, message):
+    """Samples with invalid counters raise `ValueError`."""
+    with pytest.raises(ValueError, match=message):
+        parse_samples([sample])
+
+
+@pytest.mark.parametrize(
+    "samples",
+    [
+        [[PROXY_ID, 2**63, 1, 0, 1]],
+        [[PROXY_ID, 1, 2**48 + 1, 0, 1]],
+        [[PROXY_ID, 2**40, 1, 0, 2**20]],
+        [[PROXY_ID, 1, 2**47, 0, 1], [PROXY_ID, 1, 2**47 + 1, 0, 1]],
+    ],
+)
+def test_parse_samples_rejects_too_large_values(samples):
+    """Values and their sums in report are bounded so counters can't overflow int64."""
+    with pytest.raises(ValueError, match="can't exceed"):
+        parse_samples(samples)
+
+
+@pytest.fixture
+def _clean_usage_keys():
+    """Remove usage hashes before and after test."""
+
+    def clean():
+        conn = get_redis()
+        conn.delete(usage.get_pending_key(), usage.get_flushing_key(), usage.get_flush_attempts_key())
+        for key in conn.scan_iter(f"{usage.get_failed_key().rsplit(':', 1)[0]}:*"):
+            conn.delete(key)
+
+    clean()
+    yield
+    clean()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("_clean_usage_keys")
+def test_flush_usage_saves_counters():
+    """Pending counters are moved to rows of current hour."""
+    proxy, client = ProxyFactory(), ClientFactory()
+    usage.record_usage(client, parse_samples([[str(proxy.pk), 10, 1000, 1, 50]]))
+    assert usage.flush_usage() == 1
+    row = ProxyUsage.objects.get()
+    assert (row.requests, row.bytes, row.errors, row.latency_ms_sum) == (10, 1000, 1, 500)
+    assert not get_redis().exists(usage.get_flushing_key(), usage.get_flush_attempts_key())
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("_clean_usage_keys")
+def test_flush_usage_moves_aside_failing_batch(monkeypatch, settings):
+    """Batch failing to flush is retried, then moved aside so new reports are flushed again."""
+    settings.USAGE_FLUSH_MAX_ATTEMPTS = 2
+    proxy, client = ProxyFactory(), ClientFactory()
+    usage.record_usage(client, parse_samples([[str(proxy.pk), 10, 1000, 1, 50]]))
+
+    def fail(counters):
+        raise ValueError("bad counters")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(usage, "save_usage", fail)
+        for _ in range(2):
+            with pytest.raises(ValueError, match="bad counters"):
+                usage.flush_usage()
+        assert usage.flush_usage() == 0
+
+    conn = get_redis()
+    assert not conn.exists(usage.get_flushing_key())
+    failed = list(conn.scan_iter(f"{usage.get_failed_key().rsplit(':', 1)[0]}:*"))
+    assert len(failed) == 1
+    assert conn.ttl(failed[0]) > 0
+
+    usage.record_usage(client, parse_samples([[str(proxy.pk), 3, 30, 0, 10]]))
+    assert usage.flush_usage() == 1
+    assert ProxyUsage.objects.get().requests == 3
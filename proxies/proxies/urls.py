@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+from django.db import transaction
 from django.urls import path
 
 from rest_framework.routers import SimpleRouter
 
-from proxies.proxies.views import ClientAPIView, ProxyViewSet
+from proxies.proxies.views import (
+    ChangeFeedAPIView,
+    ClientAPIView,
+    PoolHealthAPIView,
+    ProxyViewSet,
+    ReportFailureAPIView,
+    StickyProxyAPIView,
+    UsageAPIView,
+)
 
 app_name = "proxies"
 
@@ -13,5 +22,15 @@ router.register("proxies", ProxyViewSet, basename="proxy")
 urlpatterns = router.urls
 
 urlpatterns += [
+    path("health/", PoolHealthAPIView.as_view(), name="health"),
     path("client/<str:name>/", ClientAPIView.as_view(), name="client"),
+    path("client/<str:name>/sticky/", StickyProxyAPIView.as_view(), name="client-sticky"),
+    path("client/<str:name>/usage/", UsageAPIView.as_view(), name="client-usage"),
+    path("client/<str:name>/report/", ReportFailureAPIView.as_view(), name="client-report"),
+    # waiting for changes must not hold transaction of ATOMIC_REQUESTS open
+    path(
+        "client/<str:name>/changes/",
+        transaction.non_atomic_requests(ChangeFeedAPIView.as_view()),
+        name="client-changes",
+    ),
 ]
@@ -0,0 +1,176 @@
+"""
+Usage of proxies reported by clients.
+
+Clients post batches of `[proxy_id, requests, bytes, errors, p50_ms]` samples which are only added to counters in Redis
+hash, `flush_usage` task periodically moves them to hourly `ProxyUsage` rows per proxy and client and updates scores of
+the proxies, so ingest costs one Redis round trip regardless of sample rate.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+import redis
+
+from config.cache import get_redis
+from proxies.proxies.models import Client, Proxy, ProxyUsage
+
+logger = logging.getLogger(__name__)
+
+# order of counters in samples (after proxy id) and in Redis hash fields
+COUNTERS = ("requests", "bytes", "errors", "latency_ms_sum")
+
+
+def get_pending_key() -> str:
+    """Return Redis key of hash counters are added to."""
+    return f"{settings.PROJECT_NAME}:usage:pending"
+
+
+def get_flushing_key() -> str:
+    """Return Redis key of hash being flushed to DB."""
+    return f"{settings.PROJECT_NAME}:usage:flushing"
+
+
+def get_flush_attempts_key() -> str:
+    """Return Redis key of number of attempts to flush hash being flushed."""
+    return f"{settings.PROJECT_NAME}:usage:flushing:attempts"
+
+
+def get_failed_key() -> str:
+    """Return Redis key of hash the flushing hash is moved to when it keeps failing."""
+    return f"{settings.PROJECT_NAME}:usage:failed:{int(time.time())}"
+
+
+def parse_sample(index: int, sample) -> tuple[uuid.UUID, tuple[int, ...]]:
+    """Validate sample and return its proxy id and counters, raise `ValueError` when it's invalid."""
+    try:
+        proxy_id, requests, size, errors, p50_ms = sample
+        if not isinstance(proxy_id, str):
+            raise TypeError
+        proxy_id = uuid.UUID(proxy_id)
+    except (TypeError, ValueError):
+        raise ValueError(f"Sample {index}: expected [proxy_id, requests, bytes, errors, p50_ms].") from None
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in (requests, size, errors)):
+        raise ValueError(f"Sample {index}: requests, bytes and errors must be integers.")
+    if not isinstance(p50_ms, int | float) or isinstance(p50_ms, bool):
+        raise ValueError(f"Sample {index}: p50_ms must be a number.")
+    if min(requests, size, errors, p50_ms) < 0 or errors > requests:
+        raise ValueError(f"Sample {index}: values can't be negative and errors can't exceed requests.")
+    if max(requests, size, p50_ms) > settings.USAGE_MAX_VALUE:
+        raise ValueError(f"Sample {index}: values can't exceed {settings.USAGE_MAX_VALUE}.")
+    return proxy_id, (requests, size, errors, round(p50_ms * requests))
+
+
+def parse_samples(data) -> dict[uuid.UUID, list[int]]:
+    """Validate samples and return their counters summed per proxy, raise `ValueError` for invalid ones."""
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of samples.")
+    if len(data) > settings.USAGE_INGEST_MAX_SAMPLES:
+        raise ValueError(f"Ensure there are no more than {settings.USAGE_INGEST_MAX_SAMPLES} samples.")
+
+    totals: dict[uuid.UUID, list[int]] = defaultdict(lambda: [0] * len(COUNTERS))
+    for index, sample in enumerate(data):
+        proxy_id, values = parse_sample(index, sample)
+        counters = totals[proxy_id]
+        for position, value in enumerate(values):
+            counters[position] += value
+        if max(counters) > settings.USAGE_MAX_VALUE:
+            raise ValueError(f"Sample {index}: values can't exceed {settings.USAGE_MAX_VALUE}.")
+    return totals
+
+
+def record_usage(client: Client, totals: dict[uuid.UUID, list[int]]) -> None:
+    """Add usage of proxies by client to pending counters."""
+    pipe = get_redis().pipeline(transaction=False)
+    for proxy_id, counters in totals.items():
+        for name, value in zip(COUNTERS, counters, strict=True):
+            if value:
+                pipe.hincrby(get_pending_key(), f"{client.pk}:{proxy_id}:{name}", value)
+    pipe.execute()
+
+
+def flush_usage() -> int:
+    """
+    Move pending counters to `ProxyUsage` of current hour and update scores of used proxies, return number of rows.
+
+    Pending hash is renamed before it's read so counters added meanwhile go to new hash. Hash left by failed flush is
+    flushed first, its counters are added again when DB was updated but the hash wasn't deleted. Hash failing to flush
+    `USAGE_FLUSH_MAX_ATTEMPTS` times is moved aside so it doesn't block flushing forever.
+    """
+    conn = get_redis()
+    if not conn.exists(get_flushing_key()):
+        try:
+            conn.rename(get_pending_key(), get_flushing_key())
+        except redis.ResponseError:
+            # nothing was reported
+            return 0
+
+    attempts = conn.incr(get_flush_attempts_key())
+    if attempts > settings.USAGE_FLUSH_MAX_ATTEMPTS:
+        failed_key = get_failed_key()
+        logger.error("Flushing of usage failed %s times, moving it to %s.", attempts - 1, failed_key)
+        pipe = conn.pipeline()
+        pipe.rename(get_flushing_key(), failed_key)
+        pipe.expire(failed_key, settings.USAGE_FAILED_TTL)
+        pipe.delete(get_flush_attempts_key())
+        pipe.execute()
+        return 0
+
+    usage: dict[tuple[uuid.UUID, uuid.UUID], dict[str, int]] = defaultdict(dict)
+    for field, value in conn.hgetall(get_flushing_key()).items():
+        client_id, proxy_id, name = field.decode().split(":")
+        usage[uuid.UUID(client_id), uuid.UUID(proxy_id)][name] = int(value)
+
+    save_usage(usage)
+    conn.delete(get_flushing_key(), get_flush_attempts_key())
+    return len(usage)
+
+
+@transaction.atomic
+def save_usage(usage: dict[tuple[uuid.UUID, uuid.UUID], dict[str, int]]) -> None:
+    """Add usage (counters per client and proxy) to rows of current hour."""
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    # proxies or clients deleted since usage was reported are skipped
+    proxy_ids = set(Proxy.objects.filter(pk__in={pk for _, pk in usage}).values_list("pk", flat=True))
+    client_ids = set(Client.objects.filter(pk__in={pk for pk, _ in usage}).values_list("pk", flat=True))
+    usage = {key: counters for key, counters in usage.items() if key[0] in client_ids and key[1] in proxy_ids}
+
+    existing = {
+        (row.client_id, row.proxy_id): row
+        for row in ProxyUsage.objects.select_for_update().filter(hour=hour, proxy_id__in=proxy_ids)
+    }
+    created, updated = [], []
+    for (client_id, proxy_id), counters in usage.items():
+        if (row := existing.get((client_id, proxy_id))) is None:
+            row = ProxyUsage(client_id=client_id, proxy_id=proxy_id, hour=hour)
+            created.append(row)
+        else:
+            updated.append(row)
+        for name in COUNTERS:
+            setattr(row, name, getattr(row, name) + counters.get(name, 0))
+
+    ProxyUsage.objects.bulk_create(created)
+    ProxyUsage.objects.bulk_update(updated, COUNTERS)
+    update_scores({proxy_id for _, proxy_id in usage})
+
+
+def update_scores(proxy_ids: set[uuid.UUID]) -> None:
+    """Set score of proxies to share of successful requests reported in last `USAGE_SCORE_WINDOW` seconds."""
+    since = timezone.now() - timedelta(seconds=settings.USAGE_SCORE_WINDOW)
+    rows = (
+        ProxyUsage.objects.filter(proxy_id__in=proxy_ids, hour__gte=since)
+        .order_by()
+        .values("proxy_id")
+        .annotate(requests=Sum("requests"), errors=Sum("errors"))
+    )
+    proxies = [Proxy(pk=row["proxy_id"], score=1 - row["errors"] / row["requests"]) for row in rows if row["requests"]]
+    Proxy.objects.bulk_update(proxies, ["score"])
@@ -1,47 +1,112 @@
 from __future__ import annotations
 
+import logging
+import re
+import uuid
+
 from django.conf import settings
 from django.db import transaction
 from django.db.models import QuerySet
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 
-from rest_framework import mixins, status, viewsets
-from rest_framework.exceptions import ValidationError
+from rest_framework import generics, mixins, status, viewsets
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.views import APIView
 
+import redis
+
+from proxies.proxies.blacklist import get_blacklisted_ids
+from proxies.proxies.changefeed import (
+    ChangeEvent,
+    ConnectionStream,
+    connections as feed_connections,
+    get_pool_version,
+    publish_change,
+    read_changes,
+    stream_changes,
+)
+from proxies.proxies.filters import ProxyFilter
+from proxies.proxies.hashring import get_sticky_proxy
+from proxies.proxies.health import get_health_report
+from proxies.proxies.listing import (
+    get_proxy_rows,
+    iter_proxy_rows,
+    render_proxy_rows,
+    stream_proxy_rows,
+    wants_stream,
+)
+from proxies.proxies.metrics import PROXY_QUARANTINES
 from proxies.proxies.models import Client, Proxy
+from proxies.proxies.pagination import KeysetPagination
+from proxies.proxies.pool import (
+    get_active_pool,
+    get_available_pool,
+    get_client_pool,
+    get_preferred_regions,
+    get_provider_limit_error,
+)
+from proxies.proxies.quarantine import get_quarantined_ids, report_failure
 from proxies.proxies.serializers import ProxySerializer
-from proxies.proxies.tasks import create_server
+from proxies.proxies.tasks import create_server, reverify_proxy
+from proxies.proxies.usage import parse_samples, record_usage
+
+logger = logging.getLogger(__name__)
+
+VERSION_RE = re.compile(r"\d+-\d+")
+
+
+class ProxyListMixin:
+    """Filtering, keyset pagination and streaming shared by proxy listings."""
+
+    filterset_class = ProxyFilter
+    pagination_class = KeysetPagination
 
+    def is_plain_list(self) -> bool:
+        """Return if request has no filters, pagination nor streaming so cached pool can be used."""
+        return not (self.request.query_params.keys() - {"format"})
 
-class ProxyViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
+    def list_proxies(self, queryset: QuerySet[Proxy], client: Client | None = None) -> HttpResponse:
+        """Return filtered (only active by default) proxies, paginated or streamed when requested."""
+        if "active" not in self.request.query_params:
+            queryset = queryset.filter(active=True)
+        if quarantined := get_quarantined_ids():
+            queryset = queryset.exclude(pk__in=quarantined)
+        queryset = self.filter_queryset(queryset)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return render_proxy_rows(self.request, self.paginator.get_paginated_data(get_proxy_rows(page, client)))
+        if wants_stream(self.request):
+            return stream_proxy_rows(iter_proxy_rows(queryset, client))
+        return render_proxy_rows(self.request, get_proxy_rows(queryset, client))
+
+
+class ProxyViewSet(ProxyListMixin, mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     """Proxy view set."""
 
+    query_budget = 6
     serializer_class = ProxySerializer
 
     def get_queryset(self) -> QuerySet[Proxy]:
         """Return the queryset."""
         return Proxy.objects.filter(active=True)
 
+    def list(self, request: Request, *args, **kwargs) -> HttpResponse:
+        """List active proxies from cache, filter, paginate or stream them from DB when requested."""
+        if self.is_plain_list():
+            return render_proxy_rows(request, get_available_pool())
+        return self.list_proxies(Proxy.objects.all())
+
     def create(self, request: Request, *args, **kwargs) -> Response:
         """Create proxy."""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        provider = request.data["provider"]
-
-        if (
-            provider == Proxy.ProviderChoices.DIGITALOCEAN
-            and Proxy.objects.filter(provider=provider).count() >= settings.DO_LIMIT
-        ):
-            raise ValidationError(f"You can't create more then {settings.DO_LIMIT} proxies for Digitalocean provider.")
-
-        if (
-            provider == Proxy.ProviderChoices.HETZNER
-            and Proxy.objects.filter(provider=provider).count() >= settings.HETZNER_LIMIT
-        ):
-            raise ValidationError(f"You can't create more then {settings.HETZNER_LIMIT} proxies for Hetzner provider.")
+        if error := get_provider_limit_error(request.data["provider"]):
+            raise ValidationError(error)
 
         instance = serializer.save()
         headers = self.get_success_headers(serializer.data)
@@ -49,29 +114,183 @@ class ProxyViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.Gene
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-class ClientAPIView(APIView):
+class ClientAPIView(ProxyListMixin, generics.GenericAPIView):
     """Client API view."""
 
+    query_budget = 8
+
     def _get_proxies(self, client: Client) -> QuerySet[Proxy]:
-        proxies = Proxy.objects.filter(active=True).exclude(
-            pk__in=client.blacklisted_proxies.all().values_list("id", flat=True)
-        )
-        return proxies
+        queryset = Proxy.objects.exclude(pk__in=get_blacklisted_ids(client))
+        # explicit region filter overrides client's preferred regions
+        if "region" not in self.request.query_params and (regions := get_preferred_regions(client)):
+            queryset = queryset.filter(region__in=regions)
+        return queryset
 
-    def get(self, request: Request, name: str) -> Response:
-        """Get proxies for client."""
+    def get(self, request: Request, name: str) -> HttpResponse:
+        """Get active proxies for client, filter, paginate or stream them when requested."""
         client, _ = Client.objects.get_or_create(name=name)
-        proxies = self._get_proxies(client)
-        return Response(ProxySerializer(proxies, many=True, context={"client": client}).data)
+        if self.is_plain_list():
+            return render_proxy_rows(request, get_client_pool(client))
+        return self.list_proxies(self._get_proxies(client), client)
 
-    def put(self, request: Request, name: str) -> Response:
+    def put(self, request: Request, name: str) -> HttpResponse:
         """Add proxy to client blacklist."""
         client, _ = Client.objects.get_or_create(name=name)
         proxy = Proxy.objects.get(pk=request.data["proxy_id"])
 
-        if client.default_proxy and client.default_proxy.id == proxy.id:
+        if client.default_proxy_id == proxy.id:
             return Response({"detail": "You can't blacklist default proxy."}, status=status.HTTP_400_BAD_REQUEST)
 
         client.blacklisted_proxies.add(proxy)
-        proxies = self._get_proxies(client)
-        return Response(ProxySerializer(proxies, many=True).data)
+        # blacklist store is updated on commit so exclude in DB to include the proxy just added
+        proxies = Proxy.objects.filter(active=True).exclude(
+            pk__in=client.blacklisted_proxies.all().values_list("id", flat=True)
+        )
+        if quarantined := get_quarantined_ids():
+            proxies = proxies.exclude(pk__in=quarantined)
+        return render_proxy_rows(request, get_proxy_rows(proxies))
+
+
+class ReportFailureAPIView(generics.GenericAPIView):
+    """Client failure report API view."""
+
+    query_budget = 6
+
+    def post(self, request: Request, name: str) -> Response:
+        """
+        Report proxy (`proxy_id`) failing for client (blocked, timing out, ...).
+
+        When `QUARANTINE_REPORT_CLIENTS` clients report the proxy within `QUARANTINE_REPORT_WINDOW` seconds it's
+        excluded from all listings until out of band re-verification restores it or hands it to remediation.
+        """
+        try:
+            proxy_id = uuid.UUID(str(request.data.get("proxy_id")))
+        except (AttributeError, ValueError):
+            raise ValidationError({"proxy_id": "Must be a valid UUID."}) from None
+        if (row := next((row for row in get_active_pool() if row["id"] == proxy_id), None)) is None:
+            raise NotFound("Active proxy not found.")
+        client, _ = Client.objects.get_or_create(name=name)
+        try:
+            reports, quarantined = report_failure(client.pk, proxy_id)
+        except redis.RedisError:
+            logger.exception("Can't record failure of proxy %s reported by client %s.", row["name"], client.name)
+            return Response({"detail": "Report can't be recorded now."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        if quarantined:
+            logger.warning("Proxy %s reported failing by %s clients, quarantining it.", row["name"], reports)
+            PROXY_QUARANTINES.labels(result="quarantined").inc()
+            publish_change(ChangeEvent.REMOVED, row)
+            transaction.on_commit(lambda: reverify_proxy.delay(str(proxy_id)))
+        return Response({"reports": reports, "quarantined": reports >= settings.QUARANTINE_REPORT_CLIENTS})
+
+
+class UsageAPIView(generics.GenericAPIView):
+    """Client usage report API view."""
+
+    query_budget = 6
+
+    def post(self, request: Request, name: str) -> Response:
+        """Add usage samples `[[proxy_id, requests, bytes, errors, p50_ms], ...]` to counters of client."""
+        try:
+            totals = parse_samples(request.data)
+        except ValueError as e:
+            raise ValidationError(str(e)) from None
+        client, _ = Client.objects.get_or_create(name=name)
+        try:
+            record_usage(client, totals)
+        except redis.RedisError:
+            logger.exception("Can't record usage of client %s.", client.name)
+            return Response({"detail": "Usage can't be recorded now."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class StickyProxyAPIView(generics.GenericAPIView):
+    """Sticky proxy API view."""
+
+    query_budget = 8
+
+    def get(self, request: Request, name: str) -> HttpResponse:
+        """Get proxy assigned to client's session (`?session=`), it changes only when the proxy leaves the pool."""
+        if not (session := request.query_params.get("session")):
+            raise ValidationError({"session": "This query parameter is required."})
+        client, _ = Client.objects.get_or_create(name=name)
+        if (row := get_sticky_proxy(client, session)) is None:
+            raise NotFound("No active proxy available.")
+        return render_proxy_rows(request, row)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Negotiate `text/event-stream`, the response is streamed by the view itself."""
+
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render error responses as single event."""
+        return b"event: error\ndata: %s\n\n" % JSONRenderer().render(data)
+
+
+class ChangeFeedAPIView(generics.GenericAPIView):
+    """Client change feed API view."""
+
+    query_budget = 4
+    renderer_classes = [JSONRenderer, BrowsableAPIRenderer, EventStreamRenderer]
+
+    def get(self, request: Request, name: str) -> HttpResponse:
+        """
+        Get changes of client's pool newer than `version` (or `Last-Event-ID` header).
+
+        With `Accept: text/event-stream` changes are pushed as Server-Sent Events, otherwise request waits up to
+        `wait` seconds for changes (long-poll) and returns them with new version.
+        """
+        if not settings.CHANGE_FEED_ENABLED:
+            raise NotFound("Change feed is disabled.")
+        client, _ = Client.objects.get_or_create(name=name)
+        version = request.query_params.get("version") or request.headers.get("Last-Event-ID")
+        if version is None:
+            # start from now, clients load listing after connecting so they don't miss changes
+            version = get_pool_version()
+        elif not VERSION_RE.fullmatch(version):
+            raise ValidationError({"version": "Invalid version."})
+
+        try:
+            wait = min(
+                float(request.query_params.get("wait", settings.CHANGE_FEED_MAX_WAIT)), settings.CHANGE_FEED_MAX_WAIT
+            )
+        except ValueError:
+            raise ValidationError({"wait": "A valid number is required."}) from None
+
+        # every open feed holds a gunicorn thread, refuse more of them so the rest of API keeps being served
+        if not feed_connections.acquire():
+            return Response(
+                {"detail": "Too many open change feeds, try again later."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(settings.CHANGE_FEED_RETRY_MS // 1000)},
+            )
+        if request.accepted_renderer.format == "sse":
+            stream = ConnectionStream(stream_changes(client, version))
+            response = StreamingHttpResponse(stream, content_type="text/event-stream")
+            response["Cache-Control"] = "no-cache"
+            # disable response buffering in nginx
+            response["X-Accel-Buffering"] = "no"
+            return response
+
+        try:
+            version, changes = read_changes(client, version, max(wait, 0))
+        finally:
+            feed_connections.release()
+        return render_proxy_rows(request, {"version": version, "changes": changes})
+
+
+class PoolHealthAPIView(generics.GenericAPIView):
+    """Pool health API view."""
+
+    query_budget = 4
+
+    def get(self, request: Request) -> Response:
+        """Get current state and health summary per provider since `since` (last 7 days by default)."""
+        since = None
+        if "since" in request.query_params:
+            if (since := parse_datetime(request.query_params["since"])) is None:
+                raise ValidationError({"since": "Enter a valid date/time."})
+        return Response(get_health_report(since))
@@ -8,3 +8,7 @@ class UsersConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "proxies.users"
+
+    def ready(self):
+        """Connect signal receivers."""
+        from proxies.users import signals  # noqa: F401
@@ -1,9 +1,37 @@
 from __future__ import annotations
 
+import hashlib
+
+from django.conf import settings
+
 from rest_framework.authentication import TokenAuthentication
 
+from config.cache import MISSING, TwoTierCache
+
+token_cache = TwoTierCache("auth-token", maxsize=1024, local_ttl=settings.AUTH_TOKEN_LOCAL_CACHE_TTL)
+
+
+def get_token_cache_key(key: str) -> str:
+    """Return cache key for token, token itself is not used to not expose it in cache keys."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token_cache(key: str) -> None:
+    """Remove token from cache in all processes."""
+    token_cache.delete(get_token_cache_key(key))
+
 
 class BearerTokenAuthentication(TokenAuthentication):
-    """Bearer token authentication."""
+    """Bearer token authentication with token to user resolution cached in process memory and Redis."""
 
     keyword = "Bearer"
+
+    def authenticate_credentials(self, key: str):
+        """Return cached user and token, hit DB only on cache miss."""
+        cache_key = get_token_cache_key(key)
+        credentials = token_cache.get(cache_key, MISSING)
+        if credentials is MISSING:
+            # raises AuthenticationFailed for invalid token or inactive user so only valid ones are cached
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(cache_key, credentials, settings.AUTH_TOKEN_CACHE_TTL)
+        return credentials
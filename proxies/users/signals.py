@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from proxies.users.authentication import invalidate_token_cache
+from proxies.users.models import User
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance: Token, **kwargs) -> None:
+    """Remove deleted (or rotated) token from cache once deletion is committed."""
+    transaction.on_commit(partial(invalidate_token_cache, instance.key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance: User, created: bool, **kwargs) -> None:
+    """
+    Remove tokens of changed user from cache so deactivation or permission changes apply immediately.
+
+    Tokens are dropped once the change is committed, otherwise concurrent request could cache the user again in its
+    old state before commit.
+    """
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list("key", flat=True):
+        transaction.on_commit(partial(invalidate_token_cache, key))
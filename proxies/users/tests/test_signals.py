@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+import pytest
+
+from config.cache import MISSING
+from proxies.proxies.tests.factories import UserFactory
+from proxies.users.authentication import BearerTokenAuthentication, get_token_cache_key, token_cache
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def token() -> Token:
+    """Return token of user cached by authentication."""
+    token = Token.objects.create(user=UserFactory())
+    BearerTokenAuthentication().authenticate_credentials(token.key)
+    assert token_cache.get(get_token_cache_key(token.key), MISSING) is not MISSING
+    return token
+
+
+def test_deactivated_user_dropped_from_cache_on_commit(token, django_capture_on_commit_callbacks):
+    """Token of deactivated user stays cached until the change is committed, then it's rejected."""
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        token.user.is_active = False
+        token.user.save()
+        assert token_cache.get(get_token_cache_key(token.key), MISSING) is not MISSING
+    assert len(callbacks) == 1
+    assert token_cache.get(get_token_cache_key(token.key), MISSING) is MISSING
+    with pytest.raises(AuthenticationFailed):
+        BearerTokenAuthentication().authenticate_credentials(token.key)
+
+
+def test_deleted_token_dropped_from_cache_on_commit(token, django_capture_on_commit_callbacks):
+    """Deleted token is removed from cache once deletion is committed."""
+    key = token.key
+    with django_capture_on_commit_callbacks(execute=True):
+        token.delete()
+        assert token_cache.get(get_token_cache_key(key), MISSING) is not MISSING
+    with pytest.raises(AuthenticationFailed):
+        BearerTokenAuthentication().authenticate_credentials(key)